@@ -1,33 +1,50 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form, Depends
-from sqlmodel import Session, select
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, UploadFile, File, Form, Depends
+from sqlmodel import delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models import (
     Announcement,
     AnnouncementCreate,
     AnnouncementPublic,
+    AnnouncementSort,
     AnnouncementWithResponses,
     AnnouncementType,
     Response,
-    ResponsePublic,
     User,
     NotificationType,
 )
-from database import get_session
+from database import get_async_session
 from utils.auth import get_current_active_user, get_current_admin_user
 from utils.notification import notification_service
-from utils.s3_storage import s3_storage
+from utils.blob_store import blob_store
+from utils.renditions import rendition_service
+from utils.s3_storage import FileTooLargeError
+from utils.pagination import CursorPage, build_page, decode_cursor, keyset_order
+from utils.announcement_stats import activity_at
+from utils.search_cache import search_cache
+from utils.suggest import suggest_index
+from utils.response_query import count_responses, load_response_page, parse_response_fields
 
 router = APIRouter(prefix="/api/announcements", tags=["公告"])
 
+# 排序方式 -> (排序列, 游标类型, 从公告对象取排序值)
+SORT_KEYS = {
+    AnnouncementSort.CREATED_AT: (Announcement.created_at, datetime, lambda a: a.created_at),
+    AnnouncementSort.RESPONSE_COUNT: (Announcement.response_count, int, lambda a: a.response_count),
+    AnnouncementSort.LAST_RESPONSE_AT: (activity_at, datetime, lambda a: a.last_response_at or a.created_at),
+}
+
 
 @router.post("", response_model=AnnouncementPublic)
 async def create_announcement(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     content: str = Form(...),
     type: AnnouncementType = Form(AnnouncementType.ANNOUNCEMENT),
     file: Optional[UploadFile] = File(None),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """创建公告（支持文件上传）"""
@@ -37,14 +54,18 @@ async def create_announcement(
 
     if file and file.filename:
         try:
-            file_content = await file.read()
-            file_key = await s3_storage.upload_file(
-                file_content=file_content,
+            # 分块流式写入存储，不把整个文件读入内存（启用去重时相同内容只存一份）
+            stored = await blob_store.store_upload(
+                session,
+                file,
                 file_name=file.filename,
                 content_type=file.content_type or "application/octet-stream",
             )
+            file_key = stored.key
             file_name = file.filename
             print(f"文件上传成功: {file_key}")
+        except FileTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             print(f"文件上传失败: {e}")
             # 文件上传失败不影响公告创建
@@ -58,18 +79,24 @@ async def create_announcement(
         file_name=file_name,
     )
     session.add(db_announcement)
-    session.commit()
-    session.refresh(db_announcement)
+    await session.commit()
+    await session.refresh(db_announcement)
+    await search_cache.invalidate()
+    await suggest_index.publish({"op": "add_title", "id": db_announcement.id, "title": db_announcement.title})
+
+    # 后台生成附件预览图（图片缩略图 / PDF 首页）
+    if file_key:
+        background_tasks.add_task(rendition_service.generate_task, file_key, file_name)
 
-    # 发送通知给所有用户
+    # 发送通知给所有用户（响应返回后在后台执行）
     notification_type = (
         NotificationType.NEW_ANNOUNCEMENT
         if type == AnnouncementType.ANNOUNCEMENT
         else NotificationType.NEW_RESPONSE
     )
 
-    notification_service.broadcast_notification(
-        session=session,
+    background_tasks.add_task(
+        notification_service.broadcast_notification_task,
         type=notification_type,
         title=f"新{type.value}：{title}",
         content=f"{current_user.full_name} 发布了一条新{type.value}",
@@ -80,70 +107,125 @@ async def create_announcement(
     return db_announcement
 
 
-@router.get("", response_model=List[AnnouncementPublic])
+@router.get("", response_model=Union[List[AnnouncementPublic], CursorPage[AnnouncementPublic]])
 async def list_announcements(
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(10, ge=1, le=100, description="每页记录数"),
     type: Optional[AnnouncementType] = Query(None, description="公告类型筛选"),
-    session: Session = Depends(get_session),
+    sort: AnnouncementSort = Query(AnnouncementSort.CREATED_AT, description="排序方式"),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串获取第一页，返回 next_cursor）"),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    """获取公告列表（分页）"""
+    """获取公告列表（分页）
+
+    传入 cursor 时使用游标分页并返回 {items, next_cursor}，
+    否则保持原有的 skip/limit 分页和列表响应。
+    回复数和最新回复时间直接读取公告表上的统计字段，不关联回复表。
+    """
     statement = select(Announcement)
 
     # 类型筛选
     if type:
         statement = statement.where(Announcement.type == type)
 
+    sort_column, cursor_type, sort_value = SORT_KEYS[sort]
+
+    # 游标分页（排序键 + id 保证顺序稳定）
+    if cursor is not None:
+        after = decode_cursor(cursor, (cursor_type, int))
+        statement = keyset_order(statement, (sort_column, Announcement.id), after)
+        rows = (await session.exec(statement.limit(limit + 1))).all()
+        items, next_cursor = build_page(rows, limit, lambda a: (sort_value(a), a.id))
+        return CursorPage[AnnouncementPublic](items=items, next_cursor=next_cursor)
+
     # 分页
-    statement = statement.order_by(Announcement.created_at.desc()).offset(skip).limit(limit)
+    statement = statement.order_by(sort_column.desc(), Announcement.id.desc()).offset(skip).limit(limit)
 
-    announcements = session.exec(statement).all()
+    announcements = (await session.exec(statement)).all()
     return announcements
 
 
-@router.get("/{announcement_id}", response_model=AnnouncementWithResponses)
+@router.get(
+    "/{announcement_id}",
+    response_model=AnnouncementWithResponses,
+    response_model_exclude_unset=True,
+)
 async def get_announcement(
-    announcement_id: int, session: Session = Depends(get_session)
+    announcement_id: int,
+    limit: int = Query(20, ge=1, le=100, description="第一页回复数量"),
+    fields: Optional[str] = Query(None, description="回复字段投影，逗号分隔（如 id,colleague_name,created_at）"),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    """获取公告详情（包含回复）"""
-    announcement = session.get(Announcement, announcement_id)
+    """获取公告详情（包含第一页回复、回复总数和下一页游标）
+
+    后续页通过 /api/responses/announcement/{id}?cursor= 获取。
+    """
+    announcement = await session.get(Announcement, announcement_id)
     if not announcement:
         raise HTTPException(status_code=404, detail="公告不存在")
 
-    # 获取回复
-    responses = session.exec(
-        select(Response)
-        .where(Response.announcement_id == announcement_id)
-        .order_by(Response.created_at.desc())
-    ).all()
+    # 获取第一页回复
+    responses, next_cursor = await load_response_page(
+        session,
+        announcement_id,
+        limit=limit,
+        fields=parse_response_fields(fields),
+    )
+    total = await count_responses(session, announcement_id)
 
     # 构建响应
     return AnnouncementWithResponses(
         **announcement.dict(),
-        responses=[ResponsePublic.from_orm(r) for r in responses]
+        responses=responses,
+        response_total=total,
+        responses_next_cursor=next_cursor,
     )
 
 
 @router.delete("/{announcement_id}")
 async def delete_announcement(
     announcement_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_admin_user)
 ):
     """删除公告（仅管理员）"""
-    announcement = session.get(Announcement, announcement_id)
+    announcement = await session.get(Announcement, announcement_id)
     if not announcement:
         raise HTTPException(status_code=404, detail="公告不存在")
 
-    # 删除关联的回复
-    responses = session.exec(
-        select(Response).where(Response.announcement_id == announcement_id)
-    ).all()
-    for response in responses:
-        session.delete(response)
+    # 释放公告和回复附件的引用
+    response_file_keys = (await session.exec(
+        select(Response.file_key).where(
+            Response.announcement_id == announcement_id,
+            Response.file_key.is_not(None),
+        )
+    )).all()
+    blob_keys = await blob_store.release(session, [announcement.file_key, *response_file_keys])
+
+    # 被删除回复的同事姓名及条数（用于更新搜索建议）
+    colleague_counts = (await session.exec(
+        select(Response.colleague_name, func.count())
+        .where(Response.announcement_id == announcement_id)
+        .group_by(Response.colleague_name)
+    )).all()
+
+    # 删除关联的回复（单条 DELETE，与删除公告在同一事务中）
+    await session.exec(
+        delete(Response)
+        .where(Response.announcement_id == announcement_id)
+        .execution_options(synchronize_session=False)
+    )
 
     # 删除公告
-    session.delete(announcement)
-    session.commit()
+    await session.delete(announcement)
+    await session.commit()
+
+    await search_cache.invalidate()
+    await suggest_index.publish({"op": "remove_title", "id": announcement_id})
+    if colleague_counts:
+        await suggest_index.publish({"op": "remove_names", "names": dict(colleague_counts)})
+
+    # 回收引用归零的附件
+    await blob_store.collect_garbage(session, blob_keys)
 
     return {"message": "删除成功"}
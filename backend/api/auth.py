@@ -10,15 +10,18 @@ from typing import Optional
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models import User, UserRole
-from database import get_session
+from database import get_async_session
 from utils.auth import (
     authenticate_user,
     create_access_token,
     get_password_hash,
     get_current_active_user,
     get_current_admin_user,
+    principal_cache,
+    token_claims,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
@@ -80,10 +83,10 @@ class EmailRequest(BaseModel):
 @router.post("/login", response_model=TokenResponse)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """用户登录"""
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -100,7 +103,7 @@ async def login(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
 
     return TokenResponse(
@@ -119,13 +122,13 @@ async def login(
 @router.post("/register")
 async def register(
     user_data: UserCreateRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """用户注册（公开接口，需管理员审核）"""
     # 检查用户名是否已存在
-    existing_user = session.exec(
+    existing_user = (await session.exec(
         select(User).where(User.username == user_data.username)
-    ).first()
+    )).first()
 
     if existing_user:
         raise HTTPException(
@@ -134,9 +137,9 @@ async def register(
         )
 
     # 检查邮箱是否已存在
-    existing_email = session.exec(
+    existing_email = (await session.exec(
         select(User).where(User.email == user_data.email)
-    ).first()
+    )).first()
 
     if existing_email:
         raise HTTPException(
@@ -155,8 +158,8 @@ async def register(
     )
 
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
 
     return {"message": "注册成功，请等待管理员审核"}
 
@@ -181,18 +184,18 @@ async def get_current_user_info(
 async def list_users(
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """获取用户列表（仅管理员，支持分页）"""
     # 获取总数
     count_statement = select(User.id)
-    total_count = len(session.exec(count_statement).all())
+    total_count = len((await session.exec(count_statement)).all())
 
     # 获取用户列表
-    users = session.exec(
+    users = (await session.exec(
         select(User).offset(skip).limit(limit)
-    ).all()
+    )).all()
 
     return {
         "total": total_count,
@@ -217,11 +220,11 @@ async def list_users(
 async def update_user_role(
     user_id: int,
     role: UserRole,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """更新用户角色（仅管理员）"""
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -237,8 +240,11 @@ async def update_user_role(
         )
 
     user.role = role
+    # 递增令牌版本，携带旧角色的令牌失效
+    user.token_version += 1
     session.add(user)
-    session.commit()
+    await session.commit()
+    await principal_cache.invalidate(user_id)
 
     return {"message": "角色更新成功"}
 
@@ -247,11 +253,11 @@ async def update_user_role(
 async def toggle_user_status(
     user_id: int,
     is_active: bool,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """切换用户状态（仅管理员）"""
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -267,8 +273,10 @@ async def toggle_user_status(
         )
 
     user.is_active = is_active
+    user.token_version += 1
     session.add(user)
-    session.commit()
+    await session.commit()
+    await principal_cache.invalidate(user_id)
 
     return {"message": "状态更新成功"}
 
@@ -277,11 +285,11 @@ async def toggle_user_status(
 async def update_user(
     user_id: int,
     user_update: UserUpdateRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """更新用户信息（仅管理员）"""
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -299,9 +307,9 @@ async def update_user(
 
     # 如果要更新用户名，检查是否已存在
     if user_update.username and user_update.username != user.username:
-        existing_username = session.exec(
+        existing_username = (await session.exec(
             select(User).where(User.username == user_update.username).where(User.id != user_id)
-        ).first()
+        )).first()
 
         if existing_username:
             raise HTTPException(
@@ -313,9 +321,9 @@ async def update_user(
 
     # 如果要更新邮箱，检查是否已被其他用户使用
     if user_update.email and user_update.email != user.email:
-        existing_email = session.exec(
+        existing_email = (await session.exec(
             select(User).where(User.email == user_update.email).where(User.id != user_id)
-        ).first()
+        )).first()
 
         if existing_email:
             raise HTTPException(
@@ -329,11 +337,13 @@ async def update_user(
     if user_update.full_name is not None:
         user.full_name = user_update.full_name
 
-    if user_update.role is not None:
+    if user_update.role is not None and user_update.role != user.role:
         user.role = user_update.role
+        user.token_version += 1
 
     session.add(user)
-    session.commit()
+    await session.commit()
+    await principal_cache.invalidate(user_id)
 
     return {"message": "用户信息更新成功"}
 
@@ -341,11 +351,11 @@ async def update_user(
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """删除用户（仅管理员）"""
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -361,12 +371,19 @@ async def delete_user(
         )
 
     # 删除用户（关联的回复、通知等会通过数据库级联删除或保留，取决于数据库配置）
-    session.delete(user)
-    session.commit()
+    await session.delete(user)
+    await session.commit()
+    await principal_cache.invalidate(user_id)
 
     return {"message": "用户删除成功"}
 
 
+@router.get("/cache-stats")
+async def get_auth_cache_stats(current_admin: User = Depends(get_current_admin_user)):
+    """认证用户缓存统计（仅管理员）：命中率、失效次数"""
+    return principal_cache.stats()
+
+
 @router.post("/send-email")
 async def send_email(
     email_request: EmailRequest,
@@ -1,13 +1,43 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import Response
+"""
+文件 API 路由
+下载/预览 URL、本地存储文件下载、批量签名，以及文件缓存统计
+"""
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, List, Literal, Optional, Tuple
 from urllib.parse import unquote, quote
-from utils.s3_storage import s3_storage
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import get_async_session
+from models import User
+from utils.auth import get_current_admin_user
+from utils.file_meta import file_meta, file_meta_cache
+from utils.local_io import local_io_stats, local_reads
+from utils.renditions import rendition_service
+from utils.s3_storage import PRESIGN_SAFETY_MARGIN, presign_cache, s3_storage
 
 router = APIRouter(prefix="/api/file", tags=["文件"])
 
+# 下载/预览 URL 接口的浏览器缓存时间上限（秒），不超过签名 URL 的剩余有效期
+FILE_URL_MAX_AGE = int(os.getenv("FILE_URL_MAX_AGE", "300"))
+# 本地存储文件的缓存时间（秒）：文件键带随机前缀或内容哈希，内容不会变化
+FILE_CACHE_MAX_AGE = int(os.getenv("FILE_CACHE_MAX_AGE", str(365 * 86400)))
+
+
+def _url_cache_control(expire_time: int) -> str:
+    """签名 URL 接口的 Cache-Control：只允许浏览器缓存，且在 URL 过期前失效"""
+    max_age = max(min(FILE_URL_MAX_AGE, expire_time - PRESIGN_SAFETY_MARGIN), 0)
+    return f"private, max-age={max_age}"
+
 
 @router.get("/download")
 async def get_download_url(
+    response: Response,
     key: str = Query(..., description="文件在S3中的键"),
 ):
     """获取文件下载的签名 URL"""
@@ -20,18 +50,165 @@ async def get_download_url(
     if not signed_url:
         raise HTTPException(status_code=500, detail="获取下载链接失败")
 
+    response.headers["Cache-Control"] = _url_cache_control(86400)
     return {
         "success": True,
         "url": signed_url
     }
 
 
+@router.get("/preview")
+async def get_preview_url(
+    response: Response,
+    key: str = Query(..., description="文件在S3中的键"),
+    file_name: Optional[str] = Query(None, description="原始文件名（可选，去重存储时以此为准）"),
+    rendition: Optional[Literal["thumb", "preview"]] = Query(
+        None, description="预览图规格：thumb 缩略图 / preview 预览图（仅图片和 PDF）"
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """获取文件预览 URL 和文件元数据（大小、MIME 类型、预览类型、SHA-256）
+
+    指定 rendition 且预览图已生成时返回 WebP 预览图的 URL（preview_type 为 image），
+    尚未生成或不支持的文件返回原文件，rendition 字段为 null。
+    """
+    if not key:
+        raise HTTPException(status_code=400, detail="缺少文件key")
+
+    meta = await file_meta.describe(session, key, file_name)
+    result = {
+        "success": True,
+        "preview_type": meta["preview_type"],
+        "rendition": None,
+        "file_name": meta["file_name"],
+        "size": meta["size"],
+        "content_type": meta["content_type"],
+        "sha256": meta["sha256"],
+    }
+
+    file_rendition = await rendition_service.get(session, key, rendition) if rendition else None
+    if file_rendition:
+        url_key = file_rendition.key
+        result.update(
+            preview_type="image",
+            rendition=rendition,
+            width=file_rendition.width,
+            height=file_rendition.height,
+        )
+    else:
+        url_key = key
+
+    # 生成签名 URL（1小时有效，用于预览）
+    signed_url = await s3_storage.generate_presigned_url(url_key, expire_time=3600)
+    if not signed_url:
+        raise HTTPException(status_code=500, detail="获取预览链接失败")
+
+    response.headers["Cache-Control"] = _url_cache_control(3600)
+    result["url"] = signed_url
+    return result
+
+
+# 流式读取文件的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 批量签名单次最多的文件数
+PRESIGN_BATCH_LIMIT = 100
+
+
+def _content_disposition(disposition: str, file_name: str) -> str:
+    """生成 Content-Disposition（支持中文文件名）"""
+    # 检查文件名是否包含非 ASCII 字符
+    try:
+        file_name.encode('ascii')
+        # 文件名只包含 ASCII 字符
+        return f"{disposition}; filename=\"{file_name}\""
+    except UnicodeEncodeError:
+        # 文件名包含非 ASCII 字符，使用 RFC 5987 编码
+        encoded_filename = quote(file_name, safe='')
+        return f"{disposition}; filename*=UTF-8''{encoded_filename}"
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """判断 If-None-Match / If-Range 中是否包含当前 ETag（弱比较）"""
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """处理条件请求：客户端缓存仍然有效时返回 True"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个字节范围，返回 (起始, 结束)（含结束位置）
+
+    不支持的格式（如多段范围）返回 None，按完整内容响应；
+    无法满足的范围抛出 416。
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # bytes=-N 表示最后 N 个字节
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="请求的范围无效",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+async def _iter_file_range(file_path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    """分块读取文件的指定范围（在本地读线程池中执行）"""
+    f = await local_reads.run(open, file_path, "rb")
+    try:
+        await local_reads.run(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await local_reads.run(f.read, min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await local_reads.run(f.close)
+
+
 @router.get("/local/{path:path}")
 async def download_local_file(
+    request: Request,
     path: str,
     file_name: str = Query("download", description="原始文件名（可选）"),
+    disposition: Literal["attachment", "inline"] = Query("attachment", description="attachment 下载 / inline 在线预览"),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    """下载本地存储的文件"""
+    """下载本地存储的文件
+
+    直接从磁盘流式返回，支持 Range / If-Range 断点续传和拖动播放，
+    以及 ETag / Last-Modified 条件请求（304）。
+    文件内容不可变，响应带长期缓存头，浏览器和 nginx 可直接缓存。
+    """
     if not path:
         raise HTTPException(status_code=400, detail="缺少文件key")
 
@@ -39,28 +216,90 @@ async def download_local_file(
     file_key = unquote(path)
     decoded_file_name = unquote(file_name)
 
-    # 读取文件内容
-    file_content = await s3_storage.read_file(file_key)
-
-    if not file_content:
+    local_file = await s3_storage.stat_local(file_key)
+    if not local_file:
         raise HTTPException(status_code=404, detail="文件不存在")
 
-    # 处理文件名编码（支持中文）
-    # 检查文件名是否包含非 ASCII 字符
-    try:
-        decoded_file_name.encode('ascii')
-        # 文件名只包含 ASCII 字符
-        content_disposition = f"attachment; filename=\"{decoded_file_name}\""
-    except UnicodeEncodeError:
-        # 文件名包含非 ASCII 字符，使用 RFC 5987 编码
-        encoded_filename = quote(decoded_file_name, safe='')
-        content_disposition = f"attachment; filename*=UTF-8''{encoded_filename}"
-
-    # 返回文件，使用原始文件名
-    return Response(
-        content=file_content,
-        media_type="application/octet-stream",
-        headers={
-            "Content-Disposition": content_disposition
-        }
+    file_path, stat_result = local_file
+    size = stat_result.st_size
+    meta = await file_meta.get(session, file_key)
+    # 已记录元数据时使用内容哈希作为强 ETag，否则按修改时间和大小生成
+    etag_value = meta["sha256"] if meta else f"{stat_result.st_mtime_ns:x}-{size:x}"
+    etag = f'"{etag_value}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"public, max-age={FILE_CACHE_MAX_AGE}, immutable",
+    }
+
+    # 客户端缓存仍然有效
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    # 按文件名或上传时记录的类型返回，便于浏览器直接播放/预览
+    media_type = (
+        mimetypes.guess_type(decoded_file_name)[0]
+        or (meta["content_type"] if meta else None)
+        or mimetypes.guess_type(file_path)[0]
+        or "application/octet-stream"
     )
+    headers["Content-Disposition"] = _content_disposition(disposition, decoded_file_name)
+
+    # Range 请求（If-Range 不匹配时返回完整内容）
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_file_range(file_path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+    # 完整内容：FileResponse 由服务器零拷贝发送（支持 pathsend 时）或分块读取
+    return FileResponse(
+        file_path,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result,
+    )
+
+
+class PresignRequest(BaseModel):
+    keys: List[str] = Field(..., min_length=1, max_length=PRESIGN_BATCH_LIMIT, description="文件键列表")
+    expire_time: int = Field(86400, ge=60, le=7 * 86400, description="有效期（秒）")
+
+
+@router.post("/presign")
+async def batch_presign(request: PresignRequest):
+    """批量获取文件下载 URL（列表页一次请求签名多个文件）"""
+    urls = await s3_storage.generate_presigned_urls(request.keys, expire_time=request.expire_time)
+    return {
+        "success": True,
+        "urls": urls,
+    }
+
+
+@router.get("/presign-stats")
+async def get_presign_stats(current_user: User = Depends(get_current_admin_user)):
+    """签名 URL 缓存统计（仅管理员）：命中、未命中、命中率"""
+    return presign_cache.stats()
+
+
+@router.get("/meta-stats")
+async def get_meta_stats(current_user: User = Depends(get_current_admin_user)):
+    """文件元数据缓存统计（仅管理员）"""
+    return file_meta_cache.stats()
+
+
+@router.get("/io-stats")
+async def get_io_stats(current_user: User = Depends(get_current_admin_user)):
+    """本地存储 I/O 线程池统计（仅管理员）：并发数、排队数、平均排队耗时"""
+    return local_io_stats()
@@ -1,28 +1,50 @@
 """
 通知相关 API 路由
 """
-from typing import List
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlmodel import Session
-
-from models import Notification, NotificationType
-from database import get_session
-from utils.auth import get_current_active_user, User
-from utils.notification import notification_service
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Notification, NotificationSource, NotificationType
+from database import async_engine, get_async_session
+from utils.auth import get_current_active_user, get_user_from_token, User
+from utils.notification import notification_service, notification_sort_key, serialize_notification
+from utils.pubsub import hub
+from utils.pagination import CursorPage, build_page, decode_cursor
+
+# SSE 心跳间隔（秒），避免代理因空闲断开连接
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "25"))
 
 router = APIRouter(prefix="/api/notifications", tags=["通知"])
 
 
-@router.get("", response_model=List[dict])
+@router.get("", response_model=Union[List[dict], CursorPage[dict]])
 async def get_notifications(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     unread_only: bool = Query(False, description="仅获取未读通知"),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串获取第一页，返回 next_cursor）"),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取当前用户的通知"""
-    notifications = notification_service.get_user_notifications(
+    if cursor is not None:
+        notifications = await notification_service.get_user_notifications(
+            session=session,
+            user_id=current_user.id,
+            limit=limit + 1,
+            unread_only=unread_only,
+            after=decode_cursor(cursor, (datetime, NotificationSource, int)),
+        )
+        items, next_cursor = build_page(notifications, limit, notification_sort_key)
+        return CursorPage[dict](items=[serialize_notification(n) for n in items], next_cursor=next_cursor)
+
+    notifications = await notification_service.get_user_notifications(
         session=session,
         user_id=current_user.id,
         skip=skip,
@@ -30,49 +52,99 @@ async def get_notifications(
         unread_only=unread_only
     )
 
-    return [
-        {
-            "id": n.id,
-            "type": n.type.value,
-            "title": n.title,
-            "content": n.content,
-            "is_read": n.is_read,
-            "related_id": n.related_id,
-            "created_at": n.created_at.isoformat(),
-        }
-        for n in notifications
-    ]
+    return [serialize_notification(n) for n in notifications]
 
 
 @router.get("/unread-count")
 async def get_unread_count(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取未读通知数量"""
-    count = notification_service.get_unread_count(
+    count = await notification_service.get_unread_count(
         session=session,
         user_id=current_user.id
     )
     return {"unread_count": count}
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """格式化一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _load_unread_count(user_id: int) -> int:
+    """使用短生命周期会话读取未读数量（推送连接不长期占用数据库连接）"""
+    async with AsyncSession(async_engine) as session:
+        return await notification_service.get_unread_count(session=session, user_id=user_id)
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: str = Query(..., description="访问令牌（EventSource 无法设置请求头）"),
+):
+    """通知推送（Server-Sent Events），替代前端轮询"""
+    async with AsyncSession(async_engine) as session:
+        current_user = await get_user_from_token(session, token)
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="用户未激活")
+    user_id = current_user.id
+
+    async def event_stream():
+        async with hub.subscribe([f"user:{user_id}", "broadcast"]) as subscription:
+            yield "retry: 5000\n\n"
+            yield _sse_event("unread_count", {"unread_count": await _load_unread_count(user_id)})
+
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                if message["event"] == "notification":
+                    if message.get("exclude_user_id") == user_id:
+                        continue
+                    yield _sse_event("notification", message["data"])
+                elif message["event"] == "sync":
+                    yield _sse_event("unread_count", {"unread_count": await _load_unread_count(user_id)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 关闭 nginx 代理缓冲
+        },
+    )
+
+
 @router.post("/{notification_id}/read")
 async def mark_as_read(
     notification_id: int,
-    session: Session = Depends(get_session),
+    source: NotificationSource = Query(NotificationSource.PERSONAL, description="通知来源"),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """标记通知为已读"""
+    if source == NotificationSource.BROADCAST:
+        success = await notification_service.mark_broadcast_as_read(
+            session, current_user.id, notification_id
+        )
+        if not success:
+            raise HTTPException(status_code=404, detail="通知不存在")
+        return {"message": "标记成功"}
+
     # 验证通知是否属于当前用户
-    notification = session.get(Notification, notification_id)
+    notification = await session.get(Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
 
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问此通知")
 
-    success = notification_service.mark_as_read(session, notification_id)
+    success = await notification_service.mark_as_read(session, notification_id)
     if not success:
         raise HTTPException(status_code=404, detail="通知不存在")
 
@@ -81,11 +153,11 @@ async def mark_as_read(
 
 @router.post("/read-all")
 async def mark_all_as_read(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """标记所有通知为已读"""
-    count = notification_service.mark_all_as_read(
+    count = await notification_service.mark_all_as_read(
         session=session,
         user_id=current_user.id
     )
@@ -95,19 +167,28 @@ async def mark_all_as_read(
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: int,
-    session: Session = Depends(get_session),
+    source: NotificationSource = Query(NotificationSource.PERSONAL, description="通知来源"),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除通知"""
+    if source == NotificationSource.BROADCAST:
+        success = await notification_service.dismiss_broadcast(
+            session, current_user.id, notification_id
+        )
+        if not success:
+            raise HTTPException(status_code=404, detail="通知不存在")
+        return {"message": "删除成功"}
+
     # 验证通知是否属于当前用户
-    notification = session.get(Notification, notification_id)
+    notification = await session.get(Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
 
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权删除此通知")
 
-    success = notification_service.delete_notification(session, notification_id)
+    success = await notification_service.delete_notification(session, notification_id)
     if not success:
         raise HTTPException(status_code=404, detail="通知不存在")
 
@@ -1,34 +1,45 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form, Depends
-from sqlmodel import Session, select
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, UploadFile, File, Form, Depends
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models import (
     Response,
     ResponseCreate,
     ResponsePublic,
+    ResponseSummary,
     ResponseWithAnnouncement,
     User,
     Announcement,
 )
-from database import get_session
-from utils.s3_storage import s3_storage
+from database import get_async_session
+from utils.blob_store import blob_store
+from utils.renditions import rendition_service
+from utils.s3_storage import FileTooLargeError
 from utils.auth import get_current_admin_user
+from utils.pagination import CursorPage, build_page, decode_cursor, keyset_order
+from utils.announcement_stats import record_response
+from utils.search_cache import search_cache
+from utils.suggest import suggest_index
+from utils.response_query import load_response_offset_page, load_response_page, parse_response_fields
 
 router = APIRouter(prefix="/api/responses", tags=["回复"])
 
 
 @router.post("", response_model=ResponsePublic)
 async def create_response(
+    background_tasks: BackgroundTasks,
     announcement_id: int = Form(...),
     colleague_name: str = Form(...),
     content: str = Form(...),
     file: Optional[UploadFile] = File(None),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """创建回复（支持文件上传）"""
     # 验证公告是否存在
     # from backend.models import Announcement
-    announcement = session.get(Announcement, announcement_id)
+    announcement = await session.get(Announcement, announcement_id)
     if not announcement:
         raise HTTPException(status_code=404, detail="公告不存在")
 
@@ -38,14 +49,18 @@ async def create_response(
 
     if file and file.filename:
         try:
-            file_content = await file.read()
-            file_key = await s3_storage.upload_file(
-                file_content=file_content,
+            # 分块流式写入存储，不把整个文件读入内存（启用去重时相同内容只存一份）
+            stored = await blob_store.store_upload(
+                session,
+                file,
                 file_name=file.filename,
                 content_type=file.content_type or "application/octet-stream",
             )
+            file_key = stored.key
             file_name = file.filename
             print(f"文件上传成功: {file_key}")
+        except FileTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             print(f"文件上传失败: {e}")
             # 文件上传失败不影响回复提交
@@ -59,37 +74,62 @@ async def create_response(
         file_name=file_name,
     )
     session.add(db_response)
-    session.commit()
-    session.refresh(db_response)
+    # 同一事务内更新公告的回复数和最新回复时间
+    await record_response(session, announcement_id, db_response.created_at)
+    await session.commit()
+    await session.refresh(db_response)
+    await search_cache.invalidate()
+    await suggest_index.publish({"op": "add_names", "names": {db_response.colleague_name: 1}})
+
+    # 后台生成附件预览图（图片缩略图 / PDF 首页）
+    if file_key:
+        background_tasks.add_task(rendition_service.generate_task, file_key, file_name)
 
     return db_response
 
 
-@router.get("/announcement/{announcement_id}", response_model=List[ResponsePublic])
+@router.get(
+    "/announcement/{announcement_id}",
+    response_model=Union[List[ResponseSummary], CursorPage[ResponseSummary]],
+    response_model_exclude_unset=True,
+)
 async def list_responses_by_announcement(
     announcement_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串获取第一页，返回 next_cursor）"),
+    fields: Optional[str] = Query(None, description="字段投影，逗号分隔（如 id,colleague_name,created_at）"),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """获取指定公告的所有回复"""
-    statement = (
-        select(Response)
-        .where(Response.announcement_id == announcement_id)
-        .order_by(Response.created_at.desc())
-        .offset(skip)
-        .limit(limit)
+    selected_fields = parse_response_fields(fields)
+
+    # 游标分页（使用 announcement_id + created_at 复合索引）
+    if cursor is not None:
+        items, next_cursor = await load_response_page(
+            session,
+            announcement_id,
+            limit=limit,
+            after=decode_cursor(cursor, (datetime, int)),
+            fields=selected_fields,
+        )
+        return CursorPage[ResponseSummary](items=items, next_cursor=next_cursor)
+
+    return await load_response_offset_page(
+        session, announcement_id, skip=skip, limit=limit, fields=selected_fields
     )
-    responses = session.exec(statement).all()
-    return responses
 
 
-@router.get("/colleague/{colleague_name}", response_model=List[ResponseWithAnnouncement])
+@router.get(
+    "/colleague/{colleague_name}",
+    response_model=Union[List[ResponseWithAnnouncement], CursorPage[ResponseWithAnnouncement]],
+)
 async def list_responses_by_colleague(
     colleague_name: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串获取第一页，返回 next_cursor）"),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """获取指定同事的所有回复（包含公告标题）"""
     # 使用join查询，获取回复及其对应的公告标题
@@ -97,11 +137,23 @@ async def list_responses_by_colleague(
         select(Response, Announcement.title)
         .join(Announcement, Response.announcement_id == Announcement.id)
         .where(Response.colleague_name == colleague_name)
-        .order_by(Response.created_at.desc())
-        .offset(skip)
-        .limit(limit)
     )
-    results = session.exec(statement).all()
+
+    next_cursor = None
+    if cursor is not None:
+        # 游标分页（使用 colleague_name + created_at 复合索引）
+        after = decode_cursor(cursor, (datetime, int))
+        statement = keyset_order(statement, (Response.created_at, Response.id), after)
+        rows = (await session.exec(statement.limit(limit + 1))).all()
+        results, next_cursor = build_page(rows, limit, lambda row: (row[0].created_at, row[0].id))
+    else:
+        statement = (
+            statement
+            .order_by(Response.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        results = (await session.exec(statement)).all()
 
     # 构建返回数据
     responses = []
@@ -110,16 +162,19 @@ async def list_responses_by_colleague(
         response_dict["announcement_title"] = title
         responses.append(ResponseWithAnnouncement(**response_dict))
 
+    if cursor is not None:
+        return CursorPage[ResponseWithAnnouncement](items=responses, next_cursor=next_cursor)
     return responses
 
 
-@router.get("", response_model=List[ResponsePublic])
+@router.get("", response_model=Union[List[ResponsePublic], CursorPage[ResponsePublic]])
 async def list_all_responses(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     announcement_id: Optional[int] = Query(None),
     colleague_name: Optional[str] = Query(None),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串获取第一页，返回 next_cursor）"),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_admin_user)
 ):
     """获取所有回复（仅管理员，支持筛选）"""
@@ -131,7 +186,14 @@ async def list_all_responses(
     if colleague_name:
         statement = statement.where(Response.colleague_name == colleague_name)
 
+    if cursor is not None:
+        after = decode_cursor(cursor, (datetime, int))
+        statement = keyset_order(statement, (Response.created_at, Response.id), after)
+        rows = (await session.exec(statement.limit(limit + 1))).all()
+        items, next_cursor = build_page(rows, limit, lambda r: (r.created_at, r.id))
+        return CursorPage[ResponsePublic](items=items, next_cursor=next_cursor)
+
     statement = statement.order_by(Response.created_at.desc()).offset(skip).limit(limit)
 
-    responses = session.exec(statement).all()
+    responses = (await session.exec(statement)).all()
     return responses
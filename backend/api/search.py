@@ -1,57 +1,195 @@
 """
 搜索相关 API 路由
-使用 PostgreSQL 全文搜索功能
+PostgreSQL 匹配预先计算的 search_vector 列，SQLite 使用 FTS5（BM25 排序），见 utils/fulltext.py；
+结果页缓存在 utils/search_cache.py，写入时失效。
+结果默认只返回带 <mark> 标记的摘要（snippet），full_content=true 时同时返回完整内容；
+筛选条件（类型、时间范围、同事、公告）与全文匹配在同一条 SQL 中执行
 """
+from dataclasses import astuple, dataclass
+from datetime import datetime, timezone
 from typing import List, Optional
-from fastapi import APIRouter, Query, Depends
-from sqlmodel import Session, text
+from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy import DateTime, bindparam
+from sqlmodel import text
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import Announcement, Response, AnnouncementPublic, ResponsePublic
-from database import get_session
-from utils.auth import get_current_active_user, User
+from models import Announcement, AnnouncementType, Response, AnnouncementPublic, ResponsePublic
+from database import get_async_session, IS_SQLITE
+from utils.auth import get_current_active_user, get_current_admin_user, User
+from utils.fulltext import headline_expression, result_snippet, search_param, search_source
+from utils.pagination import build_page, decode_cursor
+from utils.search_cache import search_cache
+from utils.suggest import suggest_index
 
 router = APIRouter(prefix="/api/search", tags=["搜索"])
 
+# 全文搜索片段（按数据库类型选择）
+ANNOUNCEMENT_SEARCH = search_source("announcement", "a", IS_SQLITE)
+RESPONSE_SEARCH = search_source("response", "r", IS_SQLITE)
+
+# SQLite 返回的时间是字符串，需声明列类型
+DATETIME_COLUMNS = {"created_at": DateTime, "updated_at": DateTime}
+
+
+def _typed(sql: str, *columns: str):
+    return text(sql).columns(**{name: DATETIME_COLUMNS[name] for name in columns})
+
+
+def _with_snippet(page_sql: str, content_column: str, order_by: str) -> str:
+    """在分页结果外层计算摘要列，ts_headline 只对当前页执行"""
+    return f"""
+        SELECT page.*, {headline_expression(f"page.{content_column}", IS_SQLITE)} AS snippet
+        FROM ({page_sql}) AS page
+        ORDER BY {order_by}
+    """
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """搜索筛选条件
+
+    - type：公告类型，回复按所属公告的类型筛选
+    - created_after / created_before：创建时间范围 [after, before)
+    - colleague_name：回复按同事姓名筛选，公告筛选该同事回复过的公告
+    - announcement_id：公告按 ID 筛选，回复筛选该公告下的回复
+    """
+    type: Optional[AnnouncementType] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    colleague_name: Optional[str] = None
+    announcement_id: Optional[int] = None
+
+    def _time_conditions(self, alias: str) -> list:
+        conditions = []
+        if self.created_after:
+            conditions.append(f"{alias}.created_at >= :created_after")
+        if self.created_before:
+            conditions.append(f"{alias}.created_at < :created_before")
+        return conditions
+
+    def announcement_where(self) -> str:
+        """公告（别名 a）的附加条件"""
+        conditions = self._time_conditions("a")
+        if self.type:
+            conditions.append("a.type = :type")
+        if self.announcement_id is not None:
+            conditions.append("a.id = :announcement_id")
+        if self.colleague_name:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM response rc "
+                "WHERE rc.announcement_id = a.id AND rc.colleague_name = :colleague_name)"
+            )
+        return "".join(f" AND {condition}" for condition in conditions)
+
+    def response_where(self) -> str:
+        """回复（别名 r，所属公告别名 a）的附加条件"""
+        conditions = self._time_conditions("r")
+        if self.type:
+            conditions.append("a.type = :type")
+        if self.announcement_id is not None:
+            conditions.append("r.announcement_id = :announcement_id")
+        if self.colleague_name:
+            conditions.append("r.colleague_name = :colleague_name")
+        return "".join(f" AND {condition}" for condition in conditions)
+
+    def params(self) -> dict:
+        params = {
+            'created_after': self.created_after,
+            'created_before': self.created_before,
+            'colleague_name': self.colleague_name,
+            'announcement_id': self.announcement_id,
+            # 枚举列按名称存储
+            'type': self.type.name if self.type else None,
+        }
+        return {name: value for name, value in params.items() if value is not None}
+
+    def bind(self, statement):
+        """时间参数按 DateTime 类型绑定（SQLite 中与存储格式一致）"""
+        names = [name for name in ('created_after', 'created_before') if getattr(self, name)]
+        if names:
+            statement = statement.bindparams(*(bindparam(name, type_=DateTime) for name in names))
+        return statement
+
+    def key(self) -> tuple:
+        return astuple(self)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """带时区的时间转换为 UTC（数据库中存储的是不带时区的 UTC 时间）"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def search_filters(
+    type: Optional[AnnouncementType] = Query(None, description="公告类型（回复按所属公告的类型）"),
+    created_after: Optional[datetime] = Query(None, description="创建时间不早于"),
+    created_before: Optional[datetime] = Query(None, description="创建时间早于"),
+    colleague_name: Optional[str] = Query(None, min_length=1, description="同事姓名（公告为该同事回复过的公告）"),
+    announcement_id: Optional[int] = Query(None, description="公告ID（回复为该公告下的回复）"),
+) -> SearchFilters:
+    """搜索筛选条件（所有 /api/search 全文搜索接口共用）"""
+    filters = SearchFilters(
+        type=type,
+        created_after=_naive_utc(created_after),
+        created_before=_naive_utc(created_before),
+        colleague_name=colleague_name,
+        announcement_id=announcement_id,
+    )
+    if filters.created_after and filters.created_before and filters.created_after >= filters.created_before:
+        raise HTTPException(status_code=400, detail="created_after 必须早于 created_before")
+    return filters
+
 
 @router.get("/announcements", response_model=List[dict])
 async def search_announcements(
     q: str = Query(..., min_length=1, description="搜索关键词"),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    session: Session = Depends(get_session),
+    full_content: bool = Query(False, description="同时返回完整内容"),
+    filters: SearchFilters = Depends(search_filters),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """全文搜索公告"""
-    # 使用 PostgreSQL 全文搜索
-    search_query = text("""
+    query = search_param(q, IS_SQLITE)
+    if query is None:
+        return []
+
+    cache_key = search_cache.key("announcements", q, skip, limit, full_content, filters.key())
+    generation = search_cache.generation
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    search_query = filters.bind(_typed(_with_snippet(f"""
         SELECT
-            id,
-            title,
-            content,
-            type,
-            created_at,
-            updated_at,
-            ts_rank(
-                to_tsvector('chinese', title || ' ' || content),
-                plainto_tsquery('chinese', :query)
-            ) as rank
-        FROM announcement
-        WHERE to_tsvector('chinese', title || ' ' || content) @@ plainto_tsquery('chinese', :query)
+            a.id,
+            a.title,
+            a.content,
+            a.type,
+            a.created_at,
+            a.updated_at,
+            {ANNOUNCEMENT_SEARCH.rank} as rank
+        FROM {ANNOUNCEMENT_SEARCH.from_clause}
+        WHERE {ANNOUNCEMENT_SEARCH.where}{filters.announcement_where()}
         ORDER BY rank DESC
         LIMIT :limit OFFSET :skip
-    """)
+    """, "content", "rank DESC"), "created_at", "updated_at"))
 
-    results = session.exec(search_query, {
-        'query': q,
+    results = (await session.execute(search_query, {
+        'query': query,
         'limit': limit,
         'skip': skip,
-    }).all()
+        **filters.params(),
+    })).all()
 
-    return [
+    results = [
         {
             'id': row.id,
             'title': row.title,
-            'content': row.content,
+            'snippet': result_snippet(row.snippet, row.content, q),
+            **({'content': row.content} if full_content else {}),
             'type': row.type,
             'created_at': row.created_at.isoformat(),
             'updated_at': row.updated_at.isoformat() if row.updated_at else None,
@@ -59,6 +197,8 @@ async def search_announcements(
         }
         for row in results
     ]
+    search_cache.set(cache_key, generation, results)
+    return results
 
 
 @router.get("/responses", response_model=List[dict])
@@ -66,12 +206,23 @@ async def search_responses(
     q: str = Query(..., min_length=1, description="搜索关键词"),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    session: Session = Depends(get_session),
+    full_content: bool = Query(False, description="同时返回完整内容"),
+    filters: SearchFilters = Depends(search_filters),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """全文搜索回复"""
-    # 使用 PostgreSQL 全文搜索
-    search_query = text("""
+    query = search_param(q, IS_SQLITE)
+    if query is None:
+        return []
+
+    cache_key = search_cache.key("responses", q, skip, limit, full_content, filters.key())
+    generation = search_cache.generation
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    search_query = filters.bind(_typed(_with_snippet(f"""
         SELECT
             r.id,
             r.announcement_id,
@@ -81,30 +232,29 @@ async def search_responses(
             r.file_name,
             r.created_at,
             a.title as announcement_title,
-            ts_rank(
-                to_tsvector('chinese', r.colleague_name || ' ' || r.content),
-                plainto_tsquery('chinese', :query)
-            ) as rank
-        FROM response r
+            {RESPONSE_SEARCH.rank} as rank
+        FROM {RESPONSE_SEARCH.from_clause}
         LEFT JOIN announcement a ON r.announcement_id = a.id
-        WHERE to_tsvector('chinese', r.colleague_name || ' ' || r.content) @@ plainto_tsquery('chinese', :query)
+        WHERE {RESPONSE_SEARCH.where}{filters.response_where()}
         ORDER BY rank DESC
         LIMIT :limit OFFSET :skip
-    """)
+    """, "content", "rank DESC"), "created_at"))
 
-    results = session.exec(search_query, {
-        'query': q,
+    results = (await session.execute(search_query, {
+        'query': query,
         'limit': limit,
         'skip': skip,
-    }).all()
+        **filters.params(),
+    })).all()
 
-    return [
+    results = [
         {
             'id': row.id,
             'announcement_id': row.announcement_id,
             'announcement_title': row.announcement_title,
             'colleague_name': row.colleague_name,
-            'content': row.content,
+            'snippet': result_snippet(row.snippet, row.content, q),
+            **({'content': row.content} if full_content else {}),
             'file_key': row.file_key,
             'file_name': row.file_name,
             'created_at': row.created_at.isoformat(),
@@ -112,6 +262,76 @@ async def search_responses(
         }
         for row in results
     ]
+    search_cache.set(cache_key, generation, results)
+    return results
+
+
+@router.get("/suggest", response_model=dict)
+async def search_suggest(
+    q: str = Query(..., min_length=1, max_length=50, description="已输入的前缀"),
+    limit: int = Query(8, ge=1, le=20),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """输入即搜的搜索建议：匹配公告标题和同事姓名的前缀
+
+    查询内存中的前缀索引（见 utils/suggest.py），不访问数据库；完整结果请使用 /all。
+    """
+    await suggest_index.ensure_built(session)
+    return {'query': q, 'suggestions': suggest_index.lookup(q, limit)}
+
+
+@router.get("/suggest-stats")
+async def get_suggest_stats(current_user: User = Depends(get_current_admin_user)):
+    """搜索建议索引统计（仅管理员）：条目数、标题数、姓名数、淘汰数"""
+    return suggest_index.stats()
+
+
+@router.get("/cache-stats")
+async def get_search_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """搜索结果缓存统计（仅管理员）：条目数、占用字节、命中率、语料代数"""
+    return search_cache.stats()
+
+
+def unified_search_sql(after: bool, filters: SearchFilters = SearchFilters()) -> str:
+    """公告与回复合并为一个 UNION ALL 查询，统一按相关性排序分页
+
+    count(*) OVER () 在分页前计算匹配总数；排序键 (rank, type, id) 唯一，用作游标。
+    """
+    cursor_filter = "WHERE (rank, type, id) < (:cursor_rank, :cursor_type, :cursor_id)" if after else ""
+    return _with_snippet(f"""
+        SELECT type, id, display_title, display_content, announcement_title, created_at, rank, total
+        FROM (
+            SELECT hits.*, count(*) OVER () AS total
+            FROM (
+                SELECT
+                    'announcement' as type,
+                    a.id,
+                    a.title as display_title,
+                    a.content as display_content,
+                    NULL as announcement_title,
+                    a.created_at,
+                    {ANNOUNCEMENT_SEARCH.rank} as rank
+                FROM {ANNOUNCEMENT_SEARCH.from_clause}
+                WHERE {ANNOUNCEMENT_SEARCH.where}{filters.announcement_where()}
+                UNION ALL
+                SELECT
+                    'response' as type,
+                    r.id,
+                    a.title as display_title,
+                    r.content as display_content,
+                    a.title as announcement_title,
+                    r.created_at,
+                    {RESPONSE_SEARCH.rank} as rank
+                FROM {RESPONSE_SEARCH.from_clause}
+                LEFT JOIN announcement a ON r.announcement_id = a.id
+                WHERE {RESPONSE_SEARCH.where}{filters.response_where()}
+            ) AS hits
+        ) AS counted
+        {cursor_filter}
+        ORDER BY rank DESC, type DESC, id DESC
+        LIMIT :limit OFFSET :skip
+    """, "display_content", "rank DESC, type DESC, id DESC")
 
 
 @router.get("/all", response_model=dict)
@@ -119,93 +339,61 @@ async def search_all(
     q: str = Query(..., min_length=1, description="搜索关键词"),
     skip: int = Query(0, ge=0),
     limit: int = Query(5, ge=1, le=50),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    full_content: bool = Query(False, description="同时返回完整内容"),
+    filters: SearchFilters = Depends(search_filters),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
-    """全文搜索公告和回复"""
-    # 搜索公告
-    announcement_query = text("""
-        SELECT
-            'announcement' as type,
-            id,
-            title as display_title,
-            content as display_content,
-            NULL as announcement_title,
-            created_at,
-            ts_rank(
-                to_tsvector('chinese', title || ' ' || content),
-                plainto_tsquery('chinese', :query)
-            ) as rank
-        FROM announcement
-        WHERE to_tsvector('chinese', title || ' ' || content) @@ plainto_tsquery('chinese', :query)
-        ORDER BY rank DESC
-        LIMIT :limit OFFSET :skip
-    """)
+    """全文搜索公告和回复
 
-    announcements = session.exec(announcement_query, {
-        'query': q,
-        'limit': limit,
-        'skip': skip,
-    }).all()
+    公告和回复在同一个查询中统一排序，total_count 为匹配总数。
+    翻页可使用 skip，或传入上一页的 next_cursor（翻页期间有新数据时不会重复或遗漏）。
+    """
+    query = search_param(q, IS_SQLITE)
+    if query is None:
+        return {'query': q, 'total_count': 0, 'results': [], 'next_cursor': None}
 
-    # 搜索回复
-    response_query = text("""
-        SELECT
-            'response' as type,
-            r.id,
-            a.title as display_title,
-            r.content as display_content,
-            a.title as announcement_title,
-            r.created_at,
-            ts_rank(
-                to_tsvector('chinese', r.colleague_name || ' ' || r.content),
-                plainto_tsquery('chinese', :query)
-            ) as rank
-        FROM response r
-        LEFT JOIN announcement a ON r.announcement_id = a.id
-        WHERE to_tsvector('chinese', r.colleague_name || ' ' || r.content) @@ plainto_tsquery('chinese', :query)
-        ORDER BY rank DESC
-        LIMIT :limit OFFSET :skip
-    """)
+    after = decode_cursor(cursor, (float, str, int))
+    cache_key = search_cache.key("all", q, skip, limit, cursor, full_content, filters.key())
+    generation = search_cache.generation
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    responses = session.exec(response_query, {
-        'query': q,
-        'limit': limit,
-        'skip': skip,
-    }).all()
-
-    # 合并结果并按相关性排序
-    all_results = []
-    all_results.extend([
-        {
-            'type': row.type,
-            'id': row.id,
-            'display_title': row.display_title,
-            'display_content': row.display_content,
-            'announcement_title': row.announcement_title,
-            'created_at': row.created_at.isoformat(),
-            'relevance': row.rank,
-        }
-        for row in announcements
-    ])
-    all_results.extend([
-        {
-            'type': row.type,
-            'id': row.id,
-            'display_title': row.display_title,
-            'display_content': row.display_content,
-            'announcement_title': row.announcement_title,
-            'created_at': row.created_at.isoformat(),
-            'relevance': row.rank,
-        }
-        for row in responses
-    ])
+    params = {
+        'query': query,
+        # 多查询一条用于判断是否还有下一页
+        'limit': limit + 1,
+        'skip': 0 if after else skip,
+        **filters.params(),
+    }
+    if after:
+        params.update(cursor_rank=after[0], cursor_type=after[1], cursor_id=after[2])
 
-    # 按相关性排序
-    all_results.sort(key=lambda x: x['relevance'], reverse=True)
+    rows = (await session.execute(
+        filters.bind(_typed(unified_search_sql(after is not None, filters), "created_at")), params
+    )).all()
+    page, next_cursor = build_page(rows, limit, lambda row: (row.rank, row.type, row.id))
 
-    return {
+    result = {
         'query': q,
-        'total_count': len(all_results),
-        'results': all_results,
+        # 越过最后一页时没有返回行，总数为 0
+        'total_count': rows[0].total if rows else 0,
+        'results': [
+            {
+                'type': row.type,
+                'id': row.id,
+                'display_title': row.display_title,
+                'snippet': result_snippet(row.snippet, row.display_content, q),
+                **({'display_content': row.display_content} if full_content else {}),
+                'announcement_title': row.announcement_title,
+                'created_at': row.created_at.isoformat(),
+                'relevance': row.rank,
+            }
+            for row in page
+        ],
+        'next_cursor': next_cursor,
     }
+    search_cache.set(cache_key, generation, result)
+    return result
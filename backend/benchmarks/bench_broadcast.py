@@ -0,0 +1,157 @@
+"""
+广播通知基准测试：逐行 ORM 扇出 vs INSERT ... SELECT vs 广播表（fan-out-on-read）
+
+在独立的 SQLite 临时库（或 --database-url 指定的数据库）中
+生成 1k / 10k / 100k 个用户，分别测量三种广播方式的耗时与峰值内存。
+
+用法：
+    cd backend
+    python benchmarks/bench_broadcast.py
+    python benchmarks/bench_broadcast.py --sizes 1000 10000 --database-url postgresql://...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, literal
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import _to_async_url
+from models import BroadcastNotification, Notification, NotificationType, User
+from utils.notification import NotificationService
+
+
+async def legacy_broadcast(session: AsyncSession) -> int:
+    """改造前的实现：加载全部用户，逐个创建 ORM 对象"""
+    users = (await session.exec(select(User))).all()
+    count = 0
+    for user in users:
+        if not user.is_active:
+            continue
+        session.add(Notification(
+            user_id=user.id,
+            type=NotificationType.NEW_ANNOUNCEMENT,
+            title="基准测试",
+            content="基准测试通知",
+            related_id=1,
+            is_read=False,
+        ))
+        count += 1
+    await session.commit()
+    return count
+
+
+async def bulk_broadcast(session: AsyncSession) -> int:
+    """集合式扇出：一条 INSERT ... SELECT 为每个激活用户写入一行"""
+    notification_table = Notification.__table__
+    users = select(
+        User.id,
+        literal(NotificationType.NEW_ANNOUNCEMENT, notification_table.c.type.type),
+        literal("基准测试", notification_table.c.title.type),
+        literal("基准测试通知", notification_table.c.content.type),
+        literal(False, notification_table.c.is_read.type),
+        literal(1, notification_table.c.related_id.type),
+        literal(datetime.utcnow(), notification_table.c.created_at.type),
+    ).where(User.is_active.is_(True))
+    result = await session.exec(
+        insert(Notification).from_select(
+            ["user_id", "type", "title", "content", "is_read", "related_id", "created_at"],
+            users,
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def broadcast_table(session: AsyncSession) -> int:
+    """当前实现：广播表只写一行，读取时合并"""
+    await NotificationService.broadcast_notification(
+        session=session,
+        type=NotificationType.NEW_ANNOUNCEMENT,
+        title="基准测试",
+        content="基准测试通知",
+        related_id=1,
+    )
+    return 1
+
+
+async def measure(async_engine, name: str, func) -> None:
+    """测量一次广播的耗时和 Python 侧峰值内存"""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        await session.exec(delete(Notification))
+        await session.exec(delete(BroadcastNotification))
+        await session.commit()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = await func(session)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"  {name:<20} {count:>8} 条  {elapsed * 1000:>9.1f}ms  峰值内存 {peak / 1024 / 1024:>7.1f}MB")
+
+
+async def run(database_url: str, sizes: list) -> None:
+    sync_engine = create_engine(database_url)
+    SQLModel.metadata.drop_all(sync_engine)
+    SQLModel.metadata.create_all(sync_engine)
+    async_engine = create_async_engine(_to_async_url(database_url))
+
+    for size in sizes:
+        with sync_engine.begin() as conn:
+            conn.execute(delete(Notification))
+            conn.execute(delete(User))
+            conn.execute(insert(User), [
+                {
+                    "username": f"bench{i}",
+                    "email": f"bench{i}@example.com",
+                    "hashed_password": "x",
+                    "full_name": f"用户{i}",
+                    "role": "USER",
+                    "is_active": i % 10 != 0,  # 10% 未激活用户
+                }
+                for i in range(size)
+            ])
+
+        print(f"\n📊 {size} 个用户")
+        await measure(async_engine, "逐行 ORM（改造前）", legacy_broadcast)
+        await measure(async_engine, "INSERT ... SELECT", bulk_broadcast)
+        await measure(async_engine, "广播表（当前实现）", broadcast_table)
+
+    await async_engine.dispose()
+    SQLModel.metadata.drop_all(sync_engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="广播通知基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="用户规模")
+    parser.add_argument("--database-url", help="测试数据库（默认使用临时 SQLite 文件，会清空其中的表）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("广播通知基准测试")
+    print("=" * 60)
+
+    if args.database_url:
+        asyncio.run(run(args.database_url, args.sizes))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(run(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}", args.sizes))
+
+
+if __name__ == "__main__":
+    main()
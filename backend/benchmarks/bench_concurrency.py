@@ -0,0 +1,153 @@
+"""
+并发吞吐基准测试：同步会话 vs 异步会话
+
+两种模式：
+1. 进程内对比（默认）：在同一个事件循环中并发执行慢查询，
+   分别使用同步 Session（旧路径）和 AsyncSession（新路径），
+   统计总耗时、吞吐量以及事件循环最大卡顿时间。
+2. HTTP 压测（--url）：对运行中的服务并发发起请求，
+   可在改造前后的版本上分别运行以对比吞吐量。
+
+用法：
+    cd backend
+    python benchmarks/bench_concurrency.py --concurrency 50 --requests 500
+    python benchmarks/bench_concurrency.py --url http://localhost:8000/api/announcements --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import Session, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import engine, async_engine, IS_SQLITE
+
+# 模拟慢查询：PostgreSQL 使用 pg_sleep，SQLite 使用递归 CTE 消耗 CPU
+if IS_SQLITE:
+    SLOW_QUERY = text("""
+        WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000)
+        SELECT count(*) FROM c
+    """)
+else:
+    SLOW_QUERY = text("SELECT pg_sleep(0.05)")
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """测量事件循环最大卡顿时间（秒）"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def run_sync_path(total: int, concurrency: int) -> list:
+    """旧路径：在 async 协程中调用同步 Session"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            with Session(engine) as session:
+                session.exec(SLOW_QUERY).all()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+async def run_async_path(total: int, concurrency: int) -> list:
+    """新路径：使用 AsyncSession"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            async with AsyncSession(async_engine) as session:
+                (await session.exec(SLOW_QUERY)).all()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+async def run_http(url: str, total: int, concurrency: int, token: str = None) -> list:
+    """对运行中的服务发起并发 HTTP 请求"""
+    import httpx
+
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(headers=headers, timeout=60) as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def report(name: str, latencies: list, elapsed: float, max_lag: float = None):
+    """输出统计结果"""
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"\n📊 {name}")
+    print(f"  请求数:     {len(latencies)}")
+    print(f"  总耗时:     {elapsed:.2f}s")
+    print(f"  吞吐量:     {len(latencies) / elapsed:.1f} req/s")
+    print(f"  p50 延迟:   {statistics.median(latencies) * 1000:.1f}ms")
+    print(f"  p95 延迟:   {p95 * 1000:.1f}ms")
+    if max_lag is not None:
+        print(f"  事件循环最大卡顿: {max_lag * 1000:.1f}ms")
+
+
+async def timed(name: str, coro_factory):
+    """运行一组请求并同时测量事件循环卡顿"""
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    latencies = await coro_factory()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    report(name, latencies, elapsed, await lag_task)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="并发吞吐基准测试")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--requests", type=int, default=200, help="总请求数")
+    parser.add_argument("--url", help="压测运行中的服务（HTTP 模式）")
+    parser.add_argument("--token", help="HTTP 模式下的 Bearer 令牌")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("并发吞吐基准测试")
+    print("=" * 60)
+
+    if args.url:
+        await timed(
+            f"HTTP {args.url}",
+            lambda: run_http(args.url, args.requests, args.concurrency, args.token),
+        )
+    else:
+        await timed("同步 Session（改造前）", lambda: run_sync_path(args.requests, args.concurrency))
+        await timed("AsyncSession（改造后）", lambda: run_async_path(args.requests, args.concurrency))
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+"""
+全文搜索基准测试：to_tsvector 表达式 vs 预先计算的 search_vector 生成列
+
+在独立 schema（bench_search）中生成 N 条回复，分别测量：
+1. expression：改造前的写法，WHERE 与 ts_rank 中各计算一次 to_tsvector（有表达式 GIN 索引）
+2. vector：search_vector 生成列 + GIN 索引，ts_rank 直接读取已存储的向量
+报告建索引耗时和各查询词的 p50 / p95 延迟，结束后删除 schema。
+
+需要 PostgreSQL（DATABASE_URL 或 --database-url）。默认使用 simple 配置，
+安装了 zhparser 时可加 --config chinese。
+
+用法：
+    cd backend
+    python benchmarks/bench_search_vector.py
+    python benchmarks/bench_search_vector.py --rows 1000000 --repeat 20
+    python benchmarks/bench_search_vector.py --config chinese --keep
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from utils.fulltext import search_vector_expression
+
+SCHEMA = "bench_search"
+# 词表：常见词命中大量行，少见词只命中少量行
+COMMON_WORDS = ["会议", "通知", "安排", "项目", "进度", "报告", "部门", "同意", "收到", "确认"]
+RARE_WORDS = ["预算审批", "年度体检", "消防演练", "系统升级", "团建活动"]
+NAMES = ["张三", "李四", "王五", "赵六", "钱七", "孙八", "周九", "吴十"]
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(int(len(ordered) * fraction), len(ordered) - 1)
+    return ordered[index]
+
+
+def populate(conn, rows: int, batch: int) -> None:
+    """生成回复数据：每条 20 个词，其中少见词约占 1%"""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"""
+        CREATE TABLE {SCHEMA}.response (
+            id SERIAL PRIMARY KEY,
+            colleague_name TEXT NOT NULL,
+            content TEXT NOT NULL
+        )
+    """))
+    params = {"common": COMMON_WORDS, "rare": RARE_WORDS, "names": NAMES}
+    for start in range(0, rows, batch):
+        stop = min(start + batch, rows)
+        # 子查询引用 g，确保每行单独生成内容
+        conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.response (colleague_name, content)
+            SELECT
+                (:names)[1 + g % cardinality(:names)],
+                array_to_string(ARRAY(
+                    SELECT CASE WHEN random() < 0.0005
+                        THEN (:rare)[1 + floor(random() * cardinality(:rare))::int]
+                        ELSE (:common)[1 + floor(random() * cardinality(:common))::int]
+                    END
+                    FROM generate_series(1, 20 + g * 0)
+                ), ' ')
+            FROM generate_series(:start, :stop - 1) AS g
+        """), {**params, "start": start, "stop": stop})
+        print(f"  已生成 {stop}/{rows}", end="\r")
+    print()
+    conn.execute(text(f"ANALYZE {SCHEMA}.response"))
+
+
+def timed(conn, statement: str) -> float:
+    start = time.perf_counter()
+    conn.execute(text(statement))
+    return time.perf_counter() - start
+
+
+def run_queries(conn, sql: str, words: list, repeat: int) -> dict:
+    results = {}
+    for word in words:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(text(sql), {"query": word}).all()
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[word] = latencies
+    return results
+
+
+def report(mode: str, results: dict) -> None:
+    print(f"\n[{mode}]")
+    print(f"{'查询词':<10} {'p50(ms)':>10} {'p95(ms)':>10} {'平均(ms)':>10}")
+    for word, latencies in results.items():
+        print(
+            f"{word:<10} {percentile(latencies, 0.5):>10.2f} "
+            f"{percentile(latencies, 0.95):>10.2f} {statistics.mean(latencies):>10.2f}"
+        )
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="全文搜索基准测试（PostgreSQL）")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=1_000_000, help="回复数量")
+    parser.add_argument("--batch", type=int, default=100_000, help="每批插入行数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询词重复次数")
+    parser.add_argument("--limit", type=int, default=10, help="每次查询返回条数")
+    parser.add_argument("--config", default="simple", help="文本搜索配置（simple / chinese）")
+    parser.add_argument("--keep", action="store_true", help="保留测试 schema")
+    args = parser.parse_args()
+
+    if not args.database_url or args.database_url.startswith("sqlite"):
+        print("需要 PostgreSQL：请设置 DATABASE_URL 或传入 --database-url")
+        sys.exit(1)
+
+    engine = create_engine(args.database_url.replace("postgres://", "postgresql://", 1))
+    config = args.config
+    words = COMMON_WORDS[:2] + RARE_WORDS[:2]
+    legacy_expression = f"to_tsvector('{config}', colleague_name || ' ' || content)"
+    vector_expression = search_vector_expression("colleague_name", "content", config)
+
+    expression_sql = f"""
+        SELECT id, ts_rank({legacy_expression}, plainto_tsquery('{config}', :query)) AS rank
+        FROM {SCHEMA}.response
+        WHERE {legacy_expression} @@ plainto_tsquery('{config}', :query)
+        ORDER BY rank DESC
+        LIMIT {args.limit}
+    """
+    vector_sql = f"""
+        SELECT id, ts_rank(search_vector, query) AS rank
+        FROM {SCHEMA}.response
+        CROSS JOIN plainto_tsquery('{config}', :query) AS query
+        WHERE search_vector @@ query
+        ORDER BY rank DESC
+        LIMIT {args.limit}
+    """
+
+    with engine.connect() as conn:
+        print(f"生成 {args.rows} 条回复...")
+        populate(conn, args.rows, args.batch)
+        conn.commit()
+
+        # 1. 表达式索引
+        elapsed = timed(conn, f"CREATE INDEX bench_response_expr ON {SCHEMA}.response USING gin({legacy_expression})")
+        conn.commit()
+        print(f"表达式 GIN 索引: {elapsed:.1f}s")
+        expression_results = run_queries(conn, expression_sql, words, args.repeat)
+        timed(conn, f"DROP INDEX {SCHEMA}.bench_response_expr")
+
+        # 2. 生成列 + GIN 索引
+        elapsed = timed(conn, f"""
+            ALTER TABLE {SCHEMA}.response ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS ({vector_expression}) STORED
+        """)
+        elapsed += timed(conn, f"CREATE INDEX bench_response_vector ON {SCHEMA}.response USING gin(search_vector)")
+        timed(conn, f"ANALYZE {SCHEMA}.response")
+        conn.commit()
+        print(f"search_vector 生成列 + GIN 索引: {elapsed:.1f}s")
+        vector_results = run_queries(conn, vector_sql, words, args.repeat)
+
+        report("expression", expression_results)
+        report("vector", vector_results)
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
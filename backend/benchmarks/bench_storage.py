@@ -0,0 +1,139 @@
+"""
+存储后端吞吐基准测试：上传、签名 URL、下载到本地
+
+对所选后端并发上传若干个同样大小的文件，再批量生成签名 URL、逐个下载回本地，
+报告各阶段耗时与吞吐，结束后删除测试文件。
+
+s3 后端可对接本地 MinIO 或 moto：
+    docker run -p 9000:9000 minio/minio server /data        # 或 moto_server -p 5000
+    python benchmarks/bench_storage.py --backend s3 --endpoint-url http://127.0.0.1:9000 \\
+        --bucket bench --access-key minioadmin --secret-key minioadmin --create-bucket
+
+用法：
+    cd backend
+    python benchmarks/bench_storage.py --backend local
+    python benchmarks/bench_storage.py --backend local --size-mb 64 --count 8 --concurrency 4
+    python benchmarks/bench_storage.py --backend coze       # 使用 .env 中的 coze 配置
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def build_backend(args):
+    from utils.s3_storage import create_backend
+    from utils.storage_backends import Boto3S3Backend, LocalStorageBackend
+
+    if args.backend == "local":
+        return LocalStorageBackend(args.local_path or tempfile.mkdtemp(prefix="bench_storage_"))
+    if args.backend == "s3" and args.endpoint_url:
+        backend = Boto3S3Backend(
+            bucket=args.bucket,
+            endpoint_url=args.endpoint_url,
+            region=args.region,
+            access_key=args.access_key,
+            secret_key=args.secret_key,
+        )
+        if args.create_bucket:
+            try:
+                backend.client.create_bucket(Bucket=args.bucket)
+            except backend.client.exceptions.BucketAlreadyOwnedByYou:
+                pass
+        return backend
+    # 其余情况按 .env 配置创建
+    return create_backend(args.backend)
+
+
+def make_source(size: int) -> str:
+    """生成测试文件（内容随机），返回路径"""
+    fd, path = tempfile.mkstemp(suffix=".bin")
+    block = os.urandom(1024 * 1024)
+    with os.fdopen(fd, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[:size % len(block)])
+    return path
+
+
+def report(stage: str, elapsed: float, count: int, total_bytes: int = 0) -> None:
+    line = f"{stage:<8} {elapsed:8.3f}s  {count / elapsed:10.1f} ops/s"
+    if total_bytes:
+        line += f"  {total_bytes / elapsed / (1024 * 1024):8.1f} MB/s"
+    print(line)
+
+
+async def run(args) -> None:
+    from utils.s3_storage import S3StorageService
+
+    backend = build_backend(args)
+    if backend is None:
+        print(f"后端 {args.backend} 不可用，请检查配置或依赖")
+        return
+    service = S3StorageService(backend)
+
+    size = int(args.size_mb * 1024 * 1024)
+    source_path = make_source(size)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def upload(index: int) -> str:
+        async with semaphore:
+            with open(source_path, "rb") as f:
+                stored = await service.upload_stream(
+                    f, f"bench_{index}.bin", "application/octet-stream", max_size=None
+                )
+            return stored.key
+
+    async def fetch(key: str) -> None:
+        async with semaphore:
+            local_file = await service.fetch_to_local(key)
+            if local_file and local_file[1]:
+                os.remove(local_file[0])
+
+    print(f"后端: {backend.name}  文件: {args.count} x {args.size_mb}MB  并发: {args.concurrency}")
+    try:
+        start = time.perf_counter()
+        keys = await asyncio.gather(*(upload(i) for i in range(args.count)))
+        report("upload", time.perf_counter() - start, args.count, size * args.count)
+
+        # 重复签名同一批键，体现签名 URL 缓存的效果
+        start = time.perf_counter()
+        for _ in range(args.presign_rounds):
+            await service.generate_presigned_urls(keys, 3600)
+        report("presign", time.perf_counter() - start, len(keys) * args.presign_rounds)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch(key) for key in keys))
+        report("fetch", time.perf_counter() - start, args.count, size * args.count)
+
+        await asyncio.gather(*(service.delete_file(key) for key in keys))
+    finally:
+        os.remove(source_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="存储后端吞吐基准测试")
+    parser.add_argument("--backend", choices=["local", "s3", "coze"], default="local")
+    parser.add_argument("--size-mb", type=float, default=16, help="单个文件大小（MB）")
+    parser.add_argument("--count", type=int, default=16, help="文件数量")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发数")
+    parser.add_argument("--presign-rounds", type=int, default=10, help="签名 URL 重复轮数")
+    parser.add_argument("--local-path", help="local 后端存储目录，默认临时目录")
+    parser.add_argument("--endpoint-url", help="s3 后端地址（MinIO / moto）")
+    parser.add_argument("--bucket", default="bench")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--access-key", default="test")
+    parser.add_argument("--secret-key", default="test")
+    parser.add_argument("--create-bucket", action="store_true", help="自动创建 bucket")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
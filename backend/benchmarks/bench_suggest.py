@@ -0,0 +1,88 @@
+"""
+搜索建议微基准测试：内存前缀索引（utils/suggest.py）
+
+生成 N 条公告标题和 M 个同事姓名，测量：
+1. 整体构建耗时和内存占用（tracemalloc）
+2. 不同长度前缀的查询延迟 p50 / p99（微秒）
+3. 增量新增 / 删除标题的耗时
+不访问数据库（导入消息中心时使用内存 SQLite）。
+
+用法：
+    cd backend
+    python benchmarks/bench_suggest.py
+    python benchmarks/bench_suggest.py --titles 20000 --names 2000 --repeat 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# 必须在导入 database 之前设置
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from utils.suggest import SuggestIndex
+
+WORDS = ["会议", "通知", "安排", "项目", "进度", "报告", "部门", "季度", "预算审批", "年度体检",
+         "消防演练", "系统升级", "团建活动", "Q3", "OKR", "review"]
+SURNAMES = "张李王赵钱孙周吴郑冯陈褚卫蒋沈韩杨"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚"
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="搜索建议前缀索引微基准测试")
+    parser.add_argument("--titles", type=int, default=5000, help="公告标题数")
+    parser.add_argument("--names", type=int, default=500, help="同事姓名数")
+    parser.add_argument("--repeat", type=int, default=10000, help="每个前缀的查询次数")
+    parser.add_argument("--limit", type=int, default=8, help="每次返回的建议数")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    titles = [(i, "".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))) for i in range(1, args.titles + 1)]
+    names = {rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.randint(1, 2))) for _ in range(args.names)}
+
+    index = SuggestIndex(max_titles=args.titles)
+    tracemalloc.start()
+    start = time.perf_counter()
+    index.load(titles, [(name, rng.randint(1, 50)) for name in names])
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = index.stats()
+    print(f"构建: {stats['entries']} 个条目（{stats['titles']} 条标题, {stats['names']} 个姓名）"
+          f" {elapsed * 1000:.1f}ms, 内存约 {memory / 1024 / 1024:.1f}MB\n")
+
+    prefixes = ["会", "会议", "会议通知", "预算审批", "张", "q", "okr", "不存在的前缀"]
+    print(f"{'前缀':<12} {'结果数':>6} {'p50(us)':>10} {'p99(us)':>10}")
+    for prefix in prefixes:
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter_ns()
+            found = index.lookup(prefix, args.limit)
+            latencies.append((time.perf_counter_ns() - start) / 1000)
+        print(f"{prefix:<12} {len(found):>6} {percentile(latencies, 0.5):>10.1f} {percentile(latencies, 0.99):>10.1f}")
+
+    # 增量维护：新增标题（超出上限时淘汰最早的标题）和删除标题
+    count = 1000
+    start = time.perf_counter()
+    for i in range(count):
+        index.add_title(args.titles + i + 1, "".join(rng.choice(WORDS) for _ in range(4)))
+    added = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    for i in range(count):
+        index.remove_title(args.titles + i + 1)
+    removed = (time.perf_counter() - start) / count * 1e6
+    print(f"\n增量新增标题: {added:.1f}us/条，删除标题: {removed:.1f}us/条（淘汰 {index.evicted} 条）")
+
+
+if __name__ == "__main__":
+    main()
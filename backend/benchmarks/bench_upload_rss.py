@@ -0,0 +1,95 @@
+"""
+上传内存基准测试：整体读入（await file.read()）vs 流式上传（upload_stream）
+
+每种模式在独立子进程中运行（峰值 RSS 只增不减），
+并发上传若干个同样大小的文件到本地存储，报告子进程的峰值 RSS。
+上传内容使用与 Starlette 相同的 SpooledTemporaryFile 包装为 UploadFile，
+即请求体已由框架落盘，测量的是存储层本身的内存占用。
+
+用法：
+    cd backend
+    python benchmarks/bench_upload_rss.py
+    python benchmarks/bench_upload_rss.py --size-mb 500 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_upload(size: int):
+    from starlette.datastructures import UploadFile
+
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    block = os.urandom(1024 * 1024)
+    for _ in range(size // len(block)):
+        spool.write(block)
+    spool.seek(0)
+    return UploadFile(spool, size=size, filename="bench.bin")
+
+
+async def run_child(mode: str, size: int, concurrency: int) -> None:
+    from utils.s3_storage import s3_storage
+
+    uploads = [make_upload(size) for _ in range(concurrency)]
+    baseline = peak_rss_mb()
+
+    async def upload(file) -> str:
+        if mode == "legacy":
+            # 改造前：整个文件读入内存后写盘
+            content = await file.read()
+            return await s3_storage.upload_file(content, file.filename, "application/octet-stream")
+        stored = await s3_storage.upload_stream(file, file.filename, "application/octet-stream", max_size=None)
+        return stored.key
+
+    start = time.perf_counter()
+    keys = await asyncio.gather(*(upload(f) for f in uploads))
+    elapsed = time.perf_counter() - start
+
+    for key in keys:
+        os.remove(os.path.join(os.environ["COZE_WORKSPACE_PATH"], "file_uploads", key.split("/")[1]))
+    print(f"{mode:<8} baseline={baseline:8.1f}MB  peak={peak_rss_mb():8.1f}MB  time={elapsed:6.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上传峰值内存基准测试")
+    parser.add_argument("--size-mb", type=int, default=200, help="单个文件大小（MB）")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发上传数")
+    parser.add_argument("--child", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args.child, args.size_mb * 1024 * 1024, args.concurrency))
+        return
+
+    print(f"并发 {args.concurrency} 个 {args.size_mb}MB 文件（本地存储）")
+    with tempfile.TemporaryDirectory() as workspace:
+        env = dict(
+            os.environ,
+            USE_LOCAL_STORAGE="true",
+            COZE_WORKSPACE_PATH=workspace,
+            MAX_UPLOAD_SIZE=str(args.size_mb * 1024 * 1024),
+        )
+        for mode in ("legacy", "stream"):
+            subprocess.run(
+                [sys.executable, __file__, "--child", mode,
+                 "--size-mb", str(args.size_mb), "--concurrency", str(args.concurrency)],
+                env=env, check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
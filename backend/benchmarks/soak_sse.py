@@ -0,0 +1,145 @@
+"""
+SSE 推送浸泡测试
+
+对运行中的服务建立大量空闲的 /api/notifications/stream 连接并保持一段时间，
+期间可发布一条公告，统计：
+- 建立连接的耗时与失败数
+- 保持期间收到的心跳数、断开的连接数
+- 广播通知送达所有连接的延迟（p50 / p95 / 最大值）
+
+连接直接使用 asyncio 原始 socket，客户端每个连接只占少量内存，
+便于单机模拟数千个浏览器标签页。运行前请确认服务端和客户端的
+文件描述符上限足够（ulimit -n）。
+
+用法：
+    cd backend
+    python benchmarks/soak_sse.py --token <用户令牌> --connections 5000 --duration 120 \\
+        --admin-token <管理员令牌>
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import quote, urlparse
+
+
+class Stats:
+    """浸泡测试统计"""
+
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.closed = 0
+        self.heartbeats = 0
+        self.deliveries = []
+
+
+async def hold_connection(host: str, port: int, path: str, stats: Stats, publish_at: dict, stop: asyncio.Event):
+    """建立一条 SSE 连接并持续读取直到测试结束"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if b" 200 " not in status_line:
+            stats.failed += 1
+            writer.close()
+            return
+        stats.connected += 1
+    except OSError:
+        stats.failed += 1
+        return
+
+    try:
+        while not stop.is_set():
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                stats.closed += 1
+                return
+            if line.startswith(b": ping"):
+                stats.heartbeats += 1
+            elif line.startswith(b"event: notification") and "time" in publish_at:
+                stats.deliveries.append(time.perf_counter() - publish_at["time"])
+    finally:
+        writer.close()
+
+
+async def publish_announcement(base_url: str, admin_token: str, publish_at: dict):
+    """发布一条公告，触发广播通知"""
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        publish_at["time"] = time.perf_counter()
+        response = await client.post(
+            "/api/announcements",
+            data={"title": "SSE 浸泡测试", "content": "浸泡测试广播"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        response.raise_for_status()
+
+
+def percentile(values: list, ratio: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * ratio) - 1)]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SSE 推送浸泡测试")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--token", required=True, help="普通用户访问令牌（所有连接共用）")
+    parser.add_argument("--admin-token", help="管理员令牌（提供时在中途发布公告测量送达延迟）")
+    parser.add_argument("--connections", type=int, default=2000, help="连接数")
+    parser.add_argument("--duration", type=float, default=60, help="保持时长（秒）")
+    parser.add_argument("--ramp", type=int, default=200, help="每批建立的连接数")
+    args = parser.parse_args()
+
+    url = urlparse(args.base_url)
+    path = f"/api/notifications/stream?token={quote(args.token)}"
+    stats = Stats()
+    stop = asyncio.Event()
+    publish_at = {}
+
+    print("=" * 60)
+    print(f"SSE 浸泡测试：{args.connections} 个连接，保持 {args.duration:.0f}s")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    tasks = []
+    for offset in range(0, args.connections, args.ramp):
+        batch = min(args.ramp, args.connections - offset)
+        tasks.extend(
+            asyncio.create_task(hold_connection(url.hostname, url.port or 80, path, stats, publish_at, stop))
+            for _ in range(batch)
+        )
+        await asyncio.sleep(0.1)
+    while stats.connected + stats.failed < args.connections and time.perf_counter() - start < 60:
+        await asyncio.sleep(0.1)
+    print(f"\n建立连接: {stats.connected} 成功 / {stats.failed} 失败，耗时 {time.perf_counter() - start:.1f}s")
+
+    if args.admin_token:
+        await asyncio.sleep(args.duration / 2)
+        await publish_announcement(args.base_url, args.admin_token, publish_at)
+        await asyncio.sleep(args.duration / 2)
+    else:
+        await asyncio.sleep(args.duration)
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"保持期间断开: {stats.closed}")
+    print(f"收到心跳: {stats.heartbeats}")
+    if stats.deliveries:
+        print(f"广播送达: {len(stats.deliveries)}/{stats.connected}")
+        print(f"  p50 延迟: {statistics.median(stats.deliveries) * 1000:.1f}ms")
+        print(f"  p95 延迟: {percentile(stats.deliveries, 0.95) * 1000:.1f}ms")
+        print(f"  最大延迟: {max(stats.deliveries) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
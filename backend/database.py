@@ -1,6 +1,10 @@
 import os
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from typing import AsyncGenerator, Generator
 from pathlib import Path
 
 # 从环境变量获取数据库连接字符串（强制使用 PostgreSQL）
@@ -29,6 +33,12 @@ print(f"使用的数据库连接字符串: {DATABASE_URL}")
 # 判断是否使用 SQLite
 IS_SQLITE = DATABASE_URL.startswith("sqlite://")
 
+# 全文搜索（脚本以 backend.database 方式导入时 backend 不在 sys.path 中）
+try:
+    from utils import fulltext
+except ImportError:
+    from backend.utils import fulltext
+
 # 创建数据库引擎
 if IS_SQLITE:
     # SQLite 配置（不支持连接池和 SSL）
@@ -52,12 +62,123 @@ else:
 # engine = create_engine(DATABASE_URL, echo=False)
 
 
+def _to_async_url(url: str) -> str:
+    """将同步连接字符串转换为异步驱动（asyncpg / aiosqlite）"""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+    # 部分云服务（如 Render）提供的是 postgres:// 前缀
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+    # asyncpg 不识别 libpq 的 sslmode 参数，改由 connect_args 传入
+    return async_url.difference_update_query(["sslmode"]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = _to_async_url(DATABASE_URL)
+
+# 创建异步数据库引擎（API 路由使用，避免阻塞事件循环）
+if IS_SQLITE:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        connect_args={
+            "timeout": 10,  # asyncpg 的连接超时参数
+            "ssl": "prefer",  # 与同步引擎的 sslmode=prefer 保持一致
+        }
+    )
+
+if IS_SQLITE:
+    # FTS5 同步触发器调用 Python 分词函数，需在每个连接上注册
+    event.listen(engine, "connect", fulltext.register_sqlite_functions)
+    event.listen(async_engine.sync_engine, "connect", fulltext.register_sqlite_functions)
+
+
+# 模型新增、旧数据库中可能缺少的字段（create_all 不会修改已有的表）
+# 表名 -> [(字段名, 字段定义)]
+ADDED_COLUMNS = {
+    "announcement": [
+        ("response_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("last_response_at", "TIMESTAMP"),
+    ],
+    # 默认 0：现有令牌不带版本声明，不受影响
+    "user": [
+        ("token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+}
+
+
+def ensure_added_columns(conn) -> set:
+    """为旧数据库补齐模型新增的字段（SQLite 与 PostgreSQL 通用），返回本次添加的 (表名, 字段名)"""
+    inspector = inspect(conn)
+    added = set()
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, definition in columns:
+            if name not in existing:
+                conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {definition}'))
+                added.add((table, name))
+                print(f"已添加字段 {table}.{name}")
+    return added
+
+
+def backfill_response_stats(conn) -> None:
+    """根据 response 表回填公告的回复统计，并创建排序索引"""
+    conn.execute(text("""
+        UPDATE announcement
+        SET response_count = (
+                SELECT COUNT(*) FROM response WHERE response.announcement_id = announcement.id
+            ),
+            last_response_at = (
+                SELECT MAX(created_at) FROM response WHERE response.announcement_id = announcement.id
+            )
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_announcement_response_count
+        ON announcement(response_count DESC, id DESC)
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_announcement_activity
+        ON announcement((COALESCE(last_response_at, created_at)) DESC, id DESC)
+    """))
+
+
 def init_db():
     """初始化数据库表"""
     SQLModel.metadata.create_all(engine)
 
+    with engine.begin() as conn:
+        added = ensure_added_columns(conn)
+        if ("announcement", "response_count") in added:
+            backfill_response_stats(conn)
+
+    if IS_SQLITE:
+        # FTS5 全文搜索表和同步触发器
+        with engine.begin() as conn:
+            fulltext.ensure_sqlite_fts(conn)
+    else:
+        # 全文搜索生成列与 GIN 索引（SQLModel 模型中未声明，单独创建）
+        try:
+            with engine.begin() as conn:
+                fulltext.ensure_search_vectors(conn)
+        except Exception as e:
+            print(f"警告: 全文搜索索引创建失败（请检查 SEARCH_TS_CONFIG 对应的文本搜索配置）: {e}")
+
 
 def get_session() -> Generator[Session, None, None]:
-    """获取数据库会话"""
+    """获取数据库会话（同步，供脚本和后台任务使用）"""
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """获取异步数据库会话（API 路由使用）"""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,7 +10,11 @@ from pathlib import Path
 load_dotenv(Path(__file__).parent / ".env")
 
 from database import init_db
-from api import announcements, responses, file_preview, auth, notifications, search, files
+from utils.auth import principal_cache
+from utils.pubsub import hub
+from utils.search_cache import search_cache
+from utils.suggest import suggest_index
+from api import announcements, responses, auth, notifications, search, files
 
 # 创建 FastAPI 应用
 app = FastAPI(
@@ -32,7 +37,6 @@ app.include_router(auth.router)
 app.include_router(search.router)
 app.include_router(announcements.router)
 app.include_router(responses.router)
-app.include_router(file_preview.router)
 app.include_router(notifications.router)
 app.include_router(files.router)
 
@@ -47,6 +51,21 @@ async def startup_event():
     """应用启动时初始化数据库"""
     init_db()
     print("数据库初始化完成")
+    await hub.start()
+    # 同步其他 worker 的搜索建议索引变更、搜索缓存和认证缓存失效
+    app.state.sync_tasks = [
+        asyncio.create_task(suggest_index.run_sync()),
+        asyncio.create_task(search_cache.run_sync()),
+        asyncio.create_task(principal_cache.run_sync()),
+    ]
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止消息中心"""
+    for task in app.state.sync_tasks:
+        task.cancel()
+    await hub.stop()
 
 
 @app.get("/")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+添加回复统计字段到 announcement 表（response_count, last_response_at）
+并根据 response 表回填现有数据（PostgreSQL；应用启动时 init_db 也会为 SQLite 和 PostgreSQL 自动补齐）
+"""
+from pathlib import Path
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# 加载环境变量
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path)
+
+
+def add_response_stats():
+    """添加 response_count 和 last_response_at 字段到 announcement 表"""
+    import os
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    if not DATABASE_URL:
+        print("错误: 未找到 DATABASE_URL 环境变量")
+        return False
+
+    # 解析 DATABASE_URL
+    # 格式: postgresql://用户名:密码@主机:端口/数据库名
+    import re
+    match = re.match(r'postgresql://([^:]+):([^@]+)@([^:]+):(\d+)/(.+)', DATABASE_URL)
+    if not match:
+        print(f"错误: 无法解析 DATABASE_URL: {DATABASE_URL}")
+        return False
+
+    username, password, host, port, dbname = match.groups()
+
+    try:
+        # 连接数据库
+        conn = psycopg2.connect(
+            host=host,
+            port=port,
+            database=dbname,
+            user=username,
+            password=password
+        )
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+
+        # 添加字段（IF NOT EXISTS 保证可重复执行）
+        cursor.execute("""
+            ALTER TABLE announcement
+            ADD COLUMN IF NOT EXISTS response_count INTEGER NOT NULL DEFAULT 0
+        """)
+        print("✓ response_count 字段已就绪")
+
+        cursor.execute("""
+            ALTER TABLE announcement
+            ADD COLUMN IF NOT EXISTS last_response_at TIMESTAMP
+        """)
+        print("✓ last_response_at 字段已就绪")
+
+        # 回填统计数据（一次聚合，仅更新有回复的公告）
+        cursor.execute("""
+            UPDATE announcement AS a
+            SET response_count = s.cnt, last_response_at = s.last_at
+            FROM (
+                SELECT announcement_id, COUNT(*) AS cnt, MAX(created_at) AS last_at
+                FROM response
+                GROUP BY announcement_id
+            ) AS s
+            WHERE a.id = s.announcement_id
+        """)
+        print(f"✓ 已回填 {cursor.rowcount} 条公告的回复统计")
+
+        # 排序索引
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_announcement_response_count
+            ON announcement(response_count DESC, id DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_announcement_activity
+            ON announcement((COALESCE(last_response_at, created_at)) DESC, id DESC)
+        """)
+        print("✓ 排序索引已创建")
+
+        cursor.close()
+        conn.close()
+        print("\n✅ 数据库迁移完成！")
+        return True
+
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    add_response_stats()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+添加全文搜索生成列 search_vector（announcement, response）及 GIN 索引
+（有 btree_gin 扩展时为包含筛选列的复合索引），并删除被取代的索引
+"""
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# 加载环境变量
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path)
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.fulltext import SEARCH_TS_CONFIG, search_vector_ddl
+
+
+def add_search_vector():
+    """添加 search_vector 生成列和 GIN 索引"""
+    import os
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    if not DATABASE_URL:
+        print("错误: 未找到 DATABASE_URL 环境变量")
+        return False
+
+    # 解析 DATABASE_URL
+    # 格式: postgresql://用户名:密码@主机:端口/数据库名
+    import re
+    match = re.match(r'postgresql://([^:]+):([^@]+)@([^:]+):(\d+)/(.+)', DATABASE_URL)
+    if not match:
+        print(f"错误: 无法解析 DATABASE_URL: {DATABASE_URL}")
+        return False
+
+    username, password, host, port, dbname = match.groups()
+
+    try:
+        # 连接数据库
+        conn = psycopg2.connect(
+            host=host,
+            port=port,
+            database=dbname,
+            user=username,
+            password=password
+        )
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+
+        # 新增 STORED 生成列会重写整张表并回填现有数据，大表请在低峰期执行
+        print(f"文本搜索配置: {SEARCH_TS_CONFIG}")
+        # 筛选列与 search_vector 共用一个 GIN 索引需要 btree_gin 扩展
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+            btree_gin = True
+        except psycopg2.Error as e:
+            print(f"⚠️ 无法启用 btree_gin 扩展，只创建 search_vector 单列索引: {e}")
+            btree_gin = False
+
+        for statement in search_vector_ddl(btree_gin=btree_gin):
+            cursor.execute(statement)
+            print(f"✓ {statement.split(' GENERATED')[0]}")
+
+        cursor.execute("ANALYZE announcement")
+        cursor.execute("ANALYZE response")
+
+        cursor.close()
+        conn.close()
+        print("\n✅ 数据库迁移完成！")
+        return True
+
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    add_search_vector()
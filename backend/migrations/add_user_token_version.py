@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+添加令牌版本字段到 user 表（token_version）
+管理员修改用户角色或状态时递增，携带旧版本的访问令牌失效
+（PostgreSQL；应用启动时 init_db 也会为 SQLite 和 PostgreSQL 自动补齐）
+"""
+from pathlib import Path
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# 加载环境变量
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path)
+
+
+def add_user_token_version():
+    """添加 token_version 字段到 user 表"""
+    import os
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    if not DATABASE_URL:
+        print("错误: 未找到 DATABASE_URL 环境变量")
+        return False
+
+    # 解析 DATABASE_URL
+    # 格式: postgresql://用户名:密码@主机:端口/数据库名
+    import re
+    match = re.match(r'postgresql://([^:]+):([^@]+)@([^:]+):(\d+)/(.+)', DATABASE_URL)
+    if not match:
+        print(f"错误: 无法解析 DATABASE_URL: {DATABASE_URL}")
+        return False
+
+    username, password, host, port, dbname = match.groups()
+
+    try:
+        # 连接数据库
+        conn = psycopg2.connect(
+            host=host,
+            port=port,
+            database=dbname,
+            user=username,
+            password=password
+        )
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+
+        # 添加字段（IF NOT EXISTS 保证可重复执行；带默认值，现有令牌不带版本声明，不受影响）
+        cursor.execute("""
+            ALTER TABLE "user"
+            ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0
+        """)
+        print("✓ token_version 字段已就绪")
+
+        cursor.close()
+        conn.close()
+        print("\n✅ 数据库迁移完成！")
+        return True
+
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    add_user_token_version()
@@ -1,6 +1,6 @@
 from typing import Optional, List
 from datetime import datetime
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, Index, SQLModel, UniqueConstraint
 from enum import Enum
 
 
@@ -16,6 +16,13 @@ class AnnouncementType(str, Enum):
     INQUIRY = "inquiry"
 
 
+class AnnouncementSort(str, Enum):
+    """公告列表排序方式"""
+    CREATED_AT = "created_at"            # 按发布时间
+    RESPONSE_COUNT = "response_count"    # 按回复数
+    LAST_RESPONSE_AT = "last_response_at"  # 按最近活动时间（最新回复时间，无回复时为发布时间）
+
+
 class User(SQLModel, table=True):
     """用户模型"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -25,6 +32,7 @@ class User(SQLModel, table=True):
     full_name: str = Field(description="真实姓名")
     role: UserRole = Field(default=UserRole.USER, index=True, description="角色")
     is_active: bool = Field(default=True, description="是否激活")
+    token_version: int = Field(default=0, description="令牌版本（角色或状态变化时递增，使已签发的令牌失效）")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
     updated_at: Optional[datetime] = Field(default=None, description="更新时间")
 
@@ -38,6 +46,9 @@ class NotificationType(str, Enum):
 
 class Notification(SQLModel, table=True):
     """通知模型"""
+    # 复合索引：用户ID + 是否已读（用于统计未读数量）
+    __table_args__ = (Index("idx_notification_user_is_read", "user_id", "is_read"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True, description="用户ID")
     type: NotificationType = Field(default=NotificationType.SYSTEM, description="通知类型")
@@ -48,6 +59,42 @@ class Notification(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True, description="创建时间")
 
 
+class NotificationSource(str, Enum):
+    """通知来源"""
+    PERSONAL = "personal"
+    BROADCAST = "broadcast"
+
+
+class BroadcastNotification(SQLModel, table=True):
+    """广播通知模型（全员通知只存一行，读取时再与用户状态合并）"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    type: NotificationType = Field(default=NotificationType.SYSTEM, description="通知类型")
+    title: str = Field(description="通知标题")
+    content: str = Field(description="通知内容")
+    related_id: Optional[int] = Field(default=None, description="关联ID（如公告ID）")
+    exclude_user_id: Optional[int] = Field(default=None, description="不接收该通知的用户ID（如发布者）")
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True, description="创建时间")
+
+
+class BroadcastReceipt(SQLModel, table=True):
+    """广播通知回执（稀疏记录：仅保存单条已读或删除的状态）"""
+    __table_args__ = (UniqueConstraint("user_id", "broadcast_id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True, description="用户ID")
+    broadcast_id: int = Field(foreign_key="broadcastnotification.id", index=True, description="广播通知ID")
+    is_read: bool = Field(default=False, description="是否已读")
+    is_dismissed: bool = Field(default=False, description="是否已删除")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+
+
+class NotificationWatermark(SQLModel, table=True):
+    """用户广播已读水位线（ID 不大于该值的广播均视为已读）"""
+    user_id: int = Field(foreign_key="user.id", primary_key=True, description="用户ID")
+    last_seen_broadcast_id: int = Field(default=0, description="最后已读的广播通知ID")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
+
+
 class Announcement(SQLModel, table=True):
     """公告模型"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -58,6 +105,45 @@ class Announcement(SQLModel, table=True):
     file_name: Optional[str] = Field(default=None, description="原始文件名")
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True, description="创建时间")
     updated_at: Optional[datetime] = Field(default=None, description="更新时间")
+    # 冗余统计字段，由 create_response 在同一事务中维护，可用 repair_announcement_stats.py 重算
+    response_count: int = Field(default=0, description="回复数")
+    last_response_at: Optional[datetime] = Field(default=None, description="最新回复时间")
+
+
+class FileBlob(SQLModel, table=True):
+    """内容寻址的文件（按 SHA-256 去重，引用计数归零后回收）"""
+    sha256: str = Field(primary_key=True, max_length=64, description="文件内容的 SHA-256")
+    key: str = Field(unique=True, description="文件在存储中的键")
+    size: int = Field(description="文件大小（字节）")
+    content_type: str = Field(default="application/octet-stream", description="MIME 类型")
+    ref_count: int = Field(default=0, description="引用次数（公告和回复的附件）")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+
+
+class StoredFile(SQLModel, table=True):
+    """已上传文件的元数据（上传时写入，预览和下载接口直接读取）"""
+    key: str = Field(primary_key=True, description="文件在存储中的键")
+    file_name: str = Field(description="原始文件名（去重存储时为首次上传的文件名）")
+    size: int = Field(description="文件大小（字节）")
+    content_type: str = Field(default="application/octet-stream", description="MIME 类型")
+    sha256: str = Field(max_length=64, description="文件内容的 SHA-256")
+    preview_type: str = Field(default="unknown", description="预览类型（image / pdf / text / video 等）")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+
+
+class FileRendition(SQLModel, table=True):
+    """文件派生预览图（图片缩略图、PDF 首页）"""
+    __table_args__ = (UniqueConstraint("source_key", "name"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_key: str = Field(index=True, description="原文件在存储中的键")
+    name: str = Field(description="规格名称（thumb / preview）")
+    key: str = Field(description="预览图在存储中的键")
+    content_type: str = Field(default="image/webp", description="MIME 类型")
+    width: int = Field(description="宽度（像素）")
+    height: int = Field(description="高度（像素）")
+    size: int = Field(description="文件大小（字节）")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
 
 
 class Response(SQLModel, table=True):
@@ -97,11 +183,15 @@ class AnnouncementPublic(SQLModel):
     file_name: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime]
+    response_count: int = 0
+    last_response_at: Optional[datetime] = None
 
 
 class AnnouncementWithResponses(AnnouncementPublic):
-    """公告及其回复"""
-    responses: list["ResponsePublic"] = []
+    """公告及其回复（仅包含第一页回复）"""
+    responses: list["ResponseSummary"] = []
+    response_total: int = 0
+    responses_next_cursor: Optional[str] = None
 
 
 class ResponseCreate(SQLModel):
@@ -127,6 +217,17 @@ class ResponsePublic(SQLModel):
     created_at: datetime
 
 
+class ResponseSummary(SQLModel):
+    """回复信息（支持字段投影，未选择的字段不返回）"""
+    id: int
+    announcement_id: Optional[int] = None
+    colleague_name: Optional[str] = None
+    content: Optional[str] = None
+    file_key: Optional[str] = None
+    file_name: Optional[str] = None
+    created_at: datetime
+
+
 class ResponseWithAnnouncement(ResponsePublic):
     """回复及公告信息"""
     announcement_title: str
@@ -8,6 +8,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.database import engine
+from backend.utils.fulltext import search_vector_ddl
 
 
 def add_indexes():
@@ -22,10 +23,16 @@ def add_indexes():
             ON announcement(type, created_at DESC);
         """)
 
-        # 全文搜索索引：标题 + 内容（用于全文搜索）
+        # 复合索引：回复数 + ID（用于按回复数排序和游标分页）
         conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_announcement_search
-            ON announcement USING gin(to_tsvector('chinese', title || ' ' || content));
+            CREATE INDEX IF NOT EXISTS idx_announcement_response_count
+            ON announcement(response_count DESC, id DESC);
+        """)
+
+        # 表达式索引：最近活动时间 + ID（用于按最近活动排序和游标分页）
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_announcement_activity
+            ON announcement((COALESCE(last_response_at, created_at)) DESC, id DESC);
         """)
 
         # 2. 回复表优化索引
@@ -48,31 +55,42 @@ def add_indexes():
             ON response(announcement_id, colleague_name);
         """)
 
-        # 全文搜索索引：同事姓名 + 内容（用于搜索回复）
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_response_search
-            ON response USING gin(to_tsvector('chinese', colleague_name || ' ' || content));
-        """)
-
         # 索引：文件键（用于文件管理）
         conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_response_file_key
             ON response(file_key) WHERE file_key IS NOT NULL;
         """)
 
+        # 3. 全文搜索：search_vector 生成列 + 含筛选列的复合 GIN 索引（公告、回复），并删除旧的表达式索引
+        conn.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        for statement in search_vector_ddl():
+            conn.execute(statement)
+
+        # 4. 通知表优化索引
+
+        # 复合索引：用户ID + 是否已读（用于统计未读数量）
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notification_user_is_read
+            ON notification(user_id, is_read);
+        """)
+
         conn.commit()
 
     print("✅ 数据库索引优化完成！")
     print("\n已创建的索引：")
     print("📊 公告表：")
     print("  - idx_announcement_type_created_at (类型 + 创建时间)")
-    print("  - idx_announcement_search (全文搜索)")
+    print("  - idx_announcement_search_filter (全文搜索，search_vector + 类型、创建时间)")
+    print("  - idx_announcement_response_count (回复数)")
+    print("  - idx_announcement_activity (最近活动时间)")
     print("\n📊 回复表：")
     print("  - idx_response_announcement_created_at (公告ID + 创建时间)")
     print("  - idx_response_colleague_created_at (同事姓名 + 创建时间)")
     print("  - idx_response_announcement_colleague (公告ID + 同事姓名)")
-    print("  - idx_response_search (全文搜索)")
+    print("  - idx_response_search_filter (全文搜索，search_vector + 同事姓名、创建时间)")
     print("  - idx_response_file_key (文件键)")
+    print("\n📊 通知表：")
+    print("  - idx_notification_user_is_read (用户ID + 是否已读)")
 
 
 def create_search_function():
@@ -95,9 +113,9 @@ def create_search_function():
                 RETURN QUERY
                 SELECT
                     a.id, a.title, a.content, a.type, a.created_at,
-                    ts_rank(to_tsvector('chinese', a.title || ' ' || a.content), query) AS rank
+                    ts_rank(a.search_vector, query) AS rank
                 FROM announcement a
-                WHERE to_tsvector('chinese', a.title || ' ' || a.content) @@ query
+                WHERE a.search_vector @@ query
                 ORDER BY rank DESC;
             END;
             $$ LANGUAGE plpgsql;
@@ -119,9 +137,9 @@ def create_search_function():
                 RETURN QUERY
                 SELECT
                     r.id, r.announcement_id, r.colleague_name, r.content, r.created_at,
-                    ts_rank(to_tsvector('chinese', r.colleague_name || ' ' || r.content), query) AS rank
+                    ts_rank(r.search_vector, query) AS rank
                 FROM response r
-                WHERE to_tsvector('chinese', r.colleague_name || ' ' || r.content) @@ query
+                WHERE r.search_vector @@ query
                 ORDER BY rank DESC;
             END;
             $$ LANGUAGE plpgsql;
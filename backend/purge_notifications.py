@@ -0,0 +1,45 @@
+"""
+通知清理脚本
+按批次删除超过保留期的个人通知和广播通知，可在系统运行期间定时执行（如 cron）
+
+用法：
+    cd backend
+    python purge_notifications.py --days 30 --batch-size 5000 --time-budget 60
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine
+from utils.notification import notification_service
+
+
+async def purge(days: int, batch_size: int, time_budget: float) -> None:
+    start = time.perf_counter()
+    async with AsyncSession(async_engine) as session:
+        deleted = await notification_service.delete_old_notifications(
+            session=session,
+            days=days,
+            batch_size=batch_size,
+            time_budget=time_budget,
+        )
+    await async_engine.dispose()
+
+    print(f"✅ 已删除 {deleted} 条超过 {days} 天的通知，耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="清理旧通知")
+    parser.add_argument("--days", type=int, default=30, help="保留天数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批删除的行数")
+    parser.add_argument("--time-budget", type=float, default=None, help="最长执行时间（秒），超时后停止")
+    args = parser.parse_args()
+
+    asyncio.run(purge(args.days, args.batch_size, args.time_budget))
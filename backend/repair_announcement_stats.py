@@ -0,0 +1,40 @@
+"""
+公告统计修复脚本
+根据 response 表重算每条公告的 response_count 和 last_response_at，
+只更新与实际不一致的行，可定时执行（如 cron）或在手工修改数据后执行
+
+用法：
+    cd backend
+    python repair_announcement_stats.py
+    python repair_announcement_stats.py --id 12 --id 15
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine
+from utils.announcement_stats import recompute_announcement_stats
+
+
+async def repair(announcement_ids) -> None:
+    start = time.perf_counter()
+    async with AsyncSession(async_engine) as session:
+        fixed = await recompute_announcement_stats(session, announcement_ids)
+    await async_engine.dispose()
+
+    print(f"✅ 已修复 {fixed} 条公告的回复统计，耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重算公告回复统计")
+    parser.add_argument("--id", type=int, action="append", dest="ids", help="只修复指定公告（可重复）")
+    args = parser.parse_args()
+
+    asyncio.run(repair(args.ids))
@@ -0,0 +1,28 @@
+"""
+测试环境：临时 SQLite 数据库和本地存储目录（需在导入 backend 模块前设置环境变量）
+
+用法：
+    cd backend
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_workspace = tempfile.mkdtemp(prefix="company_annouce_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workspace, 'test.db')}"
+os.environ["COZE_WORKSPACE_PATH"] = _workspace
+os.environ["STORAGE_BACKEND"] = "local"
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from database import init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
@@ -0,0 +1,96 @@
+"""
+去重存储：写入文件失败时不能留下被复用的引用
+"""
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import main
+import utils.blob_store as blob_store_module
+from database import engine
+from models import Announcement, FileBlob
+from utils.s3_storage import s3_storage
+
+
+def test_failed_write_is_not_reused(monkeypatch):
+    monkeypatch.setattr(blob_store_module, "STORAGE_DEDUP", True)
+    with Session(engine) as session:
+        announcement = Announcement(title="附件测试", content="测试")
+        session.add(announcement)
+        session.commit()
+        announcement_id = announcement.id
+
+    payload = b"attachment for the dedup failure test"
+    client = TestClient(main.app)
+
+    def post_response():
+        return client.post(
+            "/api/responses",
+            data={"announcement_id": announcement_id, "colleague_name": "测试", "content": "附件"},
+            files={"file": ("form.pdf", payload, "application/pdf")},
+        )
+
+    # 第一次写入存储失败：回复照常提交（不带附件），引用被撤销
+    store_spooled = s3_storage.store_spooled
+
+    async def failing_store_spooled(spooled, file_key, content_type):
+        await s3_storage.discard_spooled(spooled)
+        raise OSError("storage unavailable")
+
+    monkeypatch.setattr(s3_storage, "store_spooled", failing_store_spooled)
+    response = post_response()
+    assert response.status_code == 200
+    assert response.json()["file_key"] is None
+    with Session(engine) as session:
+        blob = session.exec(select(FileBlob)).one()
+        assert blob.ref_count == 0
+
+    # 第二次上传相同内容：重新写入文件，而不是复用不存在的文件
+    calls = []
+
+    async def recording_store_spooled(spooled, file_key, content_type):
+        calls.append(file_key)
+        return await store_spooled(spooled, file_key, content_type)
+
+    monkeypatch.setattr(s3_storage, "store_spooled", recording_store_spooled)
+    response = post_response()
+    assert response.status_code == 200
+    file_key = response.json()["file_key"]
+    assert calls == [file_key]
+
+    download = client.get(f"/api/file/local/{file_key.replace('/', '%2F')}")
+    assert download.status_code == 200
+    assert download.content == payload
+    with Session(engine) as session:
+        assert session.exec(select(FileBlob)).one().ref_count == 1
+
+
+def test_reused_blob_keeps_per_upload_metadata(monkeypatch):
+    monkeypatch.setattr(blob_store_module, "STORAGE_DEDUP", True)
+    with Session(engine) as session:
+        announcement = Announcement(title="附件元数据测试", content="测试")
+        session.add(announcement)
+        session.commit()
+        announcement_id = announcement.id
+
+    payload = b"same bytes uploaded under two names"
+    client = TestClient(main.app)
+    uploads = []
+    for file_name, content_type in (("report.txt", "text/plain"), ("notes.md", "text/markdown")):
+        response = client.post(
+            "/api/responses",
+            data={"announcement_id": announcement_id, "colleague_name": "测试", "content": "附件"},
+            files={"file": (file_name, payload, content_type)},
+        )
+        assert response.status_code == 200
+        uploads.append(response.json())
+
+    # 文件共用一个键，文件名以各自的回复为准
+    assert uploads[0]["file_key"] == uploads[1]["file_key"]
+    assert [upload["file_name"] for upload in uploads] == ["report.txt", "notes.md"]
+
+    preview = client.get(
+        "/api/file/preview", params={"key": uploads[1]["file_key"], "file_name": uploads[1]["file_name"]}
+    ).json()
+    assert preview["file_name"] == "notes.md"
+    assert preview["content_type"] == "text/markdown"
+    assert preview["preview_type"] == "text"
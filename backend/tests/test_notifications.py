@@ -0,0 +1,87 @@
+"""
+通知：广播回执的可见性、未读数量缓存
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from database import async_engine, engine
+from models import BroadcastNotification, BroadcastReceipt, NotificationType, User
+from utils.auth import get_password_hash
+from utils.notification import NotificationService, notification_service, unread_count_cache
+
+
+def test_receipts_only_for_visible_broadcasts():
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        user = User(
+            username="receipt_user",
+            email="receipt_user@example.com",
+            hashed_password=get_password_hash("password"),
+            full_name="回执测试",
+            created_at=now,
+        )
+        before_join = BroadcastNotification(
+            type=NotificationType.SYSTEM, title="加入前", content="测试", created_at=now - timedelta(days=1)
+        )
+        after_join = BroadcastNotification(
+            type=NotificationType.SYSTEM, title="加入后", content="测试", created_at=now + timedelta(seconds=1)
+        )
+        session.add_all([user, before_join, after_join])
+        session.commit()
+        user_id, hidden_id, visible_id = user.id, before_join.id, after_join.id
+
+    client = TestClient(main.app)
+    token = client.post(
+        "/api/auth/login", data={"username": "receipt_user", "password": "password"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"source": "broadcast"}
+
+    # 加入前发布的广播不在列表中，也不能按 ID 标记已读或删除
+    assert client.post(f"/api/notifications/{hidden_id}/read", params=params, headers=headers).status_code == 404
+    assert client.delete(f"/api/notifications/{hidden_id}", params=params, headers=headers).status_code == 404
+    assert client.post(f"/api/notifications/{visible_id}/read", params=params, headers=headers).status_code == 200
+
+    with Session(engine) as session:
+        receipts = session.exec(select(BroadcastReceipt).where(BroadcastReceipt.user_id == user_id)).all()
+        assert [receipt.broadcast_id for receipt in receipts] == [visible_id]
+
+
+def test_unread_count_not_overwritten_by_stale_read(monkeypatch):
+    with Session(engine) as session:
+        user = User(
+            username="unread_user",
+            email="unread_user@example.com",
+            hashed_password=get_password_hash("password"),
+            full_name="未读测试",
+        )
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    count_broadcasts = NotificationService._get_broadcast_unread_count
+
+    async def count_then_broadcast(session, user_id):
+        # 读取拿到旧计数后，广播在回写缓存之前提交
+        count = await count_broadcasts(session, user_id)
+        async with AsyncSession(async_engine, expire_on_commit=False) as other:
+            await notification_service.broadcast_notification(
+                other, type=NotificationType.SYSTEM, title="并发广播", content="测试"
+            )
+        return count
+
+    async def run():
+        unread_count_cache.pop(user_id)
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            monkeypatch.setattr(NotificationService, "_get_broadcast_unread_count", staticmethod(count_then_broadcast))
+            stale = await notification_service.get_unread_count(session, user_id)
+            monkeypatch.setattr(NotificationService, "_get_broadcast_unread_count", staticmethod(count_broadcasts))
+            assert unread_count_cache.get(user_id) is None
+            assert await notification_service.get_unread_count(session, user_id) == stale + 1
+
+    asyncio.run(run())
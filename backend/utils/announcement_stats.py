@@ -0,0 +1,69 @@
+"""
+公告统计字段维护
+response_count / last_response_at 冗余存储在 announcement 表上，
+列表页无需关联 response 表即可展示和排序
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlmodel import case, func, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Announcement, Response
+
+# 最近活动时间：最新回复时间，无回复时为发布时间
+activity_at = func.coalesce(Announcement.last_response_at, Announcement.created_at)
+
+
+async def record_response(session: AsyncSession, announcement_id: int, created_at: datetime) -> None:
+    """新增回复后更新统计字段（需与插入回复在同一事务中，由调用方提交）
+
+    使用 response_count = response_count + 1 原子递增，并发回复不会丢失计数。
+    """
+    await session.exec(
+        update(Announcement)
+        .where(Announcement.id == announcement_id)
+        .values(
+            response_count=Announcement.response_count + 1,
+            # 取较新的时间，避免乱序提交时把 last_response_at 往回改
+            last_response_at=case(
+                (Announcement.last_response_at > created_at, Announcement.last_response_at),
+                else_=created_at,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def recompute_announcement_stats(
+    session: AsyncSession,
+    announcement_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """按 response 表重算统计字段，仅更新与实际不一致的公告，返回修复的行数"""
+    count_subquery = (
+        select(func.count())
+        .select_from(Response)
+        .where(Response.announcement_id == Announcement.id)
+        .scalar_subquery()
+    )
+    last_subquery = (
+        select(func.max(Response.created_at))
+        .where(Response.announcement_id == Announcement.id)
+        .scalar_subquery()
+    )
+
+    statement = (
+        update(Announcement)
+        .where(or_(
+            Announcement.response_count != count_subquery,
+            Announcement.last_response_at.is_distinct_from(last_subquery),
+        ))
+        .values(response_count=count_subquery, last_response_at=last_subquery)
+        .execution_options(synchronize_session=False)
+    )
+    if announcement_ids is not None:
+        statement = statement.where(Announcement.id.in_(list(announcement_ids)))
+
+    result = await session.exec(statement)
+    await session.commit()
+    return result.rowcount
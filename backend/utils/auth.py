@@ -1,23 +1,39 @@
 """
 认证和授权模块
-处理用户登录、JWT 令牌生成和验证
+处理用户登录、JWT 令牌生成和验证。
+验证令牌后的用户信息按用户 ID 缓存在进程内（principal_cache），缓存命中时认证不查询数据库；
+管理员修改角色、状态、用户信息或删除用户时主动失效，多 worker 部署时通过消息中心同步。
+令牌中的 token_version 与用户当前版本不一致时（角色或状态已变化）令牌失效
 """
+import os
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models import User, UserRole
-from database import get_session
+from database import get_async_session
+from utils.cache import TTLCache
+from utils.pubsub import hub
 
 # 配置
 SECRET_KEY = "your-secret-key-here-change-in-production"  # 生产环境应从环境变量读取
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24小时
 
+# 用户信息缓存：条目上限和过期时间（秒），过期后下一个请求重新查询数据库
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+# 是否在令牌中写入 role / is_active / token_version 声明
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "true").lower() == "true"
+# 多 worker 同步缓存失效使用的消息频道
+AUTH_CHANNEL = "auth"
+
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -35,6 +51,57 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PrincipalCache:
+    """已认证用户缓存（用户 ID -> 用户字段）"""
+
+    def __init__(self):
+        self.cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+        # 失效次数：查询数据库期间发生失效时，不写入查询到的旧数据
+        self.evictions = 0
+        # 区分本进程发出的同步消息
+        self.instance_id = uuid.uuid4().hex
+
+    def get(self, user_id: int) -> Optional[dict]:
+        return self.cache.get(user_id)
+
+    def set(self, user: User, evictions: int) -> None:
+        """写入缓存（evictions 为查询数据库前读取的失效次数）"""
+        if evictions == self.evictions:
+            self.cache.set(user.id, user.model_dump())
+
+    def evict(self, user_id: int) -> None:
+        self.evictions += 1
+        self.cache.pop(user_id)
+
+    async def invalidate(self, user_id: int) -> None:
+        """在本进程失效缓存，并通知其他 worker（提交数据库事务后调用）"""
+        self.evict(user_id)
+        await hub.publish(AUTH_CHANNEL, {"user_id": user_id, "origin": self.instance_id})
+
+    async def run_sync(self) -> None:
+        """后台任务：其他 worker 修改用户后失效本进程的缓存"""
+        async with hub.subscribe([AUTH_CHANNEL]) as subscription:
+            while True:
+                message = await subscription.get()
+                if message.get("origin") != self.instance_id:
+                    self.evict(message["user_id"])
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "evictions": self.evictions}
+
+
+# 创建全局实例
+principal_cache = PrincipalCache()
+
+
+def token_claims(user: User) -> dict:
+    """访问令牌的声明：sub 为用户 ID，可选写入角色、状态和令牌版本"""
+    claims = {"sub": str(user.id)}
+    if AUTH_TOKEN_CLAIMS:
+        claims.update(role=user.role.value, is_active=user.is_active, token_version=user.token_version)
+    return claims
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
     to_encode = data.copy()
@@ -48,11 +115,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> User:
-    """获取当前用户"""
+async def _load_principal(session: AsyncSession, user_id: int) -> Optional[dict]:
+    """从数据库读取用户并写入缓存"""
+    evictions = principal_cache.evictions
+    user = await session.get(User, user_id)
+    if user is None:
+        return None
+    principal_cache.set(user, evictions)
+    return user.model_dump()
+
+
+async def get_user_from_token(session: AsyncSession, token: str) -> User:
+    """根据访问令牌获取用户（无法使用 Authorization 头的场景，如 SSE，也可直接调用）
+
+    返回的用户对象不属于任何会话，只用于读取当前用户的信息。
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -64,14 +141,33 @@ async def get_current_user(
         user_id: int = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        # asyncpg 对参数类型要求严格，sub 为字符串时需转换
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    user = session.get(User, user_id)
-    if user is None:
+    # 旧令牌没有 token_version 声明，只依赖缓存失效
+    token_version = payload.get("token_version")
+    fields = principal_cache.get(user_id)
+    if fields is not None and token_version is not None and token_version > fields["token_version"]:
+        # 令牌比缓存新：本进程缓存尚未收到失效消息，重新查询
+        fields = None
+    if fields is None:
+        fields = await _load_principal(session, user_id)
+    if fields is None:
+        raise credentials_exception
+    if token_version is not None and token_version != fields["token_version"]:
         raise credentials_exception
 
-    return user
+    return User(**fields)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+) -> User:
+    """获取当前用户"""
+    return await get_user_from_token(session, token)
 
 
 async def get_current_active_user(
@@ -95,11 +191,11 @@ async def get_current_admin_user(
     return current_user
 
 
-def authenticate_user(session: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(session: AsyncSession, username: str, password: str) -> Optional[User]:
     """验证用户"""
-    user = session.exec(
+    user = (await session.exec(
         select(User).where(User.username == username)
-    ).first()
+    )).first()
 
     if not user:
         return None
@@ -0,0 +1,138 @@
+"""
+内容寻址文件存储
+STORAGE_DEDUP=true 时附件按 SHA-256 存为 blobs/{sha256}，
+相同内容只写入一次，file_blob 表记录引用次数，删除公告时引用归零的文件被回收
+"""
+import os
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import IS_SQLITE
+from models import FileBlob
+from utils.file_meta import file_meta
+from utils.renditions import rendition_service
+from utils.s3_storage import MAX_UPLOAD_SIZE, StoredObject, UploadSource, s3_storage
+
+# 是否启用内容寻址去重存储
+STORAGE_DEDUP = os.getenv("STORAGE_DEDUP", "false").lower() == "true"
+# 内容寻址文件的键前缀
+BLOB_PREFIX = "blobs/"
+
+
+class BlobStore:
+    """去重存储服务"""
+
+    @staticmethod
+    def is_blob_key(file_key: Optional[str]) -> bool:
+        return bool(file_key) and file_key.startswith(BLOB_PREFIX)
+
+    @staticmethod
+    async def store_upload(
+        session: AsyncSession,
+        source: UploadSource,
+        file_name: str,
+        content_type: str,
+        max_size: Optional[int] = MAX_UPLOAD_SIZE,
+    ) -> StoredObject:
+        """保存附件：启用去重时写入 blob 并增加引用，否则按原方式上传
+
+        引用计数和文件元数据的变更在传入的 session 中进行，由调用方与附件所属记录一起提交。
+        """
+        if not STORAGE_DEDUP:
+            stored = await s3_storage.upload_stream(source, file_name, content_type, max_size=max_size)
+            await file_meta.record(session, stored, file_name)
+            return stored
+
+        # 先落盘并计算 SHA-256，再增加引用（不存在时插入记录），根据增加后的引用次数决定是否写入文件
+        spooled = await s3_storage.spool(source, max_size)
+        key = f"{BLOB_PREFIX}{spooled.sha256}"
+        blob = await BlobStore._acquire(session, StoredObject(key, spooled.size, spooled.sha256, content_type))
+        if blob.ref_count > 1:
+            # 已有其他引用：collect_garbage 只回收引用归零的记录，现有文件可以直接复用
+            # 文件共用，MIME 类型以本次上传为准（文件名由调用方记录在公告/回复上）
+            await s3_storage.discard_spooled(spooled)
+            stored = StoredObject(blob.key, blob.size, blob.sha256, content_type)
+            print(f"文件已存在，复用: {blob.key}")
+        else:
+            # 只有本次引用：记录是新插入的，或是等待回收的无引用记录（文件可能已被删除），需重新写入文件
+            try:
+                stored = await s3_storage.store_spooled(spooled, key, content_type)
+            except Exception:
+                # 写入失败：撤销本次引用，否则调用方提交后会留下指向不存在文件的记录，之后的相同内容都会误复用；
+                # 引用归零的记录保留给 collect_garbage，下次上传相同内容时重新写入文件
+                await BlobStore.release(session, [key])
+                raise
+
+        await file_meta.record(session, stored, file_name)
+        return stored
+
+    @staticmethod
+    async def _acquire(session: AsyncSession, stored: StoredObject):
+        """引用次数 +1（不存在时插入，并发插入同一内容时由 ON CONFLICT 合并），返回增加后的记录
+
+        更新会锁住该行直到调用方提交，与 collect_garbage 的 DELETE 互斥：
+        回收先提交时记录已不存在，这里重新插入（引用次数为 1）；引用先提交时回收跳过该记录。
+        """
+        insert = sqlite_insert if IS_SQLITE else pg_insert
+        statement = insert(FileBlob).values(
+            sha256=stored.sha256,
+            key=stored.key,
+            size=stored.size,
+            content_type=stored.content_type,
+            ref_count=1,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[FileBlob.sha256],
+            set_={"ref_count": FileBlob.ref_count + 1},
+        ).returning(FileBlob.key, FileBlob.size, FileBlob.sha256, FileBlob.content_type, FileBlob.ref_count)
+        return (await session.exec(statement)).one()
+
+    @staticmethod
+    async def release(session: AsyncSession, file_keys: Iterable[Optional[str]]) -> List[str]:
+        """释放一组附件引用（不提交），返回涉及的 blob 键，提交后交给 collect_garbage 回收"""
+        counts = Counter(key for key in file_keys if BlobStore.is_blob_key(key))
+        for key, count in counts.items():
+            await session.exec(
+                update(FileBlob)
+                .where(FileBlob.key == key)
+                .values(ref_count=FileBlob.ref_count - count)
+                .execution_options(synchronize_session=False)
+            )
+        return list(counts)
+
+    @staticmethod
+    async def collect_garbage(session: AsyncSession, file_keys: Optional[Iterable[str]] = None) -> int:
+        """删除引用次数归零的 blob 记录及存储中的文件，返回回收的文件数"""
+        statement = delete(FileBlob).where(FileBlob.ref_count <= 0)
+        if file_keys is not None:
+            file_keys = list(file_keys)
+            if not file_keys:
+                return 0
+            statement = statement.where(FileBlob.key.in_(file_keys))
+
+        # DELETE ... RETURNING：只删除此刻仍无引用的记录，并发复用的 blob 不会被误删
+        keys = (await session.exec(
+            statement.returning(FileBlob.key).execution_options(synchronize_session=False)
+        )).scalars().all()
+        await file_meta.forget(session, keys)
+        if not keys:
+            await session.commit()
+            return 0
+
+        # 提交前删除文件：删除期间记录仍被本事务锁定，并发上传同一内容时会等待提交，
+        # 之后重新插入记录并写入文件，不会被这里删掉；文件删除失败只会留下无记录的孤立文件
+        for key in keys:
+            await s3_storage.delete_file(key)
+        await session.commit()
+        await rendition_service.delete_for(session, keys)
+        print(f"已回收 {len(keys)} 个无引用文件")
+        return len(keys)
+
+
+# 创建全局实例
+blob_store = BlobStore()
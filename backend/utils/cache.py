@@ -0,0 +1,116 @@
+"""
+进程内缓存模块
+提供带过期时间（TTL）的 LRU 缓存，用于热点数据的短期缓存
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class TTLCache:
+    """带 TTL 的 LRU 缓存
+
+    - 超过 maxsize 时淘汰最久未使用的条目
+    - 设置 maxbytes 时，写入需给出条目大小，总大小超出预算时同样按 LRU 淘汰
+    - 条目超过 ttl 秒后视为过期
+    - 仅在当前进程内有效，多 worker 部署时各自独立
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, maxbytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        # 键 -> (值, 过期时间, 大小)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_expired(self, expires_at: float) -> bool:
+        return expires_at <= time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，不存在或已过期时返回 default"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or self._is_expired(item[1]):
+                if item is not None:
+                    self._discard(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def _discard(self, key: Hashable) -> Optional[tuple]:
+        """删除条目并扣减总大小（调用方持有锁）"""
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+        return item
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: int = 0) -> None:
+        """写入缓存值（size 为条目大小，仅在设置了 maxbytes 时有意义）"""
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self._bytes > self.maxbytes
+            ):
+                self._discard(next(iter(self._data)))
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> bool:
+        """原地更新已缓存的值（保留原过期时间），未命中时返回 False"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or self._is_expired(item[1]):
+                return False
+
+            self._data[key] = (func(item[0]), item[1], item[2])
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """删除并返回缓存值"""
+        with self._lock:
+            item = self._discard(key)
+            return default if item is None else item[0]
+
+    def keys(self) -> List[Hashable]:
+        """返回当前所有键的快照"""
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        total = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+        if self.maxbytes is not None:
+            stats.update(bytes=self._bytes, maxbytes=self.maxbytes)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and not self._is_expired(item[1])
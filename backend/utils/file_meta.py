@@ -0,0 +1,136 @@
+"""
+文件元数据
+上传时把文件名、大小、MIME 类型、SHA-256 和预览类型写入 storedfile 表，
+预览和下载接口直接读取，不再从存储键推断（去重存储的 blobs/{sha256} 没有扩展名）
+"""
+import mimetypes
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import IS_SQLITE
+from models import StoredFile
+from utils.cache import TTLCache
+from utils.storage_backends import StoredObject
+
+# 文件元数据缓存条目上限与有效期（秒）
+FILE_META_CACHE_SIZE = int(os.getenv("FILE_META_CACHE_SIZE", "10000"))
+FILE_META_CACHE_TTL = int(os.getenv("FILE_META_CACHE_TTL", "600"))
+
+# 按存储键缓存的元数据（文件内容不可变，缓存只需在删除时失效）
+file_meta_cache = TTLCache(maxsize=FILE_META_CACHE_SIZE, ttl=FILE_META_CACHE_TTL)
+
+PREVIEW_TYPE_EXTENSIONS = (
+    ('image', ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.svg')),
+    ('pdf', ('.pdf',)),
+    ('text', ('.txt', '.md', '.json', '.xml', '.html', '.css', '.js', '.ts')),
+    ('video', ('.mp4', '.webm', '.ogg', '.avi', '.mov')),
+    ('audio', ('.mp3', '.wav', '.ogg', '.flac', '.aac')),
+    # Office 文档（需要外部服务）
+    ('office', ('.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx')),
+    ('archive', ('.zip', '.rar', '.7z', '.tar', '.gz')),
+)
+
+
+def get_preview_type(filename: str) -> str:
+    """根据文件名判断预览类型"""
+    filename_lower = filename.lower()
+    for preview_type, extensions in PREVIEW_TYPE_EXTENSIONS:
+        if filename_lower.endswith(extensions):
+            return preview_type
+    return 'unknown'
+
+
+class FileMetaService:
+    """文件元数据服务"""
+
+    @staticmethod
+    async def record(session: AsyncSession, stored: StoredObject, file_name: str) -> None:
+        """记录上传文件的元数据（不提交，由调用方与所属记录一起提交）
+
+        去重存储下相同内容共用一个键，这里保留首次上传时的元数据；
+        各次上传自己的文件名记录在公告/回复的 file_name 上，查询时由 describe 的 file_name 参数覆盖。
+        """
+        insert = sqlite_insert if IS_SQLITE else pg_insert
+        await session.exec(
+            insert(StoredFile)
+            .values(
+                key=stored.key,
+                file_name=file_name,
+                size=stored.size,
+                content_type=stored.content_type,
+                sha256=stored.sha256,
+                preview_type=get_preview_type(file_name),
+            )
+            .on_conflict_do_nothing(index_elements=[StoredFile.key])
+        )
+
+    @staticmethod
+    async def get(session: AsyncSession, file_key: str) -> Optional[dict]:
+        """查询文件元数据，未记录（如早期上传的文件）时返回 None"""
+        meta = file_meta_cache.get(file_key)
+        if meta is not None:
+            return meta
+
+        stored_file = await session.get(StoredFile, file_key)
+        if stored_file is None:
+            return None
+
+        meta = {
+            "key": stored_file.key,
+            "file_name": stored_file.file_name,
+            "size": stored_file.size,
+            "content_type": stored_file.content_type,
+            "sha256": stored_file.sha256,
+            "preview_type": stored_file.preview_type,
+        }
+        file_meta_cache.set(file_key, meta)
+        return meta
+
+    @staticmethod
+    async def describe(session: AsyncSession, file_key: str, file_name: Optional[str] = None) -> dict:
+        """查询文件元数据；未记录时按存储键推断预览类型和 MIME 类型
+
+        指定 file_name（引用该文件的公告/回复的原始文件名）时，文件名、预览类型和 MIME 类型以其为准，
+        去重存储下相同内容的不同上传各自显示自己的文件名。
+        """
+        meta = await FileMetaService.get(session, file_key)
+        if meta is None:
+            meta = {
+                "key": file_key,
+                "file_name": None,
+                "size": None,
+                "content_type": mimetypes.guess_type(file_key)[0] or "application/octet-stream",
+                "sha256": None,
+                "preview_type": get_preview_type(file_key),
+            }
+        if file_name:
+            meta = {
+                **meta,
+                "file_name": file_name,
+                "content_type": mimetypes.guess_type(file_name)[0] or meta["content_type"],
+                "preview_type": get_preview_type(file_name),
+            }
+        return meta
+
+    @staticmethod
+    async def forget(session: AsyncSession, file_keys: Iterable[str]) -> None:
+        """删除一组文件的元数据（不提交）"""
+        file_keys = list(file_keys)
+        if not file_keys:
+            return
+        await session.exec(
+            delete(StoredFile)
+            .where(StoredFile.key.in_(file_keys))
+            .execution_options(synchronize_session=False)
+        )
+        for file_key in file_keys:
+            file_meta_cache.pop(file_key)
+
+
+# 创建全局实例
+file_meta = FileMetaService()
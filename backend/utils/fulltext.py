@@ -0,0 +1,361 @@
+"""
+全文搜索索引
+- PostgreSQL：announcement / response 表各有一个存储的生成列 search_vector，
+  标题（回复为同事姓名）权重 A、内容权重 B，插入和更新时由数据库自动维护，
+  搜索时直接匹配 GIN 索引，不再对每行重复计算 to_tsvector
+- SQLite：FTS5 虚拟表 announcement_fts / response_fts，由触发器同步，BM25 排序。
+  中文按二元组（bigram）切分，在 Python 中分词后写入（注册为 SQL 函数 fts_tokenize），
+  FTS5 的 unicode61 分词器只需按空格切分
+- 搜索结果摘要：PostgreSQL 使用 ts_headline，SQLite 在 Python 中生成，
+  均去除 HTML 标签、转义后用 <mark> 标记命中词，长度不超过 SEARCH_SNIPPET_LENGTH 个字符
+"""
+import html
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# 全文搜索使用的文本搜索配置（chinese 需要安装 zhparser 扩展）
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "chinese")
+if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", SEARCH_TS_CONFIG):
+    raise ValueError(f"无效的 SEARCH_TS_CONFIG: {SEARCH_TS_CONFIG}")
+
+# 表名 -> (权重 A 的列, 权重 B 的列)
+SEARCH_VECTOR_COLUMNS = {
+    "announcement": ("title", "content"),
+    "response": ("colleague_name", "content"),
+}
+
+# 与 search_vector 放在同一个 GIN 索引中的筛选列（需要 btree_gin 扩展），
+# 带筛选条件的搜索只扫描一个索引
+SEARCH_FILTER_COLUMNS = {
+    "announcement": ("type", "created_at"),
+    "response": ("colleague_name", "created_at"),
+}
+
+# 被 search_vector 取代的旧表达式索引（见 optimize_database.py）
+LEGACY_SEARCH_INDEXES = ("idx_announcement_search", "idx_response_search")
+
+
+def search_vector_expression(title_column: str, content_column: str, config: str = SEARCH_TS_CONFIG) -> str:
+    """加权 tsvector 表达式：标题权重 A，内容权重 B"""
+    return (
+        f"setweight(to_tsvector('{config}', coalesce({title_column}, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce({content_column}, '')), 'B')"
+    )
+
+
+def search_vector_ddl(config: str = SEARCH_TS_CONFIG, btree_gin: bool = True) -> list:
+    """创建 search_vector 生成列和 GIN 索引的 SQL（可重复执行）
+
+    btree_gin 为 True 时创建 (search_vector, 筛选列) 复合 GIN 索引并删除单列 GIN 索引
+    （复合索引同样可用于不带筛选条件的搜索），需要先安装 btree_gin 扩展；
+    否则只创建 search_vector 单列 GIN 索引，筛选条件使用各列自己的 B-tree 索引。
+    新增 STORED 生成列会重写整张表，大表请在低峰期执行。
+    """
+    statements = []
+    for table, (title_column, content_column) in SEARCH_VECTOR_COLUMNS.items():
+        expression = search_vector_expression(title_column, content_column, config)
+        statements.append(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        if btree_gin:
+            columns = ", ".join(("search_vector", *SEARCH_FILTER_COLUMNS[table]))
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_search_filter "
+                f"ON {table} USING gin({columns})"
+            )
+            statements.append(f"DROP INDEX IF EXISTS idx_{table}_search_vector")
+        else:
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_search_vector "
+                f"ON {table} USING gin(search_vector)"
+            )
+    for index in LEGACY_SEARCH_INDEXES:
+        statements.append(f"DROP INDEX IF EXISTS {index}")
+    return statements
+
+
+def enable_btree_gin(connection) -> bool:
+    """安装 btree_gin 扩展（需要相应权限），失败时返回 False"""
+    from sqlalchemy import text
+
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+        return True
+    except Exception as e:
+        print(f"警告: 无法启用 btree_gin 扩展，搜索筛选将使用单列索引: {e}")
+        return False
+
+
+def ensure_search_vectors(connection) -> None:
+    """在 PostgreSQL 上创建 search_vector 生成列和 GIN 索引（由调用方提交）"""
+    from sqlalchemy import text
+
+    for statement in search_vector_ddl(btree_gin=enable_btree_gin(connection)):
+        connection.execute(text(statement))
+
+
+# ---------- SQLite FTS5 ----------
+
+# 中日韩统一表意文字（含扩展 A、兼容区）
+_CJK_CHARS = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_PATTERN = re.compile(f"[{_CJK_CHARS}]")
+_TOKEN_PATTERN = re.compile(f"[{_CJK_CHARS}]+|[^\\W_{_CJK_CHARS}]+")
+
+# BM25 列权重（标题:内容），与 PostgreSQL ts_rank 默认的 A:B 权重（1.0:0.4）一致
+SQLITE_BM25_WEIGHTS = (1.0, 0.4)
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """分词：连续中文切分为重叠二元组，其余按单词切分并转小写
+
+    例如 “会议通知 Q3” -> ["会议", "议通", "通知", "知", "q3"]。
+    中文串末尾额外保留最后一个字，单字查询可用前缀匹配命中任意位置的字。
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(value or ""):
+        word = match.group()
+        if _is_cjk(word[0]):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            tokens.append(word[-1])
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def _is_cjk(char: str) -> bool:
+    return bool(_CJK_PATTERN.match(char))
+
+
+def index_text(value: Optional[str]) -> str:
+    """写入 FTS5 表的文本（分词结果以空格连接），注册为 SQL 函数 fts_tokenize"""
+    return " ".join(tokenize(value))
+
+
+def match_query(query: str) -> Optional[str]:
+    """把搜索词转换为 FTS5 MATCH 表达式，所有词都需命中（与 plainto_tsquery 一致）
+
+    - 连续中文：二元组组成短语，要求相邻出现；单字使用前缀匹配
+    - 其他单词：精确匹配
+    没有可搜索的词时返回 None。
+    """
+    terms = []
+    for match in _TOKEN_PATTERN.finditer(query):
+        word = match.group()
+        if _is_cjk(word[0]):
+            if len(word) == 1:
+                terms.append(f'"{word}"*')
+            else:
+                bigrams = " ".join(word[i:i + 2] for i in range(len(word) - 1))
+                terms.append(f'"{bigrams}"')
+        else:
+            terms.append(f'"{word.lower()}"')
+    return " ".join(terms) or None
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None) -> None:
+    """SQLAlchemy connect 事件：在每个 SQLite 连接上注册 fts_tokenize（触发器使用）"""
+    dbapi_connection.create_function("fts_tokenize", 1, index_text, deterministic=True)
+
+
+def fts_table(table: str) -> str:
+    return f"{table}_fts"
+
+
+def sqlite_fts_ddl() -> list:
+    """创建 FTS5 表和同步触发器的 SQL（可重复执行）"""
+    statements = []
+    for table, (title_column, content_column) in SEARCH_VECTOR_COLUMNS.items():
+        fts = fts_table(table)
+        statements.append(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+            f"USING fts5({title_column}, {content_column}, tokenize='unicode61')"
+        )
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {title_column}, {content_column})
+                VALUES (new.id, fts_tokenize(new.{title_column}), fts_tokenize(new.{content_column}));
+            END
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update
+            AFTER UPDATE OF {title_column}, {content_column} ON {table} BEGIN
+                UPDATE {fts}
+                SET {title_column} = fts_tokenize(new.{title_column}),
+                    {content_column} = fts_tokenize(new.{content_column})
+                WHERE rowid = new.id;
+            END
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.id;
+            END
+        """)
+    return statements
+
+
+def rebuild_sqlite_fts(connection, table: str) -> None:
+    """按源表重建 FTS5 索引（首次创建或分词规则变化后执行，由调用方提交）"""
+    from sqlalchemy import text
+
+    title_column, content_column = SEARCH_VECTOR_COLUMNS[table]
+    fts = fts_table(table)
+    connection.execute(text(f"DELETE FROM {fts}"))
+    connection.execute(text(f"""
+        INSERT INTO {fts}(rowid, {title_column}, {content_column})
+        SELECT id, fts_tokenize({title_column}), fts_tokenize({content_column}) FROM {table}
+    """))
+
+
+def ensure_sqlite_fts(connection) -> None:
+    """在 SQLite 上创建 FTS5 表和触发器，新建的表从源表回填（由调用方提交）"""
+    from sqlalchemy import text
+
+    existing = set(connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )).scalars())
+    for statement in sqlite_fts_ddl():
+        connection.execute(text(statement))
+    for table in SEARCH_VECTOR_COLUMNS:
+        if fts_table(table) not in existing:
+            rebuild_sqlite_fts(connection, table)
+
+
+# ---------- 查询片段 ----------
+
+@dataclass(frozen=True)
+class SearchSource:
+    """全文搜索查询片段：FROM 子句、匹配条件和相关性得分（越大越相关）"""
+    from_clause: str
+    where: str
+    rank: str
+
+
+def search_source(table: str, alias: str, is_sqlite: bool) -> SearchSource:
+    """按数据库类型生成某个表的全文搜索片段，搜索词参数名为 :query（见 search_param）"""
+    if is_sqlite:
+        fts = fts_table(table)
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        return SearchSource(
+            # CROSS JOIN 固定连接顺序：由 MATCH 驱动，再按主键取源表行并应用筛选条件，
+            # 避免筛选列的 B-tree 索引被选作外层循环、逐行探测 FTS 表
+            from_clause=f"{fts} CROSS JOIN {table} {alias} ON {alias}.id = {fts}.rowid",
+            where=f"{fts} MATCH :query",
+            # bm25 越小越相关，取负数与 ts_rank 方向一致
+            rank=f"-bm25({fts}, {weights})",
+        )
+    return SearchSource(
+        from_clause=f"{table} {alias} CROSS JOIN plainto_tsquery('{SEARCH_TS_CONFIG}', :query) AS query",
+        where=f"{alias}.search_vector @@ query",
+        rank=f"ts_rank({alias}.search_vector, query)",
+    )
+
+
+def search_param(query: str, is_sqlite: bool) -> Optional[str]:
+    """搜索词参数：PostgreSQL 原样传入，SQLite 转换为 MATCH 表达式（无可搜索的词时为 None）"""
+    return match_query(query) if is_sqlite else query
+
+
+# ---------- 搜索结果摘要 ----------
+
+# 摘要最多显示的字符数（不含标记）
+SEARCH_SNIPPET_LENGTH = int(os.getenv("SEARCH_SNIPPET_LENGTH", "120"))
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+# ts_headline 选项：最多两个片段，长度最终由 truncate_snippet 截断
+HEADLINE_OPTIONS = (
+    f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+    "MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+# 块级标签替换为空格，行内标签（<b>、<span> 等）直接去除
+_BLOCK_TAG_PATTERN = re.compile(r"</?(?:p|div|br|li|ul|ol|h[1-6]|tr|td|th|blockquote|pre)\b[^>]*>", re.IGNORECASE)
+_WORD_CHAR = f"[^\\W_{_CJK_CHARS}]"
+# 摘要中的单位：标记、HTML 实体或单个字符
+_SNIPPET_UNIT_PATTERN = re.compile(f"{HIGHLIGHT_START}|{HIGHLIGHT_STOP}|&#?\\w+;|.", re.DOTALL)
+
+
+def headline_expression(column: str, is_sqlite: bool) -> str:
+    """摘要列的 SQL 表达式（放在分页之后的外层查询，只对当前页计算）
+
+    PostgreSQL 先去除 HTML 标签并转义尖括号，再由 ts_headline 插入标记；
+    SQLite 返回 NULL，摘要由 make_snippet 生成。
+    """
+    if is_sqlite:
+        return "NULL"
+    plain = f"replace(replace(regexp_replace(coalesce({column}, ''), '<[^>]*>', ' ', 'g'), '<', '&lt;'), '>', '&gt;')"
+    return (
+        f"ts_headline('{SEARCH_TS_CONFIG}', {plain}, "
+        f"plainto_tsquery('{SEARCH_TS_CONFIG}', :query), '{HEADLINE_OPTIONS}')"
+    )
+
+
+def plain_text(value: Optional[str]) -> str:
+    """富文本转纯文本：去除标签、还原实体、合并空白"""
+    text = _TAG_PATTERN.sub("", _BLOCK_TAG_PATTERN.sub(" ", value or ""))
+    return " ".join(html.unescape(text).split())
+
+
+def _highlight_pattern(query: str) -> Optional["re.Pattern"]:
+    """查询词的匹配模式：中文按子串匹配，其他单词按整词匹配（不区分大小写）"""
+    terms = sorted({match.group() for match in _TOKEN_PATTERN.finditer(query)}, key=len, reverse=True)
+    if not terms:
+        return None
+    parts = [
+        re.escape(term) if _is_cjk(term[0]) else f"(?<!{_WORD_CHAR}){re.escape(term)}(?!{_WORD_CHAR})"
+        for term in terms
+    ]
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+def make_snippet(value: Optional[str], query: str, length: int = SEARCH_SNIPPET_LENGTH) -> str:
+    """在 Python 中生成摘要（SQLite）：截取第一个命中词附近的 length 个字符，转义后标记命中词"""
+    text = plain_text(value)
+    pattern = _highlight_pattern(query)
+    first = pattern.search(text) if pattern else None
+    # 命中词前保留约四分之一的上下文
+    start = max(0, first.start() - length // 4) if first else 0
+    window = text[start:start + length]
+
+    parts = []
+    position = 0
+    for match in (pattern.finditer(window) if pattern else ()):
+        parts.append(html.escape(window[position:match.start()], quote=False))
+        parts.append(f"{HIGHLIGHT_START}{html.escape(match.group(), quote=False)}{HIGHLIGHT_STOP}")
+        position = match.end()
+    parts.append(html.escape(window[position:], quote=False))
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + length < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+def truncate_snippet(snippet: str, length: int = SEARCH_SNIPPET_LENGTH) -> str:
+    """把带标记的摘要截断到 length 个可见字符，保持标记闭合"""
+    parts = []
+    visible = 0
+    highlighted = False
+    for match in _SNIPPET_UNIT_PATTERN.finditer(snippet):
+        unit = match.group()
+        if unit in (HIGHLIGHT_START, HIGHLIGHT_STOP):
+            highlighted = unit == HIGHLIGHT_START
+        elif visible == length:
+            if highlighted:
+                parts.append(HIGHLIGHT_STOP)
+            parts.append("…")
+            return "".join(parts)
+        else:
+            visible += 1
+        parts.append(unit)
+    return "".join(parts)
+
+
+def result_snippet(headline: Optional[str], content: Optional[str], query: str) -> str:
+    """搜索结果摘要：有 ts_headline 结果时截断，否则在 Python 中生成"""
+    if headline is not None:
+        return truncate_snippet(headline)
+    return make_snippet(content, query)
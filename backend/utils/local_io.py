@@ -0,0 +1,87 @@
+"""
+本地文件 I/O 线程池
+本地存储的磁盘读写放到工作线程中执行，避免慢磁盘阻塞事件循环；
+读、写分别限制并发数，并统计排队情况
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import anyio
+import anyio.to_thread
+
+# 本地存储读/写操作的最大并发线程数
+LOCAL_IO_READ_CONCURRENCY = int(os.getenv("LOCAL_IO_READ_CONCURRENCY", "16"))
+LOCAL_IO_WRITE_CONCURRENCY = int(os.getenv("LOCAL_IO_WRITE_CONCURRENCY", "4"))
+
+
+class LocalIOExecutor:
+    """带并发上限的线程池执行器（基于 anyio CapacityLimiter）"""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self.operations = 0
+        self.errors = 0
+        self.max_waiting = 0
+        self.total_wait_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        # 延迟创建，确保在事件循环中初始化
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.concurrency)
+        return self._limiter
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在工作线程中执行 func(*args)，超出并发上限时排队等待"""
+        limiter = self.limiter
+        # 线程已满时本次调用也需要排队
+        if limiter.borrowed_tokens >= limiter.total_tokens:
+            self.max_waiting = max(self.max_waiting, limiter.statistics().tasks_waiting + 1)
+
+        queued_at = time.perf_counter()
+
+        def call() -> Any:
+            # 在线程中开始执行时记录排队耗时
+            waited = time.perf_counter() - queued_at
+            with self._lock:
+                self.total_wait_time += waited
+            return func(*args)
+
+        self.operations += 1
+        try:
+            return await anyio.to_thread.run_sync(call, limiter=limiter)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def stats(self) -> dict:
+        """返回并发与排队统计"""
+        if self._limiter is None:
+            active, waiting = 0, 0
+        else:
+            statistics = self._limiter.statistics()
+            active, waiting = statistics.borrowed_tokens, statistics.tasks_waiting
+        return {
+            "concurrency": self.concurrency,
+            "active": active,
+            "waiting": waiting,
+            "max_waiting": self.max_waiting,
+            "operations": self.operations,
+            "errors": self.errors,
+            "avg_wait_ms": round(self.total_wait_time / self.operations * 1000, 3) if self.operations else 0.0,
+        }
+
+
+# 创建全局实例
+local_reads = LocalIOExecutor("read", LOCAL_IO_READ_CONCURRENCY)
+local_writes = LocalIOExecutor("write", LOCAL_IO_WRITE_CONCURRENCY)
+
+
+def local_io_stats() -> dict:
+    """本地 I/O 线程池统计"""
+    return {"read": local_reads.stats(), "write": local_writes.stats()}
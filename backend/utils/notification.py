@@ -2,18 +2,105 @@
 通知服务模块
 处理站内信通知的发送和管理
 """
-from typing import List
-from sqlmodel import Session, select
+import heapq
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import and_, delete, func, not_, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import Notification, NotificationType, User
+from models import (
+    BroadcastNotification,
+    BroadcastReceipt,
+    Notification,
+    NotificationSource,
+    NotificationType,
+    NotificationWatermark,
+    User,
+)
+from database import async_engine
+from utils.cache import TTLCache
+from utils.pagination import keyset_order
+from utils.pubsub import hub
+
+# 未读数量缓存：铃铛组件轮询的热点查询，命中时不访问通知表
+# 多 worker 部署时各进程独立，由 TTL 限制不一致的时长
+UNREAD_COUNT_CACHE_SIZE = int(os.getenv("UNREAD_COUNT_CACHE_SIZE", "10000"))
+UNREAD_COUNT_CACHE_TTL = float(os.getenv("UNREAD_COUNT_CACHE_TTL", "30"))
+
+unread_count_cache = TTLCache(maxsize=UNREAD_COUNT_CACHE_SIZE, ttl=UNREAD_COUNT_CACHE_TTL)
+
+# 未读数量的变更代数：通知变更提交后、修改缓存前递增。
+# 读取未命中时先记下代数，查询期间发生变更则不回写，避免查询到的旧计数覆盖变更后的缓存直到 TTL 过期
+_unread_count_generation = 0
+
+
+def _bump_unread_count_generation() -> None:
+    global _unread_count_generation
+    _unread_count_generation += 1
+
+
+def _adjust_unread_count(user_id: int, delta: int) -> None:
+    """调整已缓存的未读数量（未缓存时不做处理，下次读取时重新计算）"""
+    _bump_unread_count_generation()
+    unread_count_cache.update(user_id, lambda count: max(0, count + delta))
+
+
+def _invalidate_unread_count(user_id: int) -> None:
+    """失效已缓存的未读数量，由下次读取重新计算"""
+    _bump_unread_count_generation()
+    unread_count_cache.pop(user_id)
+
+
+def serialize_notification(item: dict) -> dict:
+    """把通知条目转换为可 JSON 序列化的字典"""
+    return {
+        "id": item["id"],
+        "source": item["source"].value,
+        "type": item["type"].value,
+        "title": item["title"],
+        "content": item["content"],
+        "is_read": item["is_read"],
+        "related_id": item["related_id"],
+        "created_at": item["created_at"].isoformat(),
+    }
+
+
+def notification_sort_key(item: dict) -> tuple:
+    """合并排序和游标使用的排序键 (created_at, source, id)"""
+    return item["created_at"], item["source"].value, item["id"]
+
+
+def _keyset_after(query, created_at, id_column, source: NotificationSource, after: Optional[tuple]):
+    """按 (created_at, id) 倒序排序，并从游标 (created_at, source, id) 之后继续
+
+    每路查询的来源固定：来源与游标相同时按 (created_at, id) 比较；
+    否则同一时间的条目整体排在游标之前或之后，只比较 created_at。
+    """
+    if after is not None:
+        after_at, after_source, after_id = after
+        if source == after_source:
+            return keyset_order(query, (created_at, id_column), (after_at, after_id))
+        if source.value < after_source.value:
+            query = query.where(created_at <= after_at)
+        else:
+            query = query.where(created_at < after_at)
+    return keyset_order(query, (created_at, id_column), None)
+
+
+async def _publish_sync(user_id: int) -> None:
+    """通知该用户的所有推送连接重新同步未读数量"""
+    await hub.publish(f"user:{user_id}", {"event": "sync"})
 
 
 class NotificationService:
     """通知服务"""
 
     @staticmethod
-    def send_notification(
-        session: Session,
+    async def send_notification(
+        session: AsyncSession,
         user_id: int,
         type: NotificationType,
         title: str,
@@ -30,133 +117,409 @@ class NotificationService:
             is_read=False,
         )
         session.add(notification)
-        session.commit()
-        session.refresh(notification)
+        await session.commit()
+        await session.refresh(notification)
+        _adjust_unread_count(user_id, 1)
+
+        await hub.publish(f"user:{user_id}", {
+            "event": "notification",
+            "data": serialize_notification({
+                "id": notification.id,
+                "source": NotificationSource.PERSONAL,
+                "type": notification.type,
+                "title": notification.title,
+                "content": notification.content,
+                "is_read": False,
+                "related_id": notification.related_id,
+                "created_at": notification.created_at,
+            }),
+        })
         return notification
 
     @staticmethod
-    def broadcast_notification(
-        session: Session,
+    async def broadcast_notification(
+        session: AsyncSession,
+        type: NotificationType,
+        title: str,
+        content: str,
+        related_id: int = None,
+        exclude_user_id: int = None
+    ) -> BroadcastNotification:
+        """广播通知给所有用户
+
+        广播只写入一行 BroadcastNotification，读取时再与用户的
+        已读水位线和回执合并（fan-out-on-read），写入代价为 O(1)。
+        """
+        broadcast = BroadcastNotification(
+            type=type,
+            title=title,
+            content=content,
+            related_id=related_id,
+            exclude_user_id=exclude_user_id,
+        )
+        session.add(broadcast)
+        await session.commit()
+        await session.refresh(broadcast)
+
+        # 已缓存的用户在加入之后才会被缓存，广播对其均可见；
+        # 未缓存的用户也可能有进行中的读取，先递增代数使其不回写
+        _bump_unread_count_generation()
+        for user_id in unread_count_cache.keys():
+            if user_id != exclude_user_id:
+                _adjust_unread_count(user_id, 1)
+
+        await hub.publish("broadcast", {
+            "event": "notification",
+            "exclude_user_id": exclude_user_id,
+            "data": serialize_notification({
+                "id": broadcast.id,
+                "source": NotificationSource.BROADCAST,
+                "type": broadcast.type,
+                "title": broadcast.title,
+                "content": broadcast.content,
+                "is_read": False,
+                "related_id": broadcast.related_id,
+                "created_at": broadcast.created_at,
+            }),
+        })
+        return broadcast
+
+    @staticmethod
+    async def broadcast_notification_task(
         type: NotificationType,
         title: str,
         content: str,
         related_id: int = None,
         exclude_user_id: int = None
-    ) -> List[Notification]:
-        """广播通知给所有用户"""
-        # 获取所有用户
-        query = select(User)
-        if exclude_user_id:
-            query = query.where(User.id != exclude_user_id)
-
-        users = session.exec(query).all()
-
-        # 为每个用户创建通知
-        notifications = []
-        for user in users:
-            if not user.is_active:
-                continue
-
-            notification = Notification(
-                user_id=user.id,
+    ) -> int:
+        """后台任务：使用独立会话广播通知（在响应发送之后执行）"""
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            broadcast = await NotificationService.broadcast_notification(
+                session=session,
                 type=type,
                 title=title,
                 content=content,
                 related_id=related_id,
-                is_read=False,
+                exclude_user_id=exclude_user_id,
+            )
+            return broadcast.id
+
+    @staticmethod
+    def _broadcast_visible_to(user_id: int):
+        """广播对用户可见的条件：用户加入之后发布（与逐行扇出时的行为一致），且未排除该用户"""
+        joined_at = select(User.created_at).where(User.id == user_id).scalar_subquery()
+        return and_(
+            BroadcastNotification.created_at >= joined_at,
+            or_(
+                BroadcastNotification.exclude_user_id.is_(None),
+                BroadcastNotification.exclude_user_id != user_id,
+            ),
+        )
+
+    @staticmethod
+    def _visible_broadcasts(user_id: int):
+        """构建用户可见广播的查询（附带回执和已读状态）"""
+        watermark = func.coalesce(
+            select(NotificationWatermark.last_seen_broadcast_id)
+            .where(NotificationWatermark.user_id == user_id)
+            .scalar_subquery(),
+            0,
+        )
+        is_read = or_(
+            BroadcastNotification.id <= watermark,
+            BroadcastReceipt.is_read.is_(True),
+        )
+
+        query = (
+            select(BroadcastNotification, is_read.label("is_read"))
+            .outerjoin(
+                BroadcastReceipt,
+                and_(
+                    BroadcastReceipt.broadcast_id == BroadcastNotification.id,
+                    BroadcastReceipt.user_id == user_id,
+                ),
+            )
+            .where(NotificationService._broadcast_visible_to(user_id))
+            # 没有回执（NULL）或未删除
+            .where(BroadcastReceipt.is_dismissed.is_not(True))
+        )
+        return query, is_read
+
+    @staticmethod
+    async def _get_receipt(session: AsyncSession, user_id: int, broadcast_id: int) -> Optional[BroadcastReceipt]:
+        """获取或创建广播回执，广播不存在或对该用户不可见时返回 None"""
+        receipt = (await session.exec(
+            select(BroadcastReceipt).where(
+                BroadcastReceipt.user_id == user_id,
+                BroadcastReceipt.broadcast_id == broadcast_id,
             )
-            session.add(notification)
-            notifications.append(notification)
+        )).first()
+        if receipt:
+            return receipt
 
-        session.commit()
-        return notifications
+        # 与列表查询使用相同的可见性条件，避免为看不到的广播写入回执
+        visible = (await session.exec(
+            select(BroadcastNotification.id).where(
+                BroadcastNotification.id == broadcast_id,
+                NotificationService._broadcast_visible_to(user_id),
+            )
+        )).first()
+        if visible is None:
+            return None
+
+        return BroadcastReceipt(user_id=user_id, broadcast_id=broadcast_id)
 
     @staticmethod
-    def mark_as_read(session: Session, notification_id: int) -> bool:
+    async def mark_as_read(session: AsyncSession, notification_id: int) -> bool:
         """标记通知为已读"""
-        notification = session.get(Notification, notification_id)
+        notification = await session.get(Notification, notification_id)
         if not notification:
             return False
 
+        was_unread = not notification.is_read
         notification.is_read = True
         session.add(notification)
-        session.commit()
+        await session.commit()
+        if was_unread:
+            _adjust_unread_count(notification.user_id, -1)
+            await _publish_sync(notification.user_id)
+        return True
+
+    @staticmethod
+    async def mark_broadcast_as_read(session: AsyncSession, user_id: int, broadcast_id: int) -> bool:
+        """标记广播通知为已读（写入稀疏回执）"""
+        receipt = await NotificationService._get_receipt(session, user_id, broadcast_id)
+        if not receipt:
+            return False
+
+        receipt.is_read = True
+        session.add(receipt)
+        await session.commit()
+        # 是否原本未读取决于水位线，直接失效缓存由下次读取重新计算
+        _invalidate_unread_count(user_id)
+        await _publish_sync(user_id)
         return True
 
     @staticmethod
-    def mark_all_as_read(session: Session, user_id: int) -> int:
+    async def mark_all_as_read(session: AsyncSession, user_id: int) -> int:
         """标记用户所有通知为已读"""
-        notifications = session.exec(
-            select(Notification).where(
+        result = await session.exec(
+            update(Notification)
+            .where(
                 Notification.user_id == user_id,
-                Notification.is_read == False
+                Notification.is_read.is_(False)
             )
-        ).all()
+            .values(is_read=True)
+        )
 
-        for notification in notifications:
-            notification.is_read = True
-            session.add(notification)
+        # 广播通知：把水位线推进到最新广播，并清理已被水位线覆盖的回执
+        broadcast_count = await NotificationService._get_broadcast_unread_count(session, user_id)
+        latest_id = (await session.exec(select(func.max(BroadcastNotification.id)))).one()
+        if latest_id:
+            watermark = await session.get(NotificationWatermark, user_id)
+            if not watermark:
+                watermark = NotificationWatermark(user_id=user_id)
+            watermark.last_seen_broadcast_id = latest_id
+            watermark.updated_at = datetime.utcnow()
+            session.add(watermark)
 
-        session.commit()
-        return len(notifications)
+            await session.exec(
+                delete(BroadcastReceipt).where(
+                    BroadcastReceipt.user_id == user_id,
+                    BroadcastReceipt.broadcast_id <= latest_id,
+                    BroadcastReceipt.is_dismissed.is_(False),
+                )
+            )
+
+        await session.commit()
+        _bump_unread_count_generation()
+        unread_count_cache.set(user_id, 0)
+        await _publish_sync(user_id)
+        return result.rowcount + broadcast_count
 
     @staticmethod
-    def get_user_notifications(
-        session: Session,
+    async def get_user_notifications(
+        session: AsyncSession,
         user_id: int,
         skip: int = 0,
         limit: int = 20,
-        unread_only: bool = False
-    ) -> List[Notification]:
-        """获取用户的通知"""
+        unread_only: bool = False,
+        after: Optional[tuple] = None
+    ) -> List[dict]:
+        """获取用户的通知（合并个人通知和广播通知，按时间倒序）
+
+        按 (created_at, source, id) 倒序排列：个人通知和广播的 ID 来自不同的表，
+        同一时间的条目需先按来源区分。after 为游标解码后的 (created_at, source, id)，指定时从该位置之后继续。
+        """
         query = select(Notification).where(Notification.user_id == user_id)
 
         if unread_only:
-            query = query.where(Notification.is_read == False)
+            query = query.where(Notification.is_read.is_(False))
+
+        # 两路各取前 skip + limit 条，合并后再截取当前页
+        window = skip + limit
+        query = _keyset_after(
+            query, Notification.created_at, Notification.id, NotificationSource.PERSONAL, after
+        ).limit(window)
+        personal = [
+            {
+                "id": n.id,
+                "source": NotificationSource.PERSONAL,
+                "type": n.type,
+                "title": n.title,
+                "content": n.content,
+                "is_read": n.is_read,
+                "related_id": n.related_id,
+                "created_at": n.created_at,
+            }
+            for n in (await session.exec(query)).all()
+        ]
+
+        broadcast_query, is_read = NotificationService._visible_broadcasts(user_id)
+        if unread_only:
+            broadcast_query = broadcast_query.where(not_(is_read))
+        broadcast_query = _keyset_after(
+            broadcast_query, BroadcastNotification.created_at, BroadcastNotification.id,
+            NotificationSource.BROADCAST, after,
+        ).limit(window)
+        broadcasts = [
+            {
+                "id": b.id,
+                "source": NotificationSource.BROADCAST,
+                "type": b.type,
+                "title": b.title,
+                "content": b.content,
+                "is_read": bool(read),
+                "related_id": b.related_id,
+                "created_at": b.created_at,
+            }
+            for b, read in (await session.exec(broadcast_query)).all()
+        ]
 
-        query = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit)
+        merged = heapq.merge(personal, broadcasts, key=notification_sort_key, reverse=True)
+        return list(merged)[skip:window]
 
-        return session.exec(query).all()
+    @staticmethod
+    async def _get_broadcast_unread_count(session: AsyncSession, user_id: int) -> int:
+        """获取用户未读广播数量"""
+        broadcast_query, is_read = NotificationService._visible_broadcasts(user_id)
+        unread = broadcast_query.where(not_(is_read)).subquery()
+        return (await session.exec(select(func.count()).select_from(unread))).one()
 
     @staticmethod
-    def get_unread_count(session: Session, user_id: int) -> int:
-        """获取用户未读通知数量"""
-        return len(
-            session.exec(
-                select(Notification).where(
-                    Notification.user_id == user_id,
-                    Notification.is_read == False
-                )
-            ).all()
-        )
+    async def get_unread_count(session: AsyncSession, user_id: int) -> int:
+        """获取用户未读通知数量（个人通知 + 广播通知）
+
+        优先读取进程内缓存；未命中时使用 COUNT 查询，
+        个人通知部分走 (user_id, is_read) 复合索引。查询期间有通知变更时不回写缓存。
+        """
+        cached = unread_count_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        generation = _unread_count_generation
+        personal_count = (await session.exec(
+            select(func.count()).select_from(Notification).where(
+                Notification.user_id == user_id,
+                Notification.is_read.is_(False)
+            )
+        )).one()
+        count = personal_count + await NotificationService._get_broadcast_unread_count(session, user_id)
+        # 查询期间有通知变更时，结果可能早于变更，不回写缓存
+        if generation == _unread_count_generation:
+            unread_count_cache.set(user_id, count)
+        return count
 
     @staticmethod
-    def delete_notification(session: Session, notification_id: int) -> bool:
+    async def delete_notification(session: AsyncSession, notification_id: int) -> bool:
         """删除通知"""
-        notification = session.get(Notification, notification_id)
+        notification = await session.get(Notification, notification_id)
         if not notification:
             return False
 
-        session.delete(notification)
-        session.commit()
+        was_unread = not notification.is_read
+        user_id = notification.user_id
+        await session.delete(notification)
+        await session.commit()
+        if was_unread:
+            _adjust_unread_count(user_id, -1)
+            await _publish_sync(user_id)
+        return True
+
+    @staticmethod
+    async def dismiss_broadcast(session: AsyncSession, user_id: int, broadcast_id: int) -> bool:
+        """删除广播通知（仅对当前用户隐藏）"""
+        receipt = await NotificationService._get_receipt(session, user_id, broadcast_id)
+        if not receipt:
+            return False
+
+        receipt.is_dismissed = True
+        session.add(receipt)
+        await session.commit()
+        _invalidate_unread_count(user_id)
+        await _publish_sync(user_id)
         return True
 
     @staticmethod
-    def delete_old_notifications(session: Session, days: int = 30) -> int:
-        """删除旧通知（超过指定天数）"""
-        from datetime import timedelta
+    async def delete_old_notifications(
+        session: AsyncSession,
+        days: int = 30,
+        batch_size: int = 5000,
+        time_budget: Optional[float] = None
+    ) -> int:
+        """删除旧通知（超过指定天数）
 
+        按批执行集合式 DELETE，每批单独提交，避免长事务和大量内存占用；
+        指定 time_budget（秒）时超时即停止，剩余部分留给下一次执行。
+        返回删除的个人通知和广播通知总数。
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
+        deadline = time.monotonic() + time_budget if time_budget else None
+        deleted = 0
+
+        def has_time() -> bool:
+            return deadline is None or time.monotonic() < deadline
 
-        notifications = session.exec(
-            select(Notification).where(Notification.created_at < cutoff_date)
-        ).all()
+        # 个人通知
+        while has_time():
+            batch = (
+                select(Notification.id)
+                .where(Notification.created_at < cutoff_date)
+                .limit(batch_size)
+            )
+            result = await session.exec(
+                delete(Notification).where(Notification.id.in_(batch.scalar_subquery()))
+            )
+            await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+        # 广播通知（先删除引用它们的回执）
+        while has_time():
+            broadcast_ids = (await session.exec(
+                select(BroadcastNotification.id)
+                .where(BroadcastNotification.created_at < cutoff_date)
+                .limit(batch_size)
+            )).all()
+            if not broadcast_ids:
+                break
 
-        for notification in notifications:
-            session.delete(notification)
+            await session.exec(
+                delete(BroadcastReceipt).where(BroadcastReceipt.broadcast_id.in_(broadcast_ids))
+            )
+            result = await session.exec(
+                delete(BroadcastNotification).where(BroadcastNotification.id.in_(broadcast_ids))
+            )
+            await session.commit()
+            deleted += result.rowcount
+            if len(broadcast_ids) < batch_size:
+                break
 
-        session.commit()
-        return len(notifications)
+        if deleted:
+            _bump_unread_count_generation()
+            unread_count_cache.clear()
+        return deleted
 
 
 # 创建全局实例
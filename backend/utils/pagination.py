@@ -0,0 +1,63 @@
+"""
+游标（keyset）分页工具
+游标是对排序键（如 created_at, id）的不透明编码，
+查询时从上一页最后一条记录之后继续，避免 OFFSET 深分页扫描和翻页期间的重复/遗漏
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import literal, tuple_
+
+T = TypeVar("T")
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """游标分页响应"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(*values: Any) -> str:
+    """把排序键编码为不透明游标"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[type]) -> Optional[tuple]:
+    """解码游标并按 types 还原各排序键，空游标表示第一页"""
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError(cursor)
+        return tuple(
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for value, type_ in zip(payload, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def keyset_order(statement, columns: Sequence, after: Optional[tuple]):
+    """按 columns 倒序排序，并从游标位置（不含）之后继续"""
+    if after is not None:
+        statement = statement.where(
+            tuple_(*columns) < tuple_(*[literal(value, column.type) for value, column in zip(after, columns)])
+        )
+    return statement.order_by(*[column.desc() for column in columns])
+
+
+def build_page(rows: List[Any], limit: int, key: Callable[[Any], Tuple]) -> Tuple[List[Any], Optional[str]]:
+    """截取一页数据并生成下一页游标（rows 需多查询一条用于判断是否还有下一页）"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,166 @@
+"""
+发布/订阅模块
+为 SSE 推送提供进程内的异步消息中心，后端可插拔：
+- memory：进程内直接分发（单 worker）
+- postgres：通过 PostgreSQL LISTEN/NOTIFY 在多个 worker 之间转发
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from sqlmodel import text
+
+from database import DATABASE_URL, IS_SQLITE, async_engine
+
+# 后端类型：memory（默认）或 postgres
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory").lower()
+# PostgreSQL NOTIFY 使用的频道名
+PUBSUB_PG_CHANNEL = os.getenv("PUBSUB_PG_CHANNEL", "app_events")
+# 每个订阅者的消息队列上限，慢客户端超出后丢弃消息
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "100"))
+
+
+class Subscription:
+    """订阅句柄（持有一个消息队列）"""
+
+    def __init__(self, channels: Iterable[str]):
+        self.channels = set(channels)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    async def get(self) -> dict:
+        """等待下一条消息"""
+        return await self.queue.get()
+
+
+class MemoryBackend:
+    """进程内后端：发布即分发给本进程的订阅者"""
+
+    def __init__(self):
+        self.dispatch = None
+
+    async def start(self, dispatch) -> None:
+        self.dispatch = dispatch
+
+    async def stop(self) -> None:
+        self.dispatch = None
+
+    async def publish(self, channel: str, message: dict) -> None:
+        if self.dispatch:
+            self.dispatch(channel, message)
+
+
+class PostgresNotifyBackend:
+    """PostgreSQL LISTEN/NOTIFY 后端：所有 worker 共享同一个频道
+
+    发布通过 async_engine 执行 pg_notify，监听使用一条独立的 asyncpg 连接。
+    NOTIFY 的负载上限为 8000 字节，消息应只包含摘要信息。
+    """
+
+    def __init__(self, dsn: str, channel: str):
+        self.dsn = dsn
+        self.channel = channel
+        self.connection = None
+        self.dispatch = None
+
+    async def start(self, dispatch) -> None:
+        import asyncpg
+
+        self.dispatch = dispatch
+        self.connection = await asyncpg.connect(self.dsn)
+        await self.connection.add_listener(self.channel, self._on_notify)
+
+    async def stop(self) -> None:
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
+        self.dispatch = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        envelope = json.loads(payload)
+        if self.dispatch:
+            self.dispatch(envelope["channel"], envelope["message"])
+
+    async def publish(self, channel: str, message: dict) -> None:
+        payload = json.dumps({"channel": channel, "message": message}, default=str)
+        async with async_engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload},
+            )
+            await conn.commit()
+
+
+class PubSubHub:
+    """消息中心：管理订阅者并通过后端发布消息"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._started = False
+
+    async def start(self) -> None:
+        if not self._started:
+            await self.backend.start(self._dispatch)
+            self._started = True
+
+    async def stop(self) -> None:
+        if self._started:
+            await self.backend.stop()
+            self._started = False
+
+    def _dispatch(self, channel: str, message: dict) -> None:
+        """把消息放入订阅了该频道的所有队列"""
+        for subscription in list(self._subscribers.get(channel, ())):
+            try:
+                subscription.queue.put_nowait({"channel": channel, **message})
+            except asyncio.QueueFull:
+                subscription.dropped += 1
+
+    async def publish(self, channel: str, message: dict) -> None:
+        """发布消息，失败时不影响调用方的主流程"""
+        try:
+            await self.backend.publish(channel, message)
+        except Exception as e:
+            print(f"消息发布失败: {e}")
+
+    @asynccontextmanager
+    async def subscribe(self, channels: Iterable[str]) -> AsyncIterator[Subscription]:
+        """订阅若干频道，退出上下文时自动取消订阅"""
+        subscription = Subscription(channels)
+        for channel in subscription.channels:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def stats(self) -> dict:
+        """返回订阅统计信息"""
+        return {
+            "backend": type(self.backend).__name__,
+            "channels": len(self._subscribers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+def create_backend(name: Optional[str] = None):
+    """根据配置创建发布/订阅后端"""
+    name = (name or PUBSUB_BACKEND).lower()
+    if name == "postgres":
+        if IS_SQLITE:
+            print("警告: SQLite 不支持 LISTEN/NOTIFY，发布/订阅回退为进程内模式")
+            return MemoryBackend()
+        return PostgresNotifyBackend(DATABASE_URL, PUBSUB_PG_CHANNEL)
+    return MemoryBackend()
+
+
+# 创建全局实例
+hub = PubSubHub(create_backend())
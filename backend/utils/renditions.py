@@ -0,0 +1,190 @@
+"""
+文件预览图生成
+上传图片或 PDF 后在后台生成 WebP 缩略图（thumb）和预览图（preview），
+保存在原文件旁（{原键}.{规格}.webp），列表页和预览弹窗加载预览图而不是原文件
+
+依赖 Pillow（图片）和 PyMuPDF（PDF 首页），未安装时跳过对应类型
+"""
+import io
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine
+from models import FileRendition
+from utils.file_meta import file_meta
+from utils.local_io import LocalIOExecutor, local_writes
+from utils.s3_storage import s3_storage
+from utils.storage_backends import remove_if_exists
+
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    print("警告: Pillow 未安装，不会生成图片预览图")
+
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# 规格名称 -> 最长边像素
+RENDITION_SIZES: Dict[str, int] = {
+    "thumb": int(os.getenv("RENDITION_THUMB_SIZE", "320")),
+    "preview": int(os.getenv("RENDITION_PREVIEW_SIZE", "1280")),
+}
+RENDITION_QUALITY = int(os.getenv("RENDITION_QUALITY", "80"))
+# 同时生成预览图的最大线程数（CPU 密集）
+RENDITION_CONCURRENCY = int(os.getenv("RENDITION_CONCURRENCY", "2"))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+rendition_pool = LocalIOExecutor("rendition", RENDITION_CONCURRENCY)
+
+
+def rendition_source_type(file_name: str) -> Optional[str]:
+    """判断文件能否生成预览图：image / pdf / None"""
+    file_name = file_name.lower()
+    if PILLOW_AVAILABLE and file_name.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if PILLOW_AVAILABLE and PYMUPDF_AVAILABLE and file_name.endswith(".pdf"):
+        return "pdf"
+    return None
+
+
+def rendition_key(source_key: str, name: str) -> str:
+    """预览图的派生键"""
+    return f"{source_key}.{name}.webp"
+
+
+def _open_source(path: str, source_type: str) -> "Image.Image":
+    if source_type == "pdf":
+        # 按预览规格渲染 PDF 首页
+        with pymupdf.open(path, filetype="pdf") as document:
+            page = document[0]
+            longest = max(page.rect.width, page.rect.height) or 1
+            zoom = RENDITION_SIZES["preview"] / longest
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    image = Image.open(path)
+    # JPEG 可在解码时直接缩小，避免解码整张大图
+    image.draft("RGB", (RENDITION_SIZES["preview"], RENDITION_SIZES["preview"]))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+    return image
+
+
+def render(path: str, source_type: str) -> List[Tuple[str, bytes, int, int]]:
+    """生成各规格的 WebP 图片（在线程中执行），返回 [(规格, 内容, 宽, 高)]"""
+    image = _open_source(path, source_type)
+    results = []
+    # 从大到小依次缩小，复用上一步结果
+    for name, size in sorted(RENDITION_SIZES.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=RENDITION_QUALITY, method=4)
+        results.append((name, buffer.getvalue(), image.width, image.height))
+    return results
+
+
+class RenditionService:
+    """预览图服务"""
+
+    @staticmethod
+    async def generate(session: AsyncSession, source_key: str, file_name: str) -> int:
+        """为文件生成预览图并记录到 filerendition 表，返回新生成的数量"""
+        source_type = rendition_source_type(file_name)
+        if source_type is None:
+            return 0
+
+        # 去重存储下相同文件可能已生成过
+        existing = (await session.exec(
+            select(FileRendition.name).where(FileRendition.source_key == source_key)
+        )).all()
+        if set(RENDITION_SIZES) <= set(existing):
+            return 0
+
+        local_file = await s3_storage.fetch_to_local(source_key)
+        if local_file is None:
+            return 0
+
+        path, is_temp = local_file
+        try:
+            outputs = await rendition_pool.run(render, path, source_type)
+        finally:
+            if is_temp:
+                await local_writes.run(remove_if_exists, path)
+
+        created = 0
+        for name, content, width, height in outputs:
+            if name in existing:
+                continue
+            stored = await s3_storage.upload_stream(
+                content,
+                f"{name}.webp",
+                "image/webp",
+                max_size=None,
+                key=rendition_key(source_key, name),
+            )
+            session.add(FileRendition(
+                source_key=source_key,
+                name=name,
+                key=stored.key,
+                width=width,
+                height=height,
+                size=stored.size,
+            ))
+            await file_meta.record(session, stored, f"{name}.webp")
+            created += 1
+        await session.commit()
+        return created
+
+    @staticmethod
+    async def generate_task(source_key: str, file_name: str) -> None:
+        """后台任务：使用独立的数据库会话生成预览图，失败不影响上传"""
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                created = await RenditionService.generate(session, source_key, file_name)
+            if created:
+                print(f"预览图生成成功: {source_key}（{created} 个）")
+        except Exception as e:
+            print(f"预览图生成失败: {source_key}: {e}")
+
+    @staticmethod
+    async def get(session: AsyncSession, source_key: str, name: str) -> Optional[FileRendition]:
+        """查询某个文件的指定规格预览图"""
+        return (await session.exec(
+            select(FileRendition).where(
+                FileRendition.source_key == source_key,
+                FileRendition.name == name,
+            )
+        )).first()
+
+    @staticmethod
+    async def delete_for(session: AsyncSession, source_keys: List[str]) -> int:
+        """删除一组文件的预览图（记录和存储中的文件），返回删除的数量"""
+        if not source_keys:
+            return 0
+
+        keys = (await session.exec(
+            delete(FileRendition)
+            .where(FileRendition.source_key.in_(source_keys))
+            .returning(FileRendition.key)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await file_meta.forget(session, keys)
+        await session.commit()
+
+        for key in keys:
+            await s3_storage.delete_file(key)
+        return len(keys)
+
+
+# 创建全局实例
+rendition_service = RenditionService()
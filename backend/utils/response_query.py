@@ -0,0 +1,85 @@
+"""
+回复查询工具
+支持字段投影（fields=）和游标分页，供公告详情和回复列表接口共用
+"""
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Response, ResponseSummary
+from utils.pagination import build_page, keyset_order
+
+# 可投影的回复字段（id 和 created_at 始终返回，用于游标分页）
+RESPONSE_FIELDS = ("id", "announcement_id", "colleague_name", "content", "file_key", "file_name", "created_at")
+REQUIRED_FIELDS = ("id", "created_at")
+
+
+def parse_response_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的字段列表，None 表示返回全部字段"""
+    if not fields:
+        return None
+
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in RESPONSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}")
+
+    # 保持字段顺序并补齐必需字段
+    return [name for name in RESPONSE_FIELDS if name in selected or name in REQUIRED_FIELDS]
+
+
+def _select_responses(fields: Optional[List[str]]):
+    """构建按字段投影的查询"""
+    if fields is None:
+        return select(Response)
+    return select(*[getattr(Response, name) for name in fields])
+
+
+def _to_summary(row, fields: Optional[List[str]]) -> ResponseSummary:
+    if fields is None:
+        return ResponseSummary.model_validate(row, from_attributes=True)
+    return ResponseSummary(**dict(row._mapping))
+
+
+async def load_response_page(
+    session: AsyncSession,
+    announcement_id: int,
+    limit: int,
+    after: Optional[tuple] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[ResponseSummary], Optional[str]]:
+    """按游标加载某公告的一页回复，返回 (回复列表, 下一页游标)"""
+    statement = _select_responses(fields).where(Response.announcement_id == announcement_id)
+    statement = keyset_order(statement, (Response.created_at, Response.id), after)
+    rows = (await session.exec(statement.limit(limit + 1))).all()
+
+    rows, next_cursor = build_page(rows, limit, lambda r: (r.created_at, r.id))
+    return [_to_summary(row, fields) for row in rows], next_cursor
+
+
+async def load_response_offset_page(
+    session: AsyncSession,
+    announcement_id: int,
+    skip: int,
+    limit: int,
+    fields: Optional[List[str]] = None,
+) -> List[ResponseSummary]:
+    """按 skip/limit 加载某公告的一页回复"""
+    statement = (
+        _select_responses(fields)
+        .where(Response.announcement_id == announcement_id)
+        .order_by(Response.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = (await session.exec(statement)).all()
+    return [_to_summary(row, fields) for row in rows]
+
+
+async def count_responses(session: AsyncSession, announcement_id: int) -> int:
+    """统计某公告的回复总数"""
+    return (await session.exec(
+        select(func.count()).select_from(Response).where(Response.announcement_id == announcement_id)
+    )).one()
@@ -1,57 +1,219 @@
+import asyncio
 import os
 import re
 import uuid
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from dotenv import load_dotenv
 
+from utils.cache import TTLCache
+from utils.local_io import local_reads, local_writes
+from utils.storage_backends import (
+    Boto3S3Backend,
+    CozeStorageBackend,
+    FileTooLargeError,
+    LocalStorageBackend,
+    SpooledUpload,
+    StorageBackend,
+    StoredObject,
+    UploadSource,
+    remove_if_exists,
+    spool_to_file,
+)
+
 load_dotenv()
 
 # 开发环境使用本地存储，生产环境可配置为使用 S3
 USE_LOCAL_STORAGE = os.getenv("USE_LOCAL_STORAGE", "true").lower() == "true"
 LOCAL_STORAGE_PATH = os.path.join(os.getenv("COZE_WORKSPACE_PATH", "/tmp"), "file_uploads")
+# 单个文件大小上限（字节），上传过程中超出即中止
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(100 * 1024 * 1024)))
+# S3 分片上传：兼容旧配置，等同于 STORAGE_BACKEND=s3
+S3_MULTIPART_UPLOAD = os.getenv("S3_MULTIPART_UPLOAD", "false").lower() == "true"
+# 存储后端：local / s3 / coze，未设置时按 USE_LOCAL_STORAGE 和 S3_MULTIPART_UPLOAD 推断
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "").lower() or (
+    "local" if USE_LOCAL_STORAGE else "s3" if S3_MULTIPART_UPLOAD else "coze"
+)
+
+# 签名 URL 缓存：条目数上限，以及剩余有效期低于该秒数时重新签名
+PRESIGN_CACHE_SIZE = int(os.getenv("PRESIGN_CACHE_SIZE", "10000"))
+PRESIGN_SAFETY_MARGIN = int(os.getenv("PRESIGN_SAFETY_MARGIN", "300"))
 
-# 确保本地存储目录存在
-if USE_LOCAL_STORAGE and not os.path.exists(LOCAL_STORAGE_PATH):
-    os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
-    print(f"创建本地存储目录: {LOCAL_STORAGE_PATH}")
+# 签名 URL 缓存，键为 (file_key, 有效期)
+presign_cache = TTLCache(maxsize=PRESIGN_CACHE_SIZE, ttl=3600)
 
 try:
     from coze_coding_dev_sdk import S3Storage
     COZE_SDK_AVAILABLE = True
 except ImportError:
     COZE_SDK_AVAILABLE = False
-    if not USE_LOCAL_STORAGE:
+    if STORAGE_BACKEND == "coze":
         print("警告: coze-coding-dev-sdk 未安装且未启用本地存储，文件上传功能将不可用")
 
 
+def create_backend(name: Optional[str] = None) -> Optional[StorageBackend]:
+    """根据配置创建存储后端，不可用时返回 None"""
+    name = (name or STORAGE_BACKEND).lower()
+    if name == "local":
+        return LocalStorageBackend(LOCAL_STORAGE_PATH)
+    if name == "s3":
+        # 凭证未配置时使用 boto3 默认凭证链（AWS_ACCESS_KEY_ID 等环境变量、实例角色）
+        return Boto3S3Backend(
+            bucket=os.getenv("S3_BUCKET") or os.getenv("COZE_BUCKET_NAME"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or os.getenv("COZE_BUCKET_ENDPOINT_URL"),
+            region=os.getenv("S3_REGION", "cn-beijing"),
+            access_key=os.getenv("S3_ACCESS_KEY") or None,
+            secret_key=os.getenv("S3_SECRET_KEY") or None,
+        )
+    if name == "coze" and COZE_SDK_AVAILABLE:
+        return CozeStorageBackend(S3Storage(
+            endpointUrl=os.getenv("COZE_BUCKET_ENDPOINT_URL"),
+            accessKey="",
+            secretKey="",
+            bucketName=os.getenv("COZE_BUCKET_NAME"),
+            region="cn-beijing",
+        ))
+    return None
+
+
 class S3StorageService:
-    """文件存储服务（支持本地存储和 S3）"""
-
-    def __init__(self):
-        if USE_LOCAL_STORAGE:
-            self.storage = None
-            print(f"使用本地文件存储: {LOCAL_STORAGE_PATH}")
-        elif COZE_SDK_AVAILABLE:
-            self.storage = S3Storage(
-                endpointUrl=os.getenv("COZE_BUCKET_ENDPOINT_URL"),
-                accessKey="",
-                secretKey="",
-                bucketName=os.getenv("COZE_BUCKET_NAME"),
-                region="cn-beijing",
-            )
-            print("使用 S3 对象存储")
+    """文件存储服务（具体存储由 StorageBackend 实现）"""
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend if backend is not None else create_backend()
+        if isinstance(self.backend, LocalStorageBackend):
+            print(f"使用本地文件存储: {self.backend.root}")
+        elif self.backend is not None:
+            print(f"使用 S3 对象存储（{self.backend.name}）")
         else:
-            self.storage = None
             print("警告: 文件存储服务不可用")
 
+    def _require_backend(self) -> StorageBackend:
+        if self.backend is None:
+            raise RuntimeError("文件存储服务不可用")
+        return self.backend
+
+    @property
+    def local_backend(self) -> Optional[LocalStorageBackend]:
+        return self.backend if isinstance(self.backend, LocalStorageBackend) else None
+
+    @staticmethod
+    def _unique_name(file_name: str) -> str:
+        """生成安全且不冲突的存储文件名"""
+        safe_name = re.sub(r'[^a-zA-Z0-9._-]', "_", file_name)
+        # 添加 UUID 避免文件名冲突
+        return f"{uuid.uuid4().hex[:8]}_{safe_name}"
+
+    async def upload_stream(
+        self,
+        source: UploadSource,
+        file_name: str,
+        content_type: str,
+        max_size: Optional[int] = MAX_UPLOAD_SIZE,
+        key: Optional[str] = None,
+    ) -> StoredObject:
+        """流式上传文件，内存占用与文件大小无关
+
+        - local：分块写入临时文件，完成后原子重命名
+        - s3：按 S3_MULTIPART_PART_SIZE 分片上传
+        - coze：SDK 只接受完整 bytes，先分块落盘校验大小，再一次性上传
+
+        Args:
+            source: 文件内容（bytes、文件对象或异步字节迭代器）
+            file_name: 文件名
+            content_type: MIME 类型
+            max_size: 大小上限（字节），None 表示不限制
+            key: 指定存储键（如内容寻址的 blobs/{sha256}），默认 responses/{随机前缀}_{文件名}
+
+        Returns:
+            StoredObject（键、大小、SHA-256、MIME 类型）
+
+        Raises:
+            FileTooLargeError: 超过大小上限
+            RuntimeError: 文件存储服务不可用
+        """
+        backend = self._require_backend()
+        content_type = content_type or "application/octet-stream"
+        # 已知大小时提前拒绝（如 UploadFile.size）
+        known_size = getattr(source, "size", None)
+        if max_size is not None and isinstance(known_size, int) and known_size > max_size:
+            raise FileTooLargeError(max_size)
+
+        file_key = key or f"responses/{self._unique_name(file_name)}"
+        return await backend.put_stream(source, file_key, content_type, max_size)
+
+    async def spool(self, source: UploadSource, max_size: Optional[int] = MAX_UPLOAD_SIZE) -> SpooledUpload:
+        """把上传内容分块写入临时文件，同时校验大小并计算 SHA-256
+
+        本地存储时临时文件位于存储目录中，之后可原子重命名为正式文件。
+        """
+        return await spool_to_file(source, max_size, self._require_backend().spool_dir)
+
+    async def store_spooled(self, spooled: SpooledUpload, file_key: str, content_type: str) -> StoredObject:
+        """把临时文件保存为 file_key，完成后删除临时文件"""
+        try:
+            return await self._require_backend().put_file(spooled, file_key, content_type)
+        finally:
+            await self.discard_spooled(spooled)
+
+    @staticmethod
+    async def discard_spooled(spooled: SpooledUpload) -> None:
+        """删除临时文件（已保存或无需保存时）"""
+        await local_writes.run(remove_if_exists, spooled.path)
+
+    async def generate_presigned_urls(
+        self, file_keys: List[str], expire_time: int = 86400
+    ) -> Dict[str, Optional[str]]:
+        """批量生成下载 URL（未命中缓存的键并发签名）
+
+        Returns:
+            {file_key: URL}，失败的键对应 None
+        """
+        unique_keys = list(dict.fromkeys(file_keys))
+        urls = await asyncio.gather(
+            *(self.generate_presigned_url(key, expire_time) for key in unique_keys)
+        )
+        return dict(zip(unique_keys, urls))
+
+    async def fetch_to_local(self, file_key: str) -> Optional[Tuple[str, bool]]:
+        """获取文件的本地可读路径（用于生成预览图等后台处理）
+
+        Returns:
+            (路径, 是否为临时文件)；临时文件由调用方删除。失败返回 None
+        """
+        try:
+            return await self._require_backend().fetch_to_local(file_key)
+        except Exception as e:
+            print(f"下载文件失败: {e}")
+            return None
+
+    @staticmethod
+    def invalidate_presigned_url(file_key: str) -> None:
+        """删除某个文件的所有缓存签名 URL"""
+        for cache_key in presign_cache.keys():
+            if cache_key[0] == file_key:
+                presign_cache.pop(cache_key)
+
+    async def delete_file(self, file_key: str) -> bool:
+        """删除存储中的文件
+
+        Returns:
+            是否删除成功（coze SDK 未提供删除接口，返回 False）
+        """
+        self.invalidate_presigned_url(file_key)
+        try:
+            return await self._require_backend().delete(file_key)
+        except Exception as e:
+            print(f"删除文件失败: {e}")
+            return False
+
     async def upload_file(
-        self, file_content: bytes, file_name: str, content_type: str
+        self, file_content: UploadSource, file_name: str, content_type: str
     ) -> Optional[str]:
         """上传文件
 
         Args:
-            file_content: 文件内容（bytes）
+            file_content: 文件内容（bytes、文件对象或异步字节迭代器）
             file_name: 文件名
             content_type: MIME 类型
 
@@ -59,35 +221,8 @@ class S3StorageService:
             文件在存储中的键（key），失败返回 None
         """
         try:
-            if USE_LOCAL_STORAGE:
-                # 使用本地存储
-                safe_name = re.sub(r'[^a-zA-Z0-9._-]', "_", file_name)
-                # 添加 UUID 避免文件名冲突
-                unique_name = f"{uuid.uuid4().hex[:8]}_{safe_name}"
-                file_path = os.path.join(LOCAL_STORAGE_PATH, unique_name)
-
-                with open(file_path, 'wb') as f:
-                    f.write(file_content)
-
-                file_key = f"responses/{unique_name}"
-                print(f"文件上传成功（本地存储）: {file_path}, key: {file_key}")
-                return file_key
-
-            elif COZE_SDK_AVAILABLE and self.storage:
-                # 使用 S3 存储
-                safe_name = re.sub(r'[^a-zA-Z0-9._-]', "_", file_name)
-                file_key = await self.storage.uploadFile({
-                    "fileContent": file_content,
-                    "fileName": f"responses/{safe_name}",
-                    "contentType": content_type or "application/octet-stream",
-                })
-                print(f"文件上传成功（S3）: {file_key}")
-                return file_key
-
-            else:
-                print("文件存储服务不可用")
-                return None
-
+            stored = await self.upload_stream(file_content, file_name, content_type)
+            return stored.key
         except Exception as e:
             print(f"文件上传失败: {e}")
             return None
@@ -97,6 +232,9 @@ class S3StorageService:
     ) -> Optional[str]:
         """生成文件下载 URL
 
+        需要签名的后端按 (file_key, 有效期) 缓存签名 URL，
+        在剩余有效期少于 PRESIGN_SAFETY_MARGIN 秒之前重复使用同一个 URL。
+
         Args:
             file_key: 文件在存储中的键
             expire_time: 有效期（秒），默认 24 小时
@@ -105,31 +243,63 @@ class S3StorageService:
             下载 URL，失败返回 None
         """
         try:
-            if USE_LOCAL_STORAGE:
-                # 本地存储：返回后端下载接口的 URL
-                # 需要通过后端 API 读取本地文件
-                file_key_encoded = file_key.replace('/', '%2F')
-                return f"/api/file/local/{file_key_encoded}"
-
-            elif COZE_SDK_AVAILABLE and self.storage:
-                # S3 存储：生成签名 URL
-                signed_url = await self.storage.generatePresignedUrl({
-                    "key": file_key,
-                    "expireTime": expire_time,
-                })
-                return signed_url
-
-            else:
+            if self.backend is None:
                 print("文件存储服务不可用")
                 return None
 
+            # 本地存储：返回后端下载接口的 URL，无需缓存
+            if not self.backend.signs_urls:
+                return await self.backend.presigned_url(file_key, expire_time)
+
+            # 缓存中的 URL 剩余有效期仍大于安全余量时直接复用
+            cache_key = (file_key, expire_time)
+            signed_url = presign_cache.get(cache_key)
+            if signed_url is not None:
+                return signed_url
+
+            signed_url = await self.backend.presigned_url(file_key, expire_time)
+            cache_ttl = expire_time - min(PRESIGN_SAFETY_MARGIN, expire_time // 2)
+            if signed_url and cache_ttl > 0:
+                presign_cache.set(cache_key, signed_url, ttl=cache_ttl)
+            return signed_url
+
         except Exception as e:
             print(f"生成下载 URL 失败: {e}")
             return None
 
+    def get_local_path(self, file_key: str) -> Optional[str]:
+        """把 file_key 解析为本地文件路径（仅本地存储）
+
+        Args:
+            file_key: 文件在存储中的键，格式 responses/{unique_name}
+
+        Returns:
+            文件绝对路径；key 无效、越出存储目录或文件不存在时返回 None
+        """
+        backend = self.local_backend
+        return backend.get_path(file_key) if backend else None
+
+    async def stat_local(self, file_key: str) -> Optional[Tuple[str, os.stat_result]]:
+        """在读线程池中解析本地文件路径并获取文件信息，文件不存在时返回 None"""
+
+        def resolve() -> Optional[Tuple[str, os.stat_result]]:
+            file_path = self.get_local_path(file_key)
+            return None if file_path is None else (file_path, os.stat(file_path))
+
+        return await local_reads.run(resolve)
+
+    def _read_local(self, file_key: str) -> Optional[bytes]:
+        file_path = self.get_local_path(file_key)
+        if file_path is None:
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+
     async def read_file(self, file_key: str) -> Optional[bytes]:
         """读取文件内容（用于本地存储）
 
+        大文件请使用 get_local_path 流式读取，避免整个文件读入内存。
+
         Args:
             file_key: 文件在存储中的键
 
@@ -137,24 +307,9 @@ class S3StorageService:
             文件内容（bytes），失败返回 None
         """
         try:
-            if USE_LOCAL_STORAGE:
-                # 从本地文件系统读取
-                # file_key 格式: responses/{unique_name}
-                parts = file_key.split('/')
-                if len(parts) != 2:
-                    print(f"无效的 file_key 格式: {file_key}")
-                    return None
-
-                unique_name = parts[1]
-                file_path = os.path.join(LOCAL_STORAGE_PATH, unique_name)
-
-                if not os.path.exists(file_path):
-                    print(f"文件不存在: {file_path}")
-                    return None
-
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                return content
+            if self.local_backend:
+                # 在读线程池中从本地文件系统读取
+                return await local_reads.run(self._read_local, file_key)
 
             else:
                 print("仅本地存储支持直接读取文件")
@@ -0,0 +1,79 @@
+"""
+搜索结果缓存
+按规范化后的查询词缓存搜索结果页（LRU，总大小受 SEARCH_CACHE_MAX_BYTES 限制）。
+缓存键带有语料代数（generation）：新增公告、新增回复、删除公告后代数加一，
+旧结果不再命中；多 worker 部署时通过消息中心同步代数
+"""
+import json
+import os
+import uuid
+from typing import Any, Hashable, Optional, Tuple
+
+from utils.cache import TTLCache
+from utils.pubsub import hub
+
+# 最多缓存的结果页数
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+# 缓存结果的总大小上限（字节，按 JSON 序列化长度估算）
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# 兜底过期时间（秒），正常情况下由代数变化使缓存失效
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+# 多 worker 同步使用的消息频道
+SEARCH_CACHE_CHANNEL = "search_cache"
+
+
+def normalize_query(q: str) -> str:
+    """规范化查询词：合并空白、统一大小写（全文搜索本身不区分大小写）"""
+    return " ".join(q.split()).casefold()
+
+
+class SearchResultCache:
+    """带语料代数的搜索结果缓存"""
+
+    def __init__(self):
+        self.cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, maxbytes=SEARCH_CACHE_MAX_BYTES)
+        self.generation = 0
+        # 区分本进程发出的同步消息
+        self.instance_id = uuid.uuid4().hex
+
+    def key(self, endpoint: str, q: str, *params: Hashable) -> Tuple:
+        """缓存键（不含代数，由 get / set 附加）"""
+        return (endpoint, normalize_query(q), *params)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        return self.cache.get((self.generation, *key))
+
+    def set(self, key: Tuple, generation: int, value: Any) -> None:
+        """写入结果页
+
+        generation 为开始查询前读取的代数：查询期间有写入时，结果以旧代数写入，不会被读到。
+        """
+        if generation != self.generation:
+            return
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode())
+        self.cache.set((generation, *key), value, size=size)
+
+    def bump(self) -> None:
+        """语料变化：代数加一并丢弃旧结果"""
+        self.generation += 1
+        self.cache.clear()
+
+    async def invalidate(self) -> None:
+        """在本进程失效缓存，并通知其他 worker（提交数据库事务后调用）"""
+        self.bump()
+        await hub.publish(SEARCH_CACHE_CHANNEL, {"origin": self.instance_id})
+
+    async def run_sync(self) -> None:
+        """后台任务：其他 worker 写入后失效本进程的缓存"""
+        async with hub.subscribe([SEARCH_CACHE_CHANNEL]) as subscription:
+            while True:
+                message = await subscription.get()
+                if message.get("origin") != self.instance_id:
+                    self.bump()
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "generation": self.generation}
+
+
+# 创建全局实例
+search_cache = SearchResultCache()
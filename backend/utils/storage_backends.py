@@ -0,0 +1,441 @@
+"""
+存储后端
+S3StorageService 通过 StorageBackend 协议访问具体存储，可选实现：
+- local：本地文件系统（开发环境默认）
+- s3：boto3 直连 S3 兼容存储（AWS S3 / MinIO / moto），连接池 + 分片传输
+- coze：coze SDK 对象存储
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import urllib.request
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Optional, Protocol, Tuple, Union
+
+from utils.local_io import local_reads, local_writes
+
+# 流式读取的块大小（字节）
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# 分片大小（字节），S3 要求除最后一片外不小于 5MB
+S3_MULTIPART_PART_SIZE = max(int(os.getenv("S3_MULTIPART_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+# 超过该大小的文件使用分片传输（字节），流式上传时小于该大小的文件先缓存在内存中
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(16 * 1024 * 1024)))
+# 单个文件分片并发数
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+# boto3 客户端连接池大小
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+
+# 上传内容：完整的 bytes、文件对象（同步或异步 read，如 UploadFile）或异步字节迭代器
+UploadSource = Union[bytes, BinaryIO, AsyncIterator[bytes], object]
+
+
+class FileTooLargeError(Exception):
+    """上传文件超过大小上限"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        if max_size >= 1024 * 1024:
+            limit = f"{max_size / (1024 * 1024):g}MB"
+        else:
+            limit = f"{max_size} 字节"
+        super().__init__(f"文件大小超过上限 {limit}")
+
+
+@dataclass
+class SpooledUpload:
+    """已写入临时文件、尚未保存的上传内容"""
+    path: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class StoredObject:
+    """已存储的文件信息"""
+    key: str
+    size: int
+    sha256: str
+    content_type: str
+
+
+async def iter_chunks(source: UploadSource, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """把各种上传内容统一为异步字节块迭代器"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = memoryview(source)
+        for start in range(0, len(data), chunk_size):
+            yield bytes(data[start:start + chunk_size])
+        return
+
+    if hasattr(source, "__aiter__"):
+        async for chunk in source:
+            if chunk:
+                yield chunk
+        return
+
+    read = getattr(source, "read", None)
+    if read is None:
+        raise TypeError(f"不支持的上传内容类型: {type(source).__name__}")
+
+    while True:
+        chunk = read(chunk_size)
+        if asyncio.iscoroutine(chunk):
+            chunk = await chunk
+        if not chunk:
+            break
+        yield chunk
+
+
+class SizeLimitedDigest:
+    """边读边统计大小和 SHA-256，超过上限时抛出 FileTooLargeError"""
+
+    def __init__(self, max_size: Optional[int]):
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLargeError(self.max_size)
+        self.digest.update(chunk)
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+def _write_chunk(f: BinaryIO, digest: SizeLimitedDigest, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def spool_to_file(source: UploadSource, max_size: Optional[int], directory: Optional[str] = None) -> SpooledUpload:
+    """把上传内容分块写入临时文件，同时校验大小并计算 SHA-256"""
+    fd, temp_path = await local_writes.run(tempfile.mkstemp, ".part", None, directory)
+    f = os.fdopen(fd, 'wb')
+    digest = SizeLimitedDigest(max_size)
+
+    try:
+        try:
+            async for chunk in iter_chunks(source):
+                # 计算校验和与写盘都在工作线程中执行（hashlib 会释放 GIL）
+                await local_writes.run(_write_chunk, f, digest, chunk)
+        finally:
+            await local_writes.run(f.close)
+    except BaseException:
+        await local_writes.run(os.remove, temp_path)
+        raise
+    return SpooledUpload(temp_path, digest.size, digest.hexdigest())
+
+
+def remove_if_exists(path: str) -> None:
+    """删除临时文件，不存在时忽略（在 local_writes 线程池中调用）"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StorageBackend(Protocol):
+    """存储后端协议"""
+
+    name: str
+    # 临时文件目录（None 为系统默认），本地存储使用存储目录以便原子重命名
+    spool_dir: Optional[str]
+    # 下载 URL 是否需要签名（需要时由服务层缓存）
+    signs_urls: bool
+
+    async def put_stream(
+        self, source: UploadSource, key: str, content_type: str, max_size: Optional[int]
+    ) -> StoredObject:
+        """流式写入文件，边写边校验大小并计算 SHA-256"""
+        ...
+
+    async def put_file(self, spooled: SpooledUpload, key: str, content_type: str) -> StoredObject:
+        """保存已落盘的临时文件（调用方负责删除临时文件）"""
+        ...
+
+    async def presigned_url(self, key: str, expire_time: int) -> Optional[str]:
+        """生成下载 URL"""
+        ...
+
+    async def delete(self, key: str) -> bool:
+        """删除文件，不支持删除时返回 False"""
+        ...
+
+    async def fetch_to_local(self, key: str) -> Optional[Tuple[str, bool]]:
+        """获取可读的本地路径，返回 (路径, 是否为临时文件)"""
+        ...
+
+
+class LocalStorageBackend:
+    """本地文件系统存储：所有文件位于同一目录，键格式为 {前缀}/{文件名}"""
+
+    name = "local"
+    signs_urls = False
+
+    def __init__(self, root: str):
+        self.root = root
+        self.spool_dir = root
+        if not os.path.exists(root):
+            os.makedirs(root, exist_ok=True)
+            print(f"创建本地存储目录: {root}")
+
+    def get_path(self, key: str) -> Optional[str]:
+        """把键解析为文件路径；键无效、越出存储目录或文件不存在时返回 None"""
+        parts = key.split('/')
+        if len(parts) != 2 or not parts[1]:
+            print(f"无效的 file_key 格式: {key}")
+            return None
+
+        root = os.path.realpath(self.root)
+        file_path = os.path.realpath(os.path.join(root, parts[1]))
+        # 防止 ../ 等路径穿越
+        if os.path.dirname(file_path) != root:
+            print(f"无效的 file_key 路径: {key}")
+            return None
+
+        if not os.path.isfile(file_path):
+            print(f"文件不存在: {file_path}")
+            return None
+        return file_path
+
+    async def put_stream(self, source, key, content_type, max_size) -> StoredObject:
+        spooled = await spool_to_file(source, max_size, self.spool_dir)
+        try:
+            return await self.put_file(spooled, key, content_type)
+        finally:
+            await local_writes.run(remove_if_exists, spooled.path)
+
+    async def put_file(self, spooled, key, content_type) -> StoredObject:
+        file_path = os.path.join(self.root, key.split('/')[-1])
+        if os.path.dirname(spooled.path) == os.path.dirname(file_path):
+            # 同一目录下原子重命名
+            await local_writes.run(os.replace, spooled.path, file_path)
+        else:
+            await local_writes.run(_copy_file, spooled.path, file_path)
+        print(f"文件上传成功（本地存储）: {file_path}, key: {key}, {spooled.size} bytes")
+        return StoredObject(key, spooled.size, spooled.sha256, content_type)
+
+    async def presigned_url(self, key, expire_time) -> Optional[str]:
+        # 本地存储：返回后端下载接口的 URL
+        return f"/api/file/local/{key.replace('/', '%2F')}"
+
+    async def delete(self, key) -> bool:
+        file_path = await local_reads.run(self.get_path, key)
+        if file_path is None:
+            return False
+        await local_writes.run(os.remove, file_path)
+        return True
+
+    async def fetch_to_local(self, key) -> Optional[Tuple[str, bool]]:
+        file_path = await local_reads.run(self.get_path, key)
+        return (file_path, False) if file_path else None
+
+
+def _copy_file(source: str, target: str) -> None:
+    import shutil
+
+    temp_path = f"{target}.part"
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class Boto3S3Backend:
+    """boto3 S3 兼容存储（AWS S3 / MinIO / moto）
+
+    - 单个客户端在所有请求间共享（boto3 客户端线程安全），连接池大小 S3_MAX_POOL_CONNECTIONS
+    - 已落盘的文件通过 TransferConfig 并发分片上传
+    - 流式上传不落盘：不超过 S3_MULTIPART_THRESHOLD 时单次 put_object，超过时边读边按 S3_MULTIPART_PART_SIZE 分片
+    """
+
+    name = "s3"
+    spool_dir = None
+    signs_urls = True
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "standard"},
+                # MinIO 等自建服务通常只支持路径风格
+                s3={"addressing_style": "path"} if endpoint_url else None,
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_PART_SIZE,
+            max_concurrency=S3_MULTIPART_CONCURRENCY,
+        )
+
+    async def put_stream(self, source, key, content_type, max_size) -> StoredObject:
+        client = self.client
+        digest = SizeLimitedDigest(max_size)
+        buffer = bytearray()
+        chunks = iter_chunks(source)
+
+        # 先缓存到 S3_MULTIPART_THRESHOLD：小文件读完后单次 put_object，省去创建和完成分片上传的请求
+        async for chunk in chunks:
+            digest.update(chunk)
+            buffer.extend(chunk)
+            if len(buffer) > S3_MULTIPART_THRESHOLD:
+                break
+        else:
+            await asyncio.to_thread(
+                client.put_object,
+                Bucket=self.bucket, Key=key, Body=bytes(buffer), ContentType=content_type,
+            )
+            print(f"文件上传成功（S3）: {key}")
+            return StoredObject(key, digest.size, digest.hexdigest(), content_type)
+
+        # 超过阈值：改为分片上传，已缓存的数据作为前几片
+        upload = await asyncio.to_thread(
+            client.create_multipart_upload, Bucket=self.bucket, Key=key, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+
+        async def flush_parts(final: bool = False) -> None:
+            """上传缓存中的整片数据，final 时连同不足一片的剩余数据"""
+            while len(buffer) >= S3_MULTIPART_PART_SIZE or (final and buffer):
+                body = bytes(buffer[:S3_MULTIPART_PART_SIZE])
+                del buffer[:S3_MULTIPART_PART_SIZE]
+                part_number = len(parts) + 1
+                result = await asyncio.to_thread(
+                    client.upload_part,
+                    Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    PartNumber=part_number, Body=body,
+                )
+                parts.append({"ETag": result["ETag"], "PartNumber": part_number})
+
+        try:
+            await flush_parts()
+            async for chunk in chunks:
+                digest.update(chunk)
+                buffer.extend(chunk)
+                await flush_parts()
+            await flush_parts(final=True)
+
+            await asyncio.to_thread(
+                client.complete_multipart_upload,
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await asyncio.to_thread(
+                client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+        print(f"文件上传成功（S3 分片，{len(parts)} 片）: {key}")
+        return StoredObject(key, digest.size, digest.hexdigest(), content_type)
+
+    async def put_file(self, spooled, key, content_type) -> StoredObject:
+        await asyncio.to_thread(
+            self.client.upload_file,
+            spooled.path, self.bucket, key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self.transfer_config,
+        )
+        print(f"文件上传成功（S3）: {key}")
+        return StoredObject(key, spooled.size, spooled.sha256, content_type)
+
+    async def presigned_url(self, key, expire_time) -> Optional[str]:
+        # 本地计算签名，无网络请求
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expire_time
+        )
+
+    async def delete(self, key) -> bool:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+        return True
+
+    async def fetch_to_local(self, key) -> Optional[Tuple[str, bool]]:
+        fd, temp_path = await local_writes.run(tempfile.mkstemp)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, key, temp_path, Config=self.transfer_config
+            )
+        except BaseException:
+            await local_writes.run(remove_if_exists, temp_path)
+            raise
+        return temp_path, True
+
+
+class CozeStorageBackend:
+    """coze SDK 对象存储
+
+    SDK 只接受完整的 bytes，也没有下载和删除接口：
+    上传先落盘校验大小，下载通过签名 URL，删除不支持。
+    """
+
+    name = "coze"
+    spool_dir = None
+    signs_urls = True
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def put_stream(self, source, key, content_type, max_size) -> StoredObject:
+        # 先落盘完成大小校验和校验和计算，超限的文件不会整体读入内存
+        spooled = await spool_to_file(source, max_size, self.spool_dir)
+        try:
+            return await self.put_file(spooled, key, content_type)
+        finally:
+            await local_writes.run(remove_if_exists, spooled.path)
+
+    async def put_file(self, spooled, key, content_type) -> StoredObject:
+        content = await local_reads.run(_read_bytes, spooled.path)
+        file_key = await self.storage.uploadFile({
+            "fileContent": content,
+            "fileName": key,
+            "contentType": content_type,
+        })
+        print(f"文件上传成功（S3）: {file_key}")
+        return StoredObject(file_key, spooled.size, spooled.sha256, content_type)
+
+    async def presigned_url(self, key, expire_time) -> Optional[str]:
+        return await self.storage.generatePresignedUrl({
+            "key": key,
+            "expireTime": expire_time,
+        })
+
+    async def delete(self, key) -> bool:
+        print(f"当前存储不支持删除文件，跳过: {key}")
+        return False
+
+    async def fetch_to_local(self, key) -> Optional[Tuple[str, bool]]:
+        url = await self.presigned_url(key, 3600)
+        if not url:
+            return None
+        fd, temp_path = await local_writes.run(tempfile.mkstemp)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(urllib.request.urlretrieve, url, temp_path)
+        except BaseException:
+            await local_writes.run(remove_if_exists, temp_path)
+            raise
+        return temp_path, True
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
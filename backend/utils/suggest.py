@@ -0,0 +1,242 @@
+"""
+搜索建议（输入即搜）
+内存中的有序数组前缀索引：公告标题从各个字（英文按单词）开始的后缀，以及同事姓名。
+bisect 定位前缀区间，查询为 O(log n + k)，不访问数据库；
+新增/删除公告和回复时增量更新，多 worker 部署时通过消息中心同步到其他进程
+"""
+import asyncio
+import os
+import re
+import uuid
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Announcement, Response
+from utils.pubsub import hub
+
+# 只索引最近的 N 条公告标题（超出时淘汰最早的公告），限制内存占用
+SUGGEST_MAX_TITLES = int(os.getenv("SUGGEST_MAX_TITLES", "5000"))
+# 每个索引键最多保留的字符数
+SUGGEST_KEY_LENGTH = int(os.getenv("SUGGEST_KEY_LENGTH", "16"))
+# 每次查询最多扫描的索引条目数（短前缀可能命中大量条目）
+SUGGEST_SCAN_LIMIT = int(os.getenv("SUGGEST_SCAN_LIMIT", "200"))
+# 多 worker 同步使用的消息频道
+SUGGEST_CHANNEL = "suggest"
+
+_CJK_PATTERN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_SPACES = re.compile(r"\s+")
+
+# 索引条目引用：(类型, 公告 ID 或同事姓名, 匹配起始位置)
+Ref = Tuple[str, object, int]
+
+
+def normalize(value: str) -> str:
+    """统一大小写并合并空白"""
+    return _SPACES.sub(" ", value.casefold()).strip()
+
+
+def _start_positions(text: str) -> List[int]:
+    """后缀的起始位置：中文每个字，其他文字只从单词开头"""
+    positions = []
+    for i, char in enumerate(text):
+        if char == " ":
+            continue
+        if i == 0 or text[i - 1] == " " or _CJK_PATTERN.match(char) or _CJK_PATTERN.match(text[i - 1]):
+            positions.append(i)
+    return positions
+
+
+class SuggestIndex:
+    """有序数组前缀索引（_keys 与 _refs 按下标一一对应）"""
+
+    def __init__(self, max_titles: int = SUGGEST_MAX_TITLES, key_length: int = SUGGEST_KEY_LENGTH):
+        self.max_titles = max_titles
+        self.key_length = key_length
+        self._keys: List[str] = []
+        self._refs: List[Ref] = []
+        # 公告 ID -> 标题（按插入顺序，最早的在前，用于淘汰）
+        self._titles: Dict[int, str] = {}
+        # 同事姓名 -> 回复数
+        self._names: Dict[str, int] = {}
+        self._built = False
+        self._lock: Optional[asyncio.Lock] = None
+        self.evicted = 0
+        # 区分本进程发出的同步消息
+        self.instance_id = uuid.uuid4().hex
+
+    # ---------- 索引维护 ----------
+
+    def _title_entries(self, announcement_id: int, title: str) -> List[Tuple[str, Ref]]:
+        text = normalize(title)
+        return [
+            (text[position:position + self.key_length], ("announcement", announcement_id, position))
+            for position in _start_positions(text)
+        ]
+
+    def _insert(self, key: str, ref: Ref) -> None:
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._refs.insert(index, ref)
+
+    def _remove(self, key: str, ref: Ref) -> None:
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key:
+            if self._refs[index] == ref:
+                del self._keys[index]
+                del self._refs[index]
+                return
+            index += 1
+
+    def add_title(self, announcement_id: int, title: str) -> None:
+        if announcement_id in self._titles:
+            self.remove_title(announcement_id)
+        self._titles[announcement_id] = title
+        for key, ref in self._title_entries(announcement_id, title):
+            self._insert(key, ref)
+        while len(self._titles) > self.max_titles:
+            self.remove_title(next(iter(self._titles)))
+            self.evicted += 1
+
+    def remove_title(self, announcement_id: int) -> None:
+        title = self._titles.pop(announcement_id, None)
+        if title is not None:
+            for key, ref in self._title_entries(announcement_id, title):
+                self._remove(key, ref)
+
+    def add_name(self, name: str, count: int = 1) -> None:
+        if not name:
+            return
+        if name not in self._names:
+            self._names[name] = 0
+            self._insert(normalize(name)[:self.key_length], ("colleague", name, 0))
+        self._names[name] += count
+
+    def remove_name(self, name: str, count: int = 1) -> None:
+        if name not in self._names:
+            return
+        self._names[name] -= count
+        if self._names[name] <= 0:
+            del self._names[name]
+            self._remove(normalize(name)[:self.key_length], ("colleague", name, 0))
+
+    def load(self, titles: Iterable[Tuple[int, str]], names: Iterable[Tuple[str, int]]) -> None:
+        """整体重建索引（titles 按 ID 升序）"""
+        self._titles = {}
+        self._names = {}
+        entries = []
+        for announcement_id, title in titles:
+            self._titles[announcement_id] = title
+            entries.extend(self._title_entries(announcement_id, title))
+        for name, count in names:
+            if name:
+                self._names[name] = count
+                entries.append((normalize(name)[:self.key_length], ("colleague", name, 0)))
+
+        # 一次排序，比逐条插入快得多
+        entries.sort(key=lambda entry: entry[0])
+        self._keys = [key for key, _ in entries]
+        self._refs = [ref for _, ref in entries]
+        self._built = True
+
+    # ---------- 查询 ----------
+
+    def lookup(self, prefix: str, limit: int = 8) -> List[dict]:
+        """按前缀查找建议：标题开头匹配优先，其次同事姓名，再次标题中间匹配；同类按新旧或回复数排序"""
+        key = normalize(prefix)[:self.key_length]
+        if not key:
+            return []
+
+        candidates: Dict[Tuple[str, object], int] = {}
+        index = bisect_left(self._keys, key)
+        end = min(index + SUGGEST_SCAN_LIMIT, len(self._keys))
+        while index < end and self._keys[index].startswith(key):
+            kind, value, position = self._refs[index]
+            previous = candidates.get((kind, value))
+            if previous is None or position < previous:
+                candidates[(kind, value)] = position
+            index += 1
+
+        def sort_key(item):
+            (kind, value), position = item
+            if kind == "colleague":
+                return (1, -self._names.get(value, 0))
+            return (0 if position == 0 else 2, -value)
+
+        suggestions = []
+        for (kind, value), position in sorted(candidates.items(), key=sort_key)[:limit]:
+            if kind == "colleague":
+                suggestions.append({"type": kind, "text": value, "count": self._names.get(value, 0)})
+            else:
+                suggestions.append({"type": kind, "id": value, "text": self._titles[value]})
+        return suggestions
+
+    def stats(self) -> dict:
+        return {
+            "built": self._built,
+            "entries": len(self._keys),
+            "titles": len(self._titles),
+            "names": len(self._names),
+            "evicted": self.evicted,
+            "max_titles": self.max_titles,
+        }
+
+    # ---------- 构建与同步 ----------
+
+    async def ensure_built(self, session: AsyncSession) -> None:
+        """首次查询时从数据库构建索引"""
+        if self._built:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._built:
+                await self.rebuild(session)
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """从数据库重建：最近 max_titles 条公告标题和所有同事姓名"""
+        titles = (await session.exec(
+            select(Announcement.id, Announcement.title)
+            .order_by(Announcement.id.desc())
+            .limit(self.max_titles)
+        )).all()
+        names = (await session.exec(
+            select(Response.colleague_name, func.count()).group_by(Response.colleague_name)
+        )).all()
+        self.load(reversed(titles), names)
+        print(f"搜索建议索引构建完成: {len(self._titles)} 条标题, {len(self._names)} 个姓名")
+
+    def apply(self, change: dict) -> None:
+        """应用一条增量变更（未构建时忽略，构建时会从数据库读取最新数据）"""
+        if not self._built:
+            return
+        op = change.get("op")
+        if op == "add_title":
+            self.add_title(change["id"], change["title"])
+        elif op == "remove_title":
+            self.remove_title(change["id"])
+        elif op == "add_names":
+            for name, count in change["names"].items():
+                self.add_name(name, count)
+        elif op == "remove_names":
+            for name, count in change["names"].items():
+                self.remove_name(name, count)
+
+    async def publish(self, change: dict) -> None:
+        """在本进程应用变更，并通知其他 worker（提交数据库事务后调用）"""
+        self.apply(change)
+        await hub.publish(SUGGEST_CHANNEL, {**change, "origin": self.instance_id})
+
+    async def run_sync(self) -> None:
+        """后台任务：应用其他 worker 发出的变更"""
+        async with hub.subscribe([SUGGEST_CHANNEL]) as subscription:
+            while True:
+                change = await subscription.get()
+                if change.get("origin") != self.instance_id:
+                    self.apply(change)
+
+
+# 创建全局实例
+suggest_index = SuggestIndex()
@@ -7,14 +7,18 @@ export const announcementsApi = {
     skip?: number
     limit?: number
     type?: 'announcement' | 'inquiry'
+    sort?: 'created_at' | 'response_count' | 'last_response_at'
   }) {
     const response = await api.get<Announcement[]>('/announcements', { params })
     return response.data
   },
 
   // 获取公告详情
-  async get(id: number) {
-    const response = await api.get<Announcement & { responses: any[] }>(`/announcements/${id}`)
+  // 仅返回第一页回复，response_total 为回复总数，后续页使用 responses_next_cursor 或 skip 获取
+  async get(id: number, params?: { limit?: number; fields?: string }) {
+    const response = await api.get<
+      Announcement & { responses: any[]; response_total: number; responses_next_cursor?: string | null }
+    >(`/announcements/${id}`, { params })
     return response.data
   },
 
@@ -10,6 +10,15 @@ export const filesApi = {
     return response.data.url
   },
 
+  // 批量获取文件下载 URL（列表页一次签名多个文件）
+  async presign(fileKeys: string[], expireTime?: number) {
+    const response = await api.post<{ success: boolean; urls: Record<string, string | null> }>(
+      '/file/presign',
+      { keys: fileKeys, expire_time: expireTime }
+    )
+    return response.data.urls
+  },
+
   // 下载文件
   async download(fileKey: string, fileName: string) {
     const url = await this.getDownloadUrl(fileKey)
@@ -7,6 +7,8 @@ export interface Announcement {
   file_name?: string
   created_at: string
   updated_at?: string
+  response_count: number
+  last_response_at?: string
 }
 
 export interface AnnouncementCreate {